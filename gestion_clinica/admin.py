@@ -60,10 +60,24 @@ admin.site.register(User, CustomUserAdmin)
 
 @admin.register(Division)
 class DivisionAdmin(admin.ModelAdmin):
-    list_display = ('nombre',)
+    list_display = ('nombre', 'cantidad_jugadores', 'cantidad_lesiones_activas')
     search_fields = ('nombre',)
     ordering = ('nombre',)
 
+    def cantidad_jugadores(self, obj):
+        return obj.cantidad_jugadores
+    cantidad_jugadores.short_description = 'Jugadores activos'
+    cantidad_jugadores.admin_order_field = 'cantidad_jugadores'
+
+    def cantidad_lesiones_activas(self, obj):
+        return obj.cantidad_lesiones_activas
+    cantidad_lesiones_activas.short_description = 'Lesiones activas'
+    cantidad_lesiones_activas.admin_order_field = 'cantidad_lesiones_activas'
+
+    def get_queryset(self, request):
+        """Optimiza las consultas"""
+        return super().get_queryset(request).con_conteos('cantidad_jugadores', 'cantidad_lesiones_activas')
+
 @admin.register(Jugador)
 class JugadorAdmin(admin.ModelAdmin):
     list_display = ('rut', 'nombres', 'apellidos', 'get_division', 'get_edad', 'activo')
@@ -202,14 +216,15 @@ class PartidoAdmin(admin.ModelAdmin):
         }),
         ('Convocatoria', {
             'fields': ('convocados',),
-            'description': 'Seleccione hasta 22 jugadores para la convocatoria'
+            'description': f'Seleccione hasta {Partido.MAXIMO_CONVOCADOS} jugadores para la convocatoria'
         }),
     )
     
     def cantidad_convocados(self, obj):
         """Muestra la cantidad de jugadores convocados"""
-        return obj.convocados.count()
+        return obj.cantidad_convocados
     cantidad_convocados.short_description = 'Convocados'
+    cantidad_convocados.admin_order_field = 'cantidad_convocados'
     
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         """Filtros para los campos many-to-many"""
@@ -219,7 +234,7 @@ class PartidoAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         """Optimiza las consultas"""
-        return super().get_queryset(request).prefetch_related('convocados')
+        return super().get_queryset(request).con_conteos('cantidad_convocados')
 
 @admin.register(ChecklistPostPartido)
 class ChecklistPostPartidoAdmin(admin.ModelAdmin):
@@ -0,0 +1,60 @@
+"""
+Autenticación JWT con modo sin consulta a la base de datos.
+
+Con GESTION_CLINICA['JWT_SIN_CONSULTA'] activo, las peticiones se autentican
+con los claims del token (id, roles, is_staff, is_superuser) y request.user
+es un UsuarioToken (SIMPLE_JWT['TOKEN_USER_CLASS']) en vez de un User. Se
+carga el User desde la base de datos sólo cuando:
+
+- el token no trae el claim de roles (emitido antes de activar el modo), o
+- la vista declara `usuario_bd_en_escritura = True` y el método no es de
+  lectura (las vistas que guardan realizado_por / registrado_por).
+
+Como no se consulta el User, desactivar una cuenta o quitarle is_staff /
+is_superuser tiene efecto cuando vence su access token: al refrescar,
+RefreshTokenConRoles vuelve a leer el usuario y rechaza las cuentas
+inactivas.
+"""
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .conf import config
+from .roles import CLAIM_ROLES
+
+
+class UsuarioToken(TokenUser):
+    """Usuario construido desde los claims del token"""
+
+    @cached_property
+    def roles(self):
+        return tuple(self.token.get(CLAIM_ROLES, ()))
+
+    def get_full_name(self):
+        return self.token.get('full_name', '') or self.username
+
+
+class JWTAuthenticationSinConsulta(JWTAuthentication):
+    """
+    JWTAuthentication que, si el modo está activo, evita cargar el User
+    """
+
+    def authenticate(self, request):
+        # DRF instancia los autenticadores en cada petición
+        self.request = request
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if self.usar_claims(validated_token):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
+
+    def usar_claims(self, validated_token):
+        if not config('JWT_SIN_CONSULTA') or CLAIM_ROLES not in validated_token:
+            return False
+        if self.request.method in SAFE_METHODS:
+            return True
+        vista = self.request.parser_context.get('view')
+        return not getattr(vista, 'usuario_bd_en_escritura', False)
@@ -0,0 +1,111 @@
+"""
+Índice en memoria para autocompletar jugadores por nombre, RUT o ficha.
+
+El índice es una lista ordenada de (clave, id de jugador) con una entrada
+por palabra del nombre y apellidos (sin tildes ni mayúsculas), por los
+dígitos del RUT y por el número de ficha. Un prefijo se resuelve con
+bisect, sin consultar la base de datos.
+
+Se construye con una sola consulta la primera vez que se usa y se
+invalida con las señales de Jugador en models.py. Entre procesos manda
+AUTOCOMPLETAR_INDICE_SEGUNDOS, como en la caché de roles.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+from .conf import config
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z ]')
+# '12.345.678-5' o '12345678-K': el guión del dígito verificador no separa palabras
+_RUT_CON_GUION = re.compile(r'(\d[\d.]*)-([0-9kK])(?![0-9a-zA-Z])')
+
+_indice = None
+_generacion = 0
+_lock = threading.Lock()
+
+
+def normalizar(texto):
+    """'Pérez-Núñez' -> 'perez nunez': minúsculas, sin tildes ni signos"""
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return _NO_ALFANUMERICO.sub('', sin_tildes.lower().replace('-', ' '))
+
+
+class IndiceJugadores:
+    def __init__(self, filas):
+        self.jugadores = {}
+        claves = []
+        for pk, nombres, apellidos, rut, numero_ficha, division_id, activo in filas:
+            self.jugadores[pk] = {
+                'id': pk,
+                'nombre': f'{nombres} {apellidos}',
+                'rut': rut,
+                'numero_ficha': numero_ficha,
+                'division': division_id,
+                'activo': activo,
+            }
+            palabras = set(normalizar(f'{nombres} {apellidos}').split())
+            digitos_rut = re.sub(r'[^0-9kK]', '', rut or '').lower()
+            if digitos_rut:
+                palabras.add(digitos_rut)
+            if numero_ficha:
+                palabras.update({numero_ficha.lower(), numero_ficha.lstrip('0').lower()} - {''})
+            claves.extend((palabra, pk) for palabra in palabras)
+        claves.sort()
+        self.claves = [clave for clave, _ in claves]
+        self.ids = [pk for _, pk in claves]
+        self.vence = time.monotonic() + config('AUTOCOMPLETAR_INDICE_SEGUNDOS')
+
+    def con_prefijo(self, prefijo):
+        """Ids de los jugadores con alguna palabra que empieza con `prefijo`"""
+        inicio = bisect.bisect_left(self.claves, prefijo)
+        fin = bisect.bisect_left(self.claves, prefijo + '\uffff', inicio)
+        return set(self.ids[inicio:fin])
+
+    def buscar(self, texto, limite=10):
+        """
+        Jugadores en que cada palabra de `texto` es prefijo de alguna de sus
+        palabras. Primero los activos, luego por nombre.
+        """
+        texto = _RUT_CON_GUION.sub(lambda rut: rut.group(1) + rut.group(2), texto or '')
+        palabras = normalizar(texto).split()
+        if not palabras:
+            return []
+        # Las palabras más largas filtran más: se intersecta desde ellas
+        palabras.sort(key=len, reverse=True)
+        ids = self.con_prefijo(palabras[0])
+        for palabra in palabras[1:]:
+            if not ids:
+                break
+            ids &= self.con_prefijo(palabra)
+        return heapq.nsmallest(
+            limite, (self.jugadores[pk] for pk in ids),
+            key=lambda jugador: (not jugador['activo'], jugador['nombre'])
+        )
+
+
+def indice_jugadores():
+    global _indice
+    indice = _indice
+    if indice is None or indice.vence < time.monotonic():
+        from .models import Jugador
+        generacion = _generacion
+        filas = Jugador.objects.values_list(
+            'pk', 'nombres', 'apellidos', 'rut', 'numero_ficha', 'division_id', 'activo'
+        )
+        indice = IndiceJugadores(filas.iterator())
+        with _lock:
+            # Si se invalidó mientras se construía, no se guarda (puede estar desactualizado)
+            if generacion == _generacion:
+                _indice = indice
+    return indice
+
+
+def invalidar_indice_jugadores():
+    global _indice, _generacion
+    with _lock:
+        _indice = None
+        _generacion += 1
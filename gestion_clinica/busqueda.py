@@ -0,0 +1,58 @@
+"""
+Búsqueda de texto (?search=) con índices de PostgreSQL.
+
+SearchFilter de DRF convierte search_fields en ILIKE '%termino%' sobre
+cada columna, que no puede usar índices. En PostgreSQL, BusquedaFilter
+busca en su lugar:
+
+- notas clínicas: en el tsvector `busqueda` del modelo (configuración
+  'spanish', con stemming), indexado con GIN y mantenido por un trigger;
+- nombres y RUT: por similitud de trigramas (pg_trgm), con índices GIN
+  gin_trgm_ops sobre las columnas de Jugador;
+- campos exactos (p. ej. numero_ficha): por igualdad.
+
+Los resultados se ordenan por relevancia salvo que se pida ?ordering=.
+Con otros motores de base de datos se usa SearchFilter tal cual.
+
+Cada vista declara qué usar:
+
+    busqueda_vectores = ['busqueda', 'lesion__busqueda']   # rutas a SearchVectorField
+    busqueda_trigramas = ['jugador__apellidos', ...]
+    busqueda_exactos = ['numero_ficha']
+"""
+from functools import reduce
+from operator import add, or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+CONFIGURACION_TEXTO = 'spanish'
+
+
+class BusquedaFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        texto = ' '.join(self.get_search_terms(request))
+        vectores = getattr(view, 'busqueda_vectores', ())
+        trigramas = getattr(view, 'busqueda_trigramas', ())
+        exactos = getattr(view, 'busqueda_exactos', ())
+        if not texto or connections[queryset.db].vendor != 'postgresql' or not (vectores or trigramas):
+            return super().filter_queryset(request, queryset, view)
+
+        condiciones = [Q(**{campo: texto}) for campo in exactos]
+        rangos = [Value(0.0, output_field=FloatField())]
+        consulta = SearchQuery(texto, config=CONFIGURACION_TEXTO, search_type='websearch')
+        for vector in vectores:
+            condiciones.append(Q(**{vector: consulta}))
+            rangos.append(SearchRank(F(vector), consulta))
+        for campo in trigramas:
+            condiciones.append(Q(**{f'{campo}__trigram_word_similar': texto}))
+            rangos.append(TrigramWordSimilarity(texto, campo))
+
+        queryset = queryset.filter(reduce(or_, condiciones)).annotate(rango_busqueda=reduce(add, rangos))
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            orden = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.order_by('-rango_busqueda', *orden)
+        return queryset
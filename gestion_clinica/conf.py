@@ -0,0 +1,37 @@
+"""
+Configuración propia de la app, leída desde settings.GESTION_CLINICA.
+Cada clave no definida en settings toma el valor de DEFAULTS.
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # Segundos que se mantiene en memoria el conjunto de roles de un usuario.
+    # Dentro del proceso se invalida por señales; entre procesos manda el TTL.
+    'ROLES_CACHE_SEGUNDOS': 300,
+    # Incluir los roles como claim en los tokens JWT. Si está activo, los
+    # permisos leen los roles del token y un cambio de rol se refleja en el
+    # siguiente refresh del access token.
+    'ROLES_EN_TOKEN': False,
+    # Autenticar desde los claims del JWT sin cargar el User (ver
+    # authentication.py). Implica incluir los claims de usuario en el token.
+    'JWT_SIN_CONSULTA': False,
+    # Peticiones que guarda el histograma de rendimiento por endpoint
+    'METRICAS_MUESTRAS_POR_ENDPOINT': 500,
+    # A quién se envía la cabecera Server-Timing (tiempos y cantidad de
+    # consultas): 'staff' (usuarios is_staff), 'todos' o 'ninguno'
+    'SERVER_TIMING': 'staff',
+    # Medir el tiempo de serialización. Envuelve BaseSerializer.data en
+    # todo el proceso; con False el histograma lo reporta en 0.
+    'METRICAS_SERIALIZACION': True,
+    # Segundos que vive el índice de autocompletar jugadores de cada proceso.
+    # Dentro del proceso se invalida por señales; entre procesos manda el TTL.
+    'AUTOCOMPLETAR_INDICE_SEGUNDOS': 60,
+    # Preparación de convocatoria: intensidad de dolor (1-10) del último
+    # checklist desde la que se alerta, y checklists anteriores que se muestran
+    'PREPARACION_DOLOR_ALTO': 7,
+    'PREPARACION_PARTIDOS_HISTORIAL': 3,
+}
+
+
+def config(nombre):
+    return getattr(settings, 'GESTION_CLINICA', {}).get(nombre, DEFAULTS[nombre])
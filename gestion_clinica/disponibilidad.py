@@ -0,0 +1,103 @@
+"""
+Disponibilidad de jugadores para una fecha o un rango de fechas.
+
+Cada lesión es el intervalo [fecha_lesion, fecha_fin): el día de fecha_fin
+el jugador ya está de alta, y sin fecha_fin la lesión sigue abierta. Las
+lesiones cerradas sin fecha de término (esta_activa falso y fecha_fin
+vacía) no cuentan.
+
+En PostgreSQL el intervalo es un daterange con índice GiST (migración
+0024), así que las lesiones que se cruzan con el período se leen con una
+sola consulta por índice aunque haya años de historial. Con otros motores
+se usan las mismas condiciones como comparaciones de fechas.
+
+Un jugador con una lesión en el período está limitado si el último estado
+diario registrado (hasta el final del período) de todas sus lesiones es
+de trabajo en gimnasio o de reintegro, y no disponible en otro caso.
+"""
+from django.contrib.postgres.fields import DateRangeField
+from django.db import connections
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import F, Func, Q
+
+from .models import EstadoDiarioLesion, Jugador, Lesion, ultimo_estado_diario
+
+CAMPOS_JUGADOR = ('id', 'nombres', 'apellidos', 'numero_ficha', 'division_id')
+
+
+class PeriodoLesion(Func):
+    """
+    daterange(fecha_lesion, fecha_fin, '[)'). Debe coincidir con la
+    expresión del índice lesion_periodo_gist_idx para que se use. Si
+    fecha_fin es anterior a fecha_lesion el rango queda vacío.
+    """
+    template = (
+        "daterange(%(inicio)s, CASE WHEN %(fin)s < %(inicio)s THEN %(inicio)s ELSE %(fin)s END, '[)')"
+    )
+    output_field = DateRangeField()
+
+    def __init__(self):
+        super().__init__(F('fecha_lesion'), F('fecha_fin'))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        inicio, fin = (compiler.compile(expresion)[0] for expresion in self.get_source_expressions())
+        return self.template % {'inicio': inicio, 'fin': fin}, []
+
+
+def lesiones_en_periodo(inicio, fin):
+    """Lesiones que se cruzan con [inicio, fin] (ambos días incluidos)"""
+    lesiones = Lesion.objects.exclude(esta_activa=False, fecha_fin__isnull=True)
+    if connections[lesiones.db].vendor == 'postgresql':
+        return lesiones.alias(periodo=PeriodoLesion()).filter(periodo__overlap=DateRange(inicio, fin, '[]'))
+    return lesiones.filter(
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=inicio) & Q(fecha_fin__gt=F('fecha_lesion')),
+        fecha_lesion__lte=fin,
+    )
+
+
+def lesiones_por_jugador(jugadores, inicio, fin):
+    """
+    {jugador_id: [lesiones en el período]} para el queryset `jugadores`,
+    cada lesión con su último estado diario hasta `fin`. Una consulta.
+    """
+    lesiones = lesiones_en_periodo(inicio, fin).filter(jugador__in=jugadores).annotate(
+        estado=ultimo_estado_diario('estado', hasta=fin),
+        fecha_estado=ultimo_estado_diario('fecha', hasta=fin),
+    ).order_by('fecha_lesion').values(
+        'id', 'jugador_id', 'fecha_lesion', 'fecha_fin', 'diagnostico_medico',
+        'gravedad_lesion', 'estado', 'fecha_estado',
+    )
+    por_jugador = {}
+    for lesion in lesiones:
+        por_jugador.setdefault(lesion.pop('jugador_id'), []).append(lesion)
+    return por_jugador
+
+
+def clasificar(lesiones):
+    """'disponible', 'limitado' o 'no_disponible' según las lesiones del período"""
+    if not lesiones:
+        return 'disponible'
+    if all(lesion['estado'] in EstadoDiarioLesion.ESTADOS_LIMITADOS for lesion in lesiones):
+        return 'limitado'
+    return 'no_disponible'
+
+
+def disponibilidad_jugadores(inicio, fin, division=None):
+    """
+    Jugadores activos (de `division` si se indica) separados en
+    disponibles, limitados y no_disponibles para el período [inicio, fin].
+    Dos consultas: el plantel y sus lesiones en el período.
+    """
+    jugadores = Jugador.objects.filter(activo=True)
+    if division is not None:
+        jugadores = jugadores.filter(division_id=division)
+    lesiones = lesiones_por_jugador(jugadores, inicio, fin)
+
+    resultado = {'disponibles': [], 'limitados': [], 'no_disponibles': []}
+    for jugador in jugadores.order_by('apellidos', 'nombres').values(*CAMPOS_JUGADOR):
+        clase = clasificar(lesiones.get(jugador['id']))
+        if clase == 'disponible':
+            resultado['disponibles'].append(jugador)
+        else:
+            resultado[f'{clase}s'].append({**jugador, 'lesiones': lesiones[jugador['id']]})
+    return resultado
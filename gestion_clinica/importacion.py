@@ -0,0 +1,217 @@
+"""
+Importación masiva de jugadores desde CSV o XLSX.
+
+El archivo se lee fila a fila. Cada fila se valida con los campos del
+modelo y los RUT se validan y normalizan en una sola pasada. Los
+duplicados se buscan con una consulta por lote, sólo entre los RUT y
+fichas del archivo, y los jugadores se insertan con bulk_create, con las
+fichas reservadas en bloque a la secuencia. Si alguna fila tiene errores
+no se importa nada y se devuelven los errores de cada fila.
+
+Los XLSX requieren openpyxl (opcional, no está en requirements.txt).
+"""
+import csv
+import datetime
+import io
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .autocompletar import invalidar_indice_jugadores
+from .models import Division, Jugador, actualizar_resumen_clinico, digito_verificador_rut, formatear_rut
+
+# Columnas aceptadas (en minúsculas); las demás se ignoran
+COLUMNAS_OBLIGATORIAS = ('rut', 'nombres', 'apellidos', 'fecha_nacimiento', 'lateralidad', 'prevision_salud')
+COLUMNAS_OPCIONALES = ('nacionalidad', 'peso_kg', 'estatura_cm', 'numero_ficha', 'division', 'activo')
+
+# Campos que se validan con Field.clean del modelo
+CAMPOS_MODELO = ('nombres', 'apellidos', 'fecha_nacimiento', 'lateralidad', 'prevision_salud',
+                 'nacionalidad', 'peso_kg', 'estatura_cm', 'numero_ficha')
+
+VALORES_VERDADEROS = {'1', 'si', 'sí', 'true', 'verdadero', 'x'}
+_NO_RUT = re.compile(r'[^0-9kK]')
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera diccionarios columna -> valor (texto) desde un archivo binario
+    abierto. El formato se decide por la extensión de `nombre`. Lanza
+    ValueError si el archivo no se puede leer o le faltan columnas
+    obligatorias.
+    """
+    if nombre.lower().endswith('.xlsx'):
+        yield from _leer_xlsx(archivo)
+        return
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t') if muestra else csv.excel
+    except csv.Error:
+        # Sin separador reconocible (una sola columna o texto plano)
+        dialecto = csv.excel
+    lector = csv.DictReader(texto, dialect=dialecto)
+    try:
+        _validar_columnas(lector.fieldnames or [])
+        for fila in lector:
+            yield {(columna or '').strip().lower(): (valor or '').strip() for columna, valor in fila.items()}
+    except csv.Error as e:
+        raise ValueError(f'El archivo no es un CSV válido: {e}')
+
+
+def _validar_columnas(columnas):
+    faltantes = set(COLUMNAS_OBLIGATORIAS) - {str(columna or '').strip().lower() for columna in columnas}
+    if faltantes:
+        raise ValueError(
+            f"Faltan columnas obligatorias: {', '.join(c for c in COLUMNAS_OBLIGATORIAS if c in faltantes)}"
+        )
+
+
+def _leer_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Para importar archivos XLSX se necesita instalar openpyxl')
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    filas = libro.active.iter_rows(values_only=True)
+    columnas = [str(columna or '').strip().lower() for columna in next(filas, ())]
+    _validar_columnas(columnas)
+    for valores in filas:
+        if not any(valor not in (None, '') for valor in valores):
+            continue
+        yield {
+            columna: valor.date().isoformat() if isinstance(valor, datetime.datetime)
+            else '' if valor is None else str(valor).strip()
+            for columna, valor in zip(columnas, valores)
+        }
+    libro.close()
+
+
+def validar_ruts(valores):
+    """
+    Valida y normaliza una lista de RUT de una vez. Devuelve una lista de
+    (rut con formato XX.XXX.XXX-Y o None, mensaje de error o None).
+    """
+    resultados = []
+    for valor in valores:
+        rut = _NO_RUT.sub('', valor or '').upper()
+        cuerpo, dv = rut[:-1], rut[-1:]
+        if not cuerpo.isdigit() or not 7 <= len(cuerpo) <= 8:
+            resultados.append((None, 'El RUT debe tener entre 7 y 8 dígitos antes del dígito verificador'))
+        elif dv != digito_verificador_rut(cuerpo):
+            resultados.append((None, 'El RUT ingresado no es válido'))
+        else:
+            resultados.append((formatear_rut(rut), None))
+    return resultados
+
+
+def variantes_rut(rut):
+    """
+    Escrituras de un RUT válido con que puede estar guardado:
+    '12.345.678-K', '12345678-K', '12345678K' y las mismas con 'k'
+    """
+    limpio = _NO_RUT.sub('', rut).upper()
+    cuerpo, dv = limpio[:-1], limpio[-1]
+    variantes = set()
+    for digito in {dv, dv.lower()}:
+        variantes |= {formatear_rut(cuerpo + digito), f'{cuerpo}-{digito}', cuerpo + digito}
+    return variantes
+
+
+def _parsear_fecha(valor):
+    """Acepta AAAA-MM-DD (y lo que entienda DateField) o DD/MM/AAAA"""
+    try:
+        return datetime.datetime.strptime(valor, '%d/%m/%Y').date()
+    except ValueError:
+        return valor
+
+
+def _validar_campos(fila, divisiones, division_por_defecto):
+    datos, errores = {}, {}
+    for campo in COLUMNAS_OBLIGATORIAS:
+        if not fila.get(campo):
+            errores[campo] = ['Este campo es obligatorio.']
+    for campo in CAMPOS_MODELO:
+        valor = fila.get(campo, '')
+        if campo in errores or valor == '':
+            continue
+        if campo in ('lateralidad', 'prevision_salud'):
+            valor = valor.lower()
+        elif campo == 'fecha_nacimiento':
+            valor = _parsear_fecha(valor)
+        elif campo == 'peso_kg':
+            valor = valor.replace(',', '.')
+        try:
+            datos[campo] = Jugador._meta.get_field(campo).clean(valor, None)
+        except ValidationError as e:
+            errores[campo] = e.messages
+
+    nombre_division = fila.get('division', '')
+    if nombre_division:
+        datos['division_id'] = divisiones.get(nombre_division.lower())
+        if datos['division_id'] is None:
+            errores['division'] = [f'División no encontrada: {nombre_division}']
+    else:
+        datos['division_id'] = division_por_defecto.pk if division_por_defecto else None
+    if fila.get('activo'):
+        datos['activo'] = fila['activo'].lower() in VALORES_VERDADEROS
+    return datos, errores
+
+
+def importar_jugadores(filas, division=None, batch_size=1000, simular=False):
+    """
+    Importa jugadores desde un iterable de filas (ver leer_filas).
+    `division` se asigna a las filas sin columna division.
+
+    Devuelve {'filas', 'creados', 'errores': [{'fila', 'errores'}]}. Las
+    filas se numeran como en la planilla (la 1 es el encabezado). Con
+    `simular` sólo valida.
+    """
+    divisiones = {nombre.lower(): pk for pk, nombre in Division.objects.values_list('pk', 'nombre')}
+    leidas = [
+        (numero, fila.get('rut', ''), *_validar_campos(fila, divisiones, division))
+        for numero, fila in enumerate(filas, start=2)
+    ]
+
+    ruts = validar_ruts([rut for _, rut, _, _ in leidas])
+    # Sólo los RUT del archivo, en las escrituras con que pueden estar guardados
+    variantes = {variante for rut, _ in ruts if rut for variante in variantes_rut(rut)}
+    ruts_existentes = {
+        rut for rut, _ in validar_ruts(Jugador.objects.filter(rut__in=variantes).values_list('rut', flat=True)) if rut
+    }
+    fichas_existentes = set(
+        Jugador.objects.filter(
+            numero_ficha__in={datos['numero_ficha'] for _, _, datos, _ in leidas if datos.get('numero_ficha')}
+        ).values_list('numero_ficha', flat=True)
+    )
+
+    errores, jugadores, ruts_vistos, fichas_vistas = [], [], set(), set()
+    for (numero, _, datos, errores_fila), (rut, error_rut) in zip(leidas, ruts):
+        if 'rut' not in errores_fila:
+            if error_rut:
+                errores_fila['rut'] = [error_rut]
+            elif rut in ruts_existentes:
+                errores_fila['rut'] = ['Ya existe un jugador con este RUT']
+            elif rut in ruts_vistos:
+                errores_fila['rut'] = ['RUT repetido en el archivo']
+        ficha = datos.get('numero_ficha')
+        if ficha and (ficha in fichas_existentes or ficha in fichas_vistas):
+            errores_fila['numero_ficha'] = ['Número de ficha ya usado']
+        ruts_vistos.add(rut)
+        fichas_vistas.add(ficha)
+        if errores_fila:
+            errores.append({'fila': numero, 'errores': errores_fila})
+        else:
+            jugadores.append(Jugador(rut=rut, **datos))
+
+    if errores or simular:
+        return {'filas': len(leidas), 'creados': 0, 'errores': errores}
+
+    with transaction.atomic():
+        Jugador.asignar_fichas(jugadores)
+        Jugador.objects.bulk_create(jugadores, batch_size=batch_size)
+        # bulk_create no envía post_save
+        actualizar_resumen_clinico([jugador.pk for jugador in jugadores], batch_size=batch_size)
+    invalidar_indice_jugadores()
+    return {'filas': len(leidas), 'creados': len(jugadores), 'errores': []}
@@ -0,0 +1,219 @@
+"""
+Consultas y generación del informe de lesiones.
+
+El informe tiene cuatro secciones (nuevas, finalizadas, activas y cambios
+diarios) para un rango de fechas. Se puede construir completo en memoria
+(respuesta JSON) o emitirse por bloques como NDJSON o CSV.
+
+Los totales y los gráficos se leen de ResumenDiarioLesiones, no de las
+tablas de lesiones, así que su costo no depende del largo del rango.
+
+Los informes JSON de períodos cerrados se guardan ya generados en
+InformeLesionesSnapshot (ver snapshot_informe).
+"""
+import csv
+import hashlib
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Lesion, EstadoDiarioLesion, ResumenDiarioLesiones, InformeLesionesSnapshot, Secuencia, GENERACION_SNAPSHOTS
+from .serializers import LesionSerializer, EstadoDiarioLesionSerializer
+
+# Sección -> serializer con el que se renderizan sus filas
+SECCIONES_INFORME = {
+    'nuevas_lesiones': LesionSerializer,
+    'lesiones_finalizadas': LesionSerializer,
+    'lesiones_activas': LesionSerializer,
+    'cambios_diarios': EstadoDiarioLesionSerializer,
+}
+
+TAMANO_BLOQUE_INFORME = 500
+
+
+def consultas_informe_lesiones(start_date, end_date):
+    """
+    Querysets (sin evaluar) de cada sección del informe
+    """
+    return {
+        # Nuevas lesiones en el rango de fechas
+        'nuevas_lesiones': Lesion.objects.filter(
+            fecha_lesion__range=[start_date, end_date]
+        ).select_related('jugador').order_by('fecha_lesion'),
+        # Lesiones finalizadas en el rango de fechas
+        'lesiones_finalizadas': Lesion.objects.filter(
+            fecha_fin__range=[start_date, end_date]
+        ).select_related('jugador').order_by('fecha_fin'),
+        # Lesiones activas (sin fecha_fin o con fecha_fin posterior al período)
+        'lesiones_activas': Lesion.objects.filter(
+            Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=end_date),
+            fecha_lesion__lte=end_date
+        ).select_related('jugador').order_by('fecha_lesion'),
+        # Cambios de estado diarios en el rango de fechas
+        'cambios_diarios': EstadoDiarioLesion.objects.filter(
+            fecha__range=[start_date, end_date]
+        ).select_related('lesion__jugador', 'registrado_por').order_by('fecha'),
+    }
+
+
+def resumen_informe_lesiones(start_date, end_date, division=None):
+    """
+    Totales del informe, desde el resumen diario precalculado (una consulta)
+    """
+    return _resumen_filtrado(division).totales(start_date, end_date)
+
+
+# Dimensiones del resumen que se devuelven como gráficos
+DIMENSIONES_GRAFICOS = ('fecha', 'tipo_lesion', 'gravedad_lesion', 'region_cuerpo', 'estado', 'division')
+
+
+def graficos_informe_lesiones(start_date, end_date, division=None):
+    """
+    Totales y series agrupadas para el dashboard de lesiones
+    """
+    resumen = _resumen_filtrado(division)
+    datos = {
+        'periodo': {
+            'inicio': str(start_date),
+            'fin': str(end_date)
+        },
+        'resumen': resumen.totales(start_date, end_date),
+    }
+    for dimension in DIMENSIONES_GRAFICOS:
+        datos[f'por_{dimension}'] = resumen.por_dimension(start_date, end_date, dimension)
+    return datos
+
+
+def _resumen_filtrado(division=None):
+    resumen = ResumenDiarioLesiones.objects.all()
+    if division is not None:
+        resumen = resumen.filter(division=division)
+    return resumen
+
+
+def informe_lesiones(start_date, end_date, request=None):
+    """
+    Informe completo en memoria (formato JSON original de la API)
+    """
+    contexto = {'request': request}
+    datos = {
+        'periodo': {
+            'inicio': str(start_date),
+            'fin': str(end_date)
+        },
+    }
+    for seccion, queryset in consultas_informe_lesiones(start_date, end_date).items():
+        datos[seccion] = SECCIONES_INFORME[seccion](queryset, many=True, context=contexto).data
+    datos['resumen'] = resumen_informe_lesiones(start_date, end_date)
+    return datos
+
+
+def bloques_informe_lesiones(start_date, end_date, request=None, tamano_bloque=TAMANO_BLOQUE_INFORME):
+    """
+    Genera (seccion, filas) por bloques. Cada sección se recorre con
+    iterator(), que en PostgreSQL usa un cursor del lado del servidor, de
+    modo que nunca hay más de `tamano_bloque` objetos en memoria.
+    """
+    contexto = {'request': request}
+    for seccion, queryset in consultas_informe_lesiones(start_date, end_date).items():
+        serializer_class = SECCIONES_INFORME[seccion]
+        bloque = []
+        for objeto in queryset.iterator(chunk_size=tamano_bloque):
+            bloque.append(objeto)
+            if len(bloque) >= tamano_bloque:
+                yield seccion, serializer_class(bloque, many=True, context=contexto).data
+                bloque = []
+        if bloque:
+            yield seccion, serializer_class(bloque, many=True, context=contexto).data
+
+
+def informe_lesiones_ndjson(start_date, end_date, request=None):
+    """
+    Una línea JSON por registro. La primera línea trae el período y el resumen.
+    """
+    cabecera = {
+        'periodo': {'inicio': str(start_date), 'fin': str(end_date)},
+        'resumen': resumen_informe_lesiones(start_date, end_date),
+    }
+    yield json.dumps(cabecera, cls=JSONEncoder, ensure_ascii=False) + '\n'
+    for seccion, filas in bloques_informe_lesiones(start_date, end_date, request):
+        yield ''.join(
+            json.dumps({'seccion': seccion, 'registro': fila}, cls=JSONEncoder, ensure_ascii=False) + '\n'
+            for fila in filas
+        )
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve lo escrito en vez de guardarlo"""
+    def write(self, valor):
+        return valor
+
+
+def informe_lesiones_csv(start_date, end_date, request=None):
+    """
+    CSV por bloques. Cada sección empieza con su propia fila de encabezados,
+    precedida por la columna 'seccion'.
+    """
+    escritor = csv.writer(_Eco())
+    resumen = resumen_informe_lesiones(start_date, end_date)
+    yield escritor.writerow(['seccion', 'inicio', 'fin', *resumen.keys()])
+    yield escritor.writerow(['resumen', start_date, end_date, *resumen.values()])
+
+    seccion_actual = None
+    for seccion, filas in bloques_informe_lesiones(start_date, end_date, request):
+        lineas = []
+        if seccion != seccion_actual and filas:
+            lineas.append(escritor.writerow(['seccion', *filas[0].keys()]))
+            seccion_actual = seccion
+        lineas.extend(escritor.writerow([seccion, *fila.values()]) for fila in filas)
+        yield ''.join(lineas)
+
+
+def es_periodo_cerrado(end_date):
+    return end_date < timezone.localdate()
+
+
+def snapshot_informe(tipo, start_date, end_date, generar, filtros=None):
+    """
+    Devuelve el InformeLesionesSnapshot de (tipo, fechas, filtros), creándolo
+    con `generar()` si no existe. Sólo debe usarse con períodos cerrados.
+
+    Si alguna lesión del contenido trae días restantes numéricos (dependen
+    de la fecha actual), el snapshot vale sólo por el día de hoy.
+
+    Si la generación de snapshots avanzó mientras se generaba (se confirmó
+    una escritura que lo invalida), el contenido se entrega igual pero el
+    snapshot guardado se descarta.
+    """
+    filtros = filtros or {}
+    clave = hashlib.sha256(
+        json.dumps([tipo, str(start_date), str(end_date), filtros], sort_keys=True).encode()
+    ).hexdigest()
+    snapshot = InformeLesionesSnapshot.objects.vigentes().filter(clave=clave).first()
+    if snapshot:
+        return snapshot
+
+    # Los snapshots vencidos no se vuelven a servir; se limpian al regenerar
+    InformeLesionesSnapshot.objects.filter(valido_hasta__lt=timezone.localdate()).delete()
+    generacion = Secuencia.valor(GENERACION_SNAPSHOTS)
+    datos = generar()
+    contenido = json.dumps(datos, cls=JSONEncoder, ensure_ascii=False)
+    depende_de_hoy = any(
+        isinstance(lesion.get('dias_restantes'), int)
+        for seccion in ('nuevas_lesiones', 'lesiones_finalizadas', 'lesiones_activas')
+        for lesion in datos.get(seccion, [])
+    )
+    snapshot, _ = InformeLesionesSnapshot.objects.update_or_create(clave=clave, defaults={
+        'tipo': tipo,
+        'fecha_inicio': start_date,
+        'fecha_fin': end_date,
+        'filtros': filtros,
+        'contenido': contenido,
+        'etag': hashlib.sha256(contenido.encode()).hexdigest(),
+        'valido_hasta': timezone.localdate() if depende_de_hoy else None,
+    })
+    if Secuencia.valor(GENERACION_SNAPSHOTS) != generacion:
+        InformeLesionesSnapshot.objects.filter(pk=snapshot.pk, etag=snapshot.etag).delete()
+    return snapshot
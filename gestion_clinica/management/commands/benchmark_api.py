@@ -0,0 +1,294 @@
+"""
+Benchmark de la API con perfiles de tráfico.
+
+Reproduce una mezcla ponderada de peticiones contra los endpoints del router
+con N hilos concurrentes, autenticándose con JWT vía /api/auth/login/.
+Reporta peticiones por segundo, percentiles de latencia y consultas SQL por
+petición (leídas de la cabecera Server-Timing de InstrumentacionMiddleware,
+que se envía a usuarios staff salvo que SERVER_TIMING diga otra cosa),
+y guarda el resultado en JSON junto con el commit actual para comparar
+corridas.
+
+Por defecto corre en el mismo proceso con el cliente de pruebas de Django
+(sin red). Con --url apunta a un servidor levantado, por ejemplo con
+gunicorn, usando la misma base de datos que este settings.
+
+    python manage.py benchmark_api --perfil post_partido --rut 19976194-3 --password ...
+    python manage.py benchmark_api --url http://localhost:8000 --concurrencia 16 ...
+    python manage.py benchmark_api ... --comparar benchmarks/resultados/<base>.json
+"""
+import datetime
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+
+from gestion_clinica.middleware import percentil
+from gestion_clinica.models import Jugador, Lesion, Partido, ChecklistPostPartido
+
+# Cada entrada: nombre, método, ruta (con marcadores), peso y cuerpo opcional.
+# Los marcadores {jugador_id}, {lesion_id}, {lesion_activa_id}, {partido_id}
+# y {checklist_id} se reemplazan por IDs existentes elegidos al azar.
+PERFILES = {
+    # Después de un partido: el cuerpo médico registra checklists y el
+    # cuerpo técnico refresca lesiones activas y convocados.
+    'post_partido': [
+        {'nombre': 'lesiones_activas', 'metodo': 'GET', 'ruta': '/api/lesiones/activas/', 'peso': 30},
+        {'nombre': 'checklists_por_partido', 'metodo': 'GET', 'ruta': '/api/checklists/por_partido/?partido_id={partido_id}', 'peso': 20},
+        {'nombre': 'actualizar_checklist', 'metodo': 'PATCH', 'ruta': '/api/checklists/{checklist_id}/', 'peso': 20,
+         'datos': {'observaciones_checklist': 'Control post partido'}},
+        {'nombre': 'convocados', 'metodo': 'GET', 'ruta': '/api/partidos/{partido_id}/convocados/', 'peso': 10},
+        {'nombre': 'jugadores', 'metodo': 'GET', 'ruta': '/api/jugadores/', 'peso': 10},
+        {'nombre': 'historial_diario', 'metodo': 'GET', 'ruta': '/api/lesiones/{lesion_activa_id}/historial_diario/', 'peso': 10},
+    ],
+    # Uso normal de un día de semana
+    'diario': [
+        {'nombre': 'jugadores', 'metodo': 'GET', 'ruta': '/api/jugadores/', 'peso': 20},
+        {'nombre': 'jugador', 'metodo': 'GET', 'ruta': '/api/jugadores/{jugador_id}/', 'peso': 15},
+        {'nombre': 'lesiones_jugador', 'metodo': 'GET', 'ruta': '/api/jugadores/{jugador_id}/lesiones/', 'peso': 15},
+        {'nombre': 'lesiones', 'metodo': 'GET', 'ruta': '/api/lesiones/', 'peso': 15},
+        {'nombre': 'atenciones', 'metodo': 'GET', 'ruta': '/api/atenciones/?jugador={jugador_id}', 'peso': 15},
+        {'nombre': 'estados_diarios', 'metodo': 'GET', 'ruta': '/api/estados-diarios/', 'peso': 10},
+        {'nombre': 'partidos', 'metodo': 'GET', 'ruta': '/api/partidos/', 'peso': 10},
+    ],
+    # Informes mensuales del staff
+    'informes': [
+        {'nombre': 'informe_mes_anterior', 'metodo': 'GET', 'ruta': '/api/informes/lesiones/?start_date={inicio_mes_anterior}&end_date={fin_mes_anterior}', 'peso': 50},
+        {'nombre': 'graficos_temporada', 'metodo': 'GET', 'ruta': '/api/informes/lesiones/resumen/?start_date={inicio_anio}&end_date={hoy}', 'peso': 50},
+    ],
+}
+
+PATRON_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def resumen_latencias(muestras):
+    latencias = sorted(muestra['ms'] for muestra in muestras)
+    consultas = sorted(muestra['consultas'] for muestra in muestras if muestra['consultas'] is not None)
+    resumen = {
+        'peticiones': len(muestras),
+        'errores': sum(1 for muestra in muestras if muestra['estado'] >= 400),
+        'latencia_ms': {p: round(percentil(latencias, int(p[1:])), 2) for p in ('p50', 'p95', 'p99')},
+    }
+    resumen['latencia_ms']['max'] = round(latencias[-1], 2)
+    if consultas:
+        resumen['consultas'] = {'p50': percentil(consultas, 50), 'p95': percentil(consultas, 95), 'max': consultas[-1]}
+    return resumen
+
+
+class ClienteEnProceso:
+    """Cliente de pruebas de Django; cada hilo usa su propia conexión a la BD"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def cliente(self):
+        if not hasattr(self.local, 'cliente'):
+            self.local.cliente = Client(HTTP_HOST='localhost')
+        return self.local.cliente
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        respuesta = getattr(self.cliente(), metodo.lower())(
+            ruta, data=json.dumps(datos) if datos is not None else None,
+            content_type='application/json', **extra
+        )
+        cuerpo = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return respuesta.status_code, respuesta.get('Server-Timing', ''), cuerpo
+
+    def cerrar(self):
+        connections.close_all()
+
+
+class ClienteHttp:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        peticion = urllib.request.Request(
+            self.url + ruta, method=metodo,
+            data=json.dumps(datos).encode() if datos is not None else None,
+            headers={'Content-Type': 'application/json', **({'Authorization': f'Bearer {token}'} if token else {})},
+        )
+        try:
+            with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                return respuesta.status, respuesta.headers.get('Server-Timing', ''), respuesta.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('Server-Timing', ''), error.read()
+
+    def cerrar(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Mide throughput y latencia de la API reproduciendo un perfil de tráfico'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfil', default='post_partido',
+                            help=f'Perfil incluido ({", ".join(PERFILES)}) o ruta a un JSON con la misma estructura')
+        parser.add_argument('--url', help='Servidor a medir (por defecto, en proceso con el cliente de Django)')
+        parser.add_argument('--rut', required=True, help='Usuario para el login JWT')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--peticiones', type=int, default=500)
+        parser.add_argument('--concurrencia', type=int, default=8)
+        parser.add_argument('--calentamiento', type=int, default=20, help='Peticiones previas que no se miden')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', default='benchmarks/resultados', help='Directorio donde guardar el resultado')
+        parser.add_argument('--comparar', help='Resultado JSON anterior contra el cual comparar')
+
+    def handle(self, *args, **options):
+        perfil, nombre_perfil = self.cargar_perfil(options['perfil'])
+        cliente = ClienteHttp(options['url']) if options['url'] else ClienteEnProceso()
+        rng = random.Random(options['semilla'])
+        valores = self.valores_marcadores()
+
+        estado, _, cuerpo = cliente.pedir('POST', '/api/auth/login/', {'rut': options['rut'], 'password': options['password']})
+        if estado != 200:
+            raise CommandError(f'Login fallido ({estado}): {cuerpo[:200]!r}')
+        token = json.loads(cuerpo)['access_token']
+
+        pesos = [entrada['peso'] for entrada in perfil]
+        plan = [
+            self.concretar(rng.choices(perfil, weights=pesos)[0], valores, rng)
+            for _ in range(options['calentamiento'] + options['peticiones'])
+        ]
+        calentamiento, plan = plan[:options['calentamiento']], plan[options['calentamiento']:]
+
+        def ejecutar(paso):
+            nombre, metodo, ruta, datos = paso
+            inicio = time.perf_counter()
+            estado, server_timing, _ = cliente.pedir(metodo, ruta, datos, token)
+            consultas = PATRON_CONSULTAS.search(server_timing)
+            return {
+                'nombre': nombre, 'estado': estado,
+                'ms': (time.perf_counter() - inicio) * 1000,
+                'consultas': int(consultas.group(1)) if consultas else None,
+            }
+
+        with ThreadPoolExecutor(options['concurrencia']) as executor:
+            list(executor.map(ejecutar, calentamiento))
+            inicio = time.perf_counter()
+            muestras = list(executor.map(ejecutar, plan))
+            duracion = time.perf_counter() - inicio
+            list(executor.map(lambda _: cliente.cerrar(), range(options['concurrencia'])))
+
+        por_endpoint = defaultdict(list)
+        for muestra in muestras:
+            por_endpoint[muestra['nombre']].append(muestra)
+        resultado = {
+            'perfil': nombre_perfil,
+            'commit': commit_actual(),
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'modo': options['url'] or 'en_proceso',
+            'base_de_datos': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'concurrencia': options['concurrencia'],
+            'duracion_s': round(duracion, 3),
+            'rps': round(len(muestras) / duracion, 2),
+            **resumen_latencias(muestras),
+            'por_endpoint': {nombre: resumen_latencias(lista) for nombre, lista in sorted(por_endpoint.items())},
+        }
+
+        self.mostrar(resultado)
+        ruta = self.guardar(resultado, options['salida'])
+        self.stdout.write(self.style.SUCCESS(f'Resultado guardado en {ruta}'))
+        if options['comparar']:
+            self.comparar(json.loads(Path(options['comparar']).read_text()), resultado)
+
+    def cargar_perfil(self, perfil):
+        if perfil in PERFILES:
+            return PERFILES[perfil], perfil
+        ruta = Path(perfil)
+        if not ruta.exists():
+            raise CommandError(f'Perfil desconocido: {perfil}')
+        return json.loads(ruta.read_text()), ruta.stem
+
+    def valores_marcadores(self):
+        hoy = datetime.date.today()
+        fin_mes_anterior = hoy.replace(day=1) - datetime.timedelta(days=1)
+        valores = {
+            'jugador_id': list(Jugador.objects.values_list('pk', flat=True)[:1000]),
+            'lesion_id': list(Lesion.objects.values_list('pk', flat=True)[:1000]),
+            'lesion_activa_id': list(Lesion.objects.filter(esta_activa=True).values_list('pk', flat=True)[:1000]),
+            'partido_id': list(Partido.objects.order_by('-fecha').values_list('pk', flat=True)[:5]),
+            'checklist_id': list(ChecklistPostPartido.objects.order_by('-partido__fecha').values_list('pk', flat=True)[:500]),
+            'hoy': [hoy],
+            'inicio_anio': [hoy.replace(month=1, day=1)],
+            'inicio_mes_anterior': [fin_mes_anterior.replace(day=1)],
+            'fin_mes_anterior': [fin_mes_anterior],
+        }
+        connections.close_all()
+        return valores
+
+    def concretar(self, entrada, valores, rng):
+        def reemplazar(coincidencia):
+            opciones = valores.get(coincidencia.group(1))
+            if not opciones:
+                raise CommandError(f"No hay datos para {{{coincidencia.group(1)}}} (perfil '{entrada['nombre']}')")
+            return str(rng.choice(opciones))
+        ruta = re.sub(r'\{(\w+)\}', reemplazar, entrada['ruta'])
+        return entrada['nombre'], entrada['metodo'].upper(), ruta, entrada.get('datos')
+
+    def mostrar(self, resultado):
+        self.stdout.write(
+            f"{resultado['perfil']} @ {resultado['commit']}: {resultado['rps']} req/s, "
+            f"p50 {resultado['latencia_ms']['p50']} ms, p95 {resultado['latencia_ms']['p95']} ms, "
+            f"errores {resultado['errores']}"
+        )
+        for nombre, datos in resultado['por_endpoint'].items():
+            consultas = datos.get('consultas', {})
+            self.stdout.write(
+                f"  {nombre:<28} n={datos['peticiones']:<5} p50={datos['latencia_ms']['p50']:>8} ms "
+                f"p95={datos['latencia_ms']['p95']:>8} ms consultas p50={consultas.get('p50', '-')} "
+                f"errores={datos['errores']}"
+            )
+
+    def guardar(self, resultado, directorio):
+        directorio = Path(directorio)
+        if not directorio.is_absolute():
+            directorio = Path(settings.BASE_DIR) / directorio
+        directorio.mkdir(parents=True, exist_ok=True)
+        marca = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        ruta = directorio / f"{marca}_{resultado['commit']}_{resultado['perfil']}.json"
+        ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return ruta
+
+    def comparar(self, base, actual):
+        def delta(antes, despues):
+            if not antes:
+                return ''
+            return f'({(despues - antes) / antes * 100:+.1f}%)'
+
+        self.stdout.write(f"\nComparación {base['commit']} -> {actual['commit']}")
+        self.stdout.write(f"  req/s: {base['rps']} -> {actual['rps']} {delta(base['rps'], actual['rps'])}")
+        for nombre, datos in actual['por_endpoint'].items():
+            anterior = base.get('por_endpoint', {}).get(nombre)
+            if not anterior:
+                continue
+            p95_antes, p95_despues = anterior['latencia_ms']['p95'], datos['latencia_ms']['p95']
+            consultas_antes = anterior.get('consultas', {}).get('p50')
+            consultas_despues = datos.get('consultas', {}).get('p50')
+            self.stdout.write(
+                f"  {nombre:<28} p95 {p95_antes} -> {p95_despues} ms {delta(p95_antes, p95_despues)}; "
+                f"consultas {consultas_antes} -> {consultas_despues}"
+            )
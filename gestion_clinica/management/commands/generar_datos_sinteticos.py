@@ -0,0 +1,279 @@
+"""
+Genera un set de datos sintético de varias temporadas para pruebas de carga.
+
+Todo se inserta con bulk_create por lotes y con una semilla fija, así que
+dos ejecuciones con los mismos parámetros producen los mismos datos. Los
+valores siguen distribuciones parecidas a las reales: la mayoría de las
+lesiones son musculares y de miembro inferior, la duración depende de la
+gravedad y el historial diario pasa de camilla a gimnasio y a reintegro.
+
+Ejemplo (~1M de filas):
+    python manage.py generar_datos_sinteticos --jugadores 3000 --temporadas 4
+"""
+import datetime
+import itertools
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from gestion_clinica.models import (
+    Division, Jugador, AtencionKinesica, Lesion, EstadoDiarioLesion,
+    Partido, ChecklistPostPartido, InformeLesionesSnapshot, reconstruir_resumen_lesiones,
+    recalcular_intervalos, actualizar_resumen_clinico, digito_verificador_rut, formatear_rut
+)
+
+NOMBRES = [
+    'Matías', 'Benjamín', 'Vicente', 'Martín', 'Agustín', 'Joaquín', 'Tomás', 'Lucas', 'Diego', 'Sebastián',
+    'Felipe', 'Cristóbal', 'Ignacio', 'Nicolás', 'Maximiliano', 'José', 'Bastián', 'Gaspar', 'Javiera', 'Catalina',
+    'Fernanda', 'Antonia', 'Valentina', 'Constanza', 'Camila', 'Francisca', 'Isidora', 'Florencia', 'Josefa', 'Martina',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda',
+    'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela',
+    'Castillo', 'Tapia', 'Reyes', 'Gutiérrez', 'Castro', 'Pizarro', 'Álvarez', 'Vásquez', 'Sánchez', 'Fernández',
+]
+DIVISIONES = ['Primer Equipo', 'Femenino', 'Proyección', 'Sub-19', 'Sub-17', 'Sub-16', 'Sub-15', 'Sub-14']
+RIVALES = [
+    'Colo-Colo', 'Universidad de Chile', 'Universidad Católica', 'Everton', 'Unión Española', 'Palestino',
+    'Huachipato', "O'Higgins", 'Cobreloa', 'Deportes Iquique', 'Audax Italiano', 'Coquimbo Unido',
+]
+
+# Pesos aproximados de la distribución real de lesiones en fútbol
+PESOS_TIPO_LESION = {
+    'muscular': 45, 'ligamentosa': 15, 'contusion': 14, 'tendinosa': 8,
+    'articular': 7, 'osea': 5, 'meniscal': 3, 'otra': 3,
+}
+PESOS_REGION = {
+    'muslo_post_der': 10, 'muslo_post_izq': 10, 'muslo_ant_der': 5, 'muslo_ant_izq': 5,
+    'tobillo_der': 8, 'tobillo_izq': 8, 'rodilla_der': 7, 'rodilla_izq': 7,
+    'pantorrilla_der': 5, 'pantorrilla_izq': 5, 'cadera_der': 3, 'cadera_izq': 3,
+    'pie_der': 3, 'pie_izq': 3, 'columna_lumbar': 3, 'pelvis': 2, 'hombro_der': 2,
+    'hombro_izq': 2, 'cabeza': 2, 'facial': 1, 'muneca_der': 1, 'mano_izq': 1, 'otra': 2,
+}
+PESOS_GRAVEDAD = {'leve': 45, 'moderada': 35, 'grave': 15, 'severa': 5}
+# Días de recuperación (mínimo, máximo) por gravedad
+DURACION_GRAVEDAD = {'leve': (1, 7), 'moderada': (8, 28), 'grave': (29, 90), 'severa': (90, 240)}
+PESOS_MECANISMO = {'sin_contacto': 35, 'contacto': 30, 'sobrecarga': 20, 'traumatico': 8, 'indirecto': 5, 'otro': 2}
+PESOS_CONDICION = {'aguda': 70, 'sobreaguda': 10, 'recidivante': 12, 'cronica': 8}
+PESOS_ETAPA = {'competencia': 40, 'entrenamiento': 30, 'partido': 15, 'pretemporada': 10, 'amistoso': 3, 'posttemporada': 2}
+PESOS_ESTADO_ATENCION = {'tratamiento': 55, 'control': 25, 'alta': 12, 'derivado': 5, 'otro': 3}
+PRESTACIONES = ['Masoterapia', 'Electroterapia', 'Crioterapia', 'Ejercicio terapéutico', 'Vendaje funcional', 'Punción seca']
+
+
+def rut_con_formato(numero):
+    return formatear_rut(f'{numero}{digito_verificador_rut(str(numero))}')
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos de varias temporadas con inserciones por lotes (para pruebas de carga)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--divisiones', type=int, default=6, help=f'Máximo {len(DIVISIONES)}')
+        parser.add_argument('--jugadores', type=int, default=2000)
+        parser.add_argument('--temporadas', type=int, default=3, help='Temporadas hacia atrás desde hoy')
+        parser.add_argument('--lesiones-por-temporada', type=float, default=1.6,
+                            help='Promedio de lesiones por jugador y temporada')
+        parser.add_argument('--atenciones-por-temporada', type=float, default=30,
+                            help='Promedio de atenciones kinésicas por jugador y temporada')
+        parser.add_argument('--partidos-por-temporada', type=int, default=40)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['semilla'])
+        self.batch_size = options['batch_size']
+        self.hoy = datetime.date.today()
+        self.inicio = self.hoy - datetime.timedelta(days=365 * options['temporadas'])
+        self.profesionales = list(User.objects.filter(is_active=True).values_list('pk', flat=True)) or [None]
+        inicio = time.monotonic()
+
+        with transaction.atomic():
+            divisiones = self.crear_divisiones(min(options['divisiones'], len(DIVISIONES)))
+            jugadores = self.crear_jugadores(options['jugadores'], divisiones)
+            lesiones = self.crear_lesiones(jugadores, options['lesiones_por_temporada'] * options['temporadas'])
+            self.crear_estados_diarios(lesiones)
+            self.crear_atenciones(jugadores, options['atenciones_por_temporada'] * options['temporadas'])
+            self.crear_partidos(
+                [jugador for jugador in jugadores if jugador.division_id == divisiones[0].pk],
+                options['partidos_por_temporada'] * options['temporadas'],
+            )
+            self.paso('Resumen diario de lesiones', reconstruir_resumen_lesiones())
+            self.paso('Intervalos de estado', recalcular_intervalos(None, batch_size=self.batch_size))
+            self.paso('Resumen clínico por jugador', actualizar_resumen_clinico(batch_size=self.batch_size))
+            InformeLesionesSnapshot.objects.all().delete()
+
+        self.stdout.write(self.style.SUCCESS(f'Datos generados en {time.monotonic() - inicio:.1f} s'))
+
+    def paso(self, nombre, cantidad):
+        self.stdout.write(f'  {nombre}: {cantidad:,}')
+
+    def elegir(self, pesos):
+        return self.rng.choices(list(pesos), weights=list(pesos.values()))[0]
+
+    def fecha_aleatoria(self, desde, hasta):
+        return desde + datetime.timedelta(days=self.rng.randint(0, max((hasta - desde).days, 0)))
+
+    def insertar(self, modelo, objetos):
+        """bulk_create por lotes sin materializar todos los objetos a la vez"""
+        objetos = iter(objetos)
+        total = 0
+        while True:
+            lote = list(itertools.islice(objetos, self.batch_size))
+            if not lote:
+                return total
+            modelo.objects.bulk_create(lote, batch_size=self.batch_size)
+            total += len(lote)
+
+    def crear_divisiones(self, cantidad):
+        divisiones = []
+        for nombre in DIVISIONES[:cantidad]:
+            division, _ = Division.objects.get_or_create(nombre=nombre)
+            divisiones.append(division)
+        return divisiones
+
+    def crear_jugadores(self, cantidad, divisiones):
+        ruts_existentes = set(Jugador.objects.values_list('rut', flat=True))
+        # El primer equipo concentra más jugadores que las divisiones formativas
+        pesos_division = [3] + [1] * (len(divisiones) - 1)
+
+        jugadores = []
+        numeros = self.rng.sample(range(10_000_000, 27_000_000), cantidad + len(ruts_existentes))
+        for numero in numeros:
+            rut = rut_con_formato(numero)
+            if rut in ruts_existentes:
+                continue
+            division = self.rng.choices(divisiones, weights=pesos_division)[0]
+            edad = self.rng.randint(14, 34) if division is divisiones[0] else self.rng.randint(13, 19)
+            jugadores.append(Jugador(
+                rut=rut,
+                nombres=self.rng.choice(NOMBRES),
+                apellidos=f'{self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}',
+                fecha_nacimiento=self.hoy - datetime.timedelta(days=365 * edad + self.rng.randint(0, 364)),
+                lateralidad=self.rng.choices(['diestro', 'zurdo', 'ambidiestro'], weights=[75, 22, 3])[0],
+                peso_kg=round(self.rng.gauss(72, 7), 2),
+                estatura_cm=int(self.rng.gauss(177, 7)),
+                prevision_salud=self.rng.choices(['fonasa', 'isapre', 'otra'], weights=[60, 35, 5])[0],
+                division=division,
+                activo=self.rng.random() > 0.05,
+            ))
+            if len(jugadores) == cantidad:
+                break
+        Jugador.asignar_fichas(jugadores)
+        Jugador.objects.bulk_create(jugadores, batch_size=self.batch_size)
+        self.paso('Jugadores', len(jugadores))
+        return jugadores
+
+    def crear_lesiones(self, jugadores, promedio_por_jugador):
+        lesiones = []
+        for jugador in jugadores:
+            for _ in range(self.poisson(promedio_por_jugador)):
+                gravedad = self.elegir(PESOS_GRAVEDAD)
+                dias = self.rng.randint(*DURACION_GRAVEDAD[gravedad])
+                fecha_lesion = self.fecha_aleatoria(self.inicio, self.hoy)
+                fecha_fin = fecha_lesion + datetime.timedelta(days=dias)
+                activa = fecha_fin > self.hoy
+                lesiones.append(Lesion(
+                    jugador=jugador,
+                    fecha_lesion=fecha_lesion,
+                    diagnostico_medico=f'Lesión {gravedad} ({dias} días estimados)',
+                    esta_activa=activa,
+                    fecha_fin=None if activa else fecha_fin,
+                    tipo_lesion=self.elegir(PESOS_TIPO_LESION),
+                    region_cuerpo=self.elegir(PESOS_REGION),
+                    mecanismo_lesional=self.elegir(PESOS_MECANISMO),
+                    condicion_lesion=self.elegir(PESOS_CONDICION),
+                    etapa_deportiva_lesion=self.elegir(PESOS_ETAPA),
+                    gravedad_lesion=gravedad,
+                    dias_recuperacion_estimados=dias,
+                    dias_recuperacion_reales=None if activa else max(1, int(dias * self.rng.uniform(0.8, 1.3))),
+                ))
+        Lesion.objects.bulk_create(lesiones, batch_size=self.batch_size)
+        self.paso('Lesiones', len(lesiones))
+        return lesiones
+
+    def crear_estados_diarios(self, lesiones):
+        """Un estado por día de lesión: camilla, luego gimnasio y al final reintegro"""
+        def estados():
+            for lesion in lesiones:
+                fin = min(lesion.fecha_fin or self.hoy, self.hoy)
+                dias = (fin - lesion.fecha_lesion).days + 1
+                fin_camilla = max(1, int(dias * self.rng.uniform(0.2, 0.4)))
+                fin_gimnasio = max(fin_camilla, int(dias * self.rng.uniform(0.7, 0.9)))
+                for dia in range(dias):
+                    estado = 'camilla' if dia < fin_camilla else 'gimnasio' if dia < fin_gimnasio else 'reintegro'
+                    yield EstadoDiarioLesion(
+                        lesion=lesion,
+                        fecha=lesion.fecha_lesion + datetime.timedelta(days=dia),
+                        estado=estado,
+                        registrado_por_id=self.rng.choice(self.profesionales),
+                    )
+        self.paso('Estados diarios', self.insertar(EstadoDiarioLesion, estados()))
+
+    def crear_atenciones(self, jugadores, promedio_por_jugador):
+        zona = datetime.timezone.utc
+        def atenciones():
+            for jugador in jugadores:
+                for _ in range(self.poisson(promedio_por_jugador)):
+                    fecha = self.fecha_aleatoria(self.inicio, self.hoy)
+                    yield AtencionKinesica(
+                        jugador=jugador,
+                        profesional_a_cargo_id=self.rng.choice(self.profesionales),
+                        fecha_atencion=datetime.datetime(
+                            fecha.year, fecha.month, fecha.day, self.rng.randint(8, 19), self.rng.choice([0, 15, 30, 45]),
+                            tzinfo=zona,
+                        ),
+                        motivo_consulta='Control kinésico',
+                        prestaciones_realizadas=', '.join(self.rng.sample(PRESTACIONES, self.rng.randint(1, 3))),
+                        estado_actual=self.elegir(PESOS_ESTADO_ATENCION),
+                    )
+        self.paso('Atenciones kinésicas', self.insertar(AtencionKinesica, atenciones()))
+
+    def crear_partidos(self, plantel, cantidad):
+        if not plantel:
+            return
+        dias_entre_partidos = max(1, (self.hoy - self.inicio).days // max(cantidad, 1))
+        partidos = Partido.objects.bulk_create([
+            Partido(
+                fecha=self.inicio + datetime.timedelta(days=dias_entre_partidos * k),
+                rival=self.rng.choice(RIVALES),
+                condicion=self.rng.choice(['local', 'visitante']),
+            )
+            for k in range(cantidad)
+        ], batch_size=self.batch_size)
+        self.paso('Partidos', len(partidos))
+
+        Convocatoria = Partido.convocados.through
+        convocatorias = {
+            partido: self.rng.sample(plantel, min(len(plantel), self.rng.randint(18, 22)))
+            for partido in partidos
+        }
+        self.paso('Convocatorias', self.insertar(Convocatoria, (
+            Convocatoria(partido=partido, jugador=jugador)
+            for partido, jugadores in convocatorias.items() for jugador in jugadores
+        )))
+
+        def checklists():
+            for partido, jugadores in convocatorias.items():
+                for jugador in jugadores:
+                    dolor = self.rng.random() < 0.15
+                    yield ChecklistPostPartido(
+                        jugador=jugador,
+                        partido=partido,
+                        realizado_por_id=self.rng.choice(self.profesionales),
+                        dolor_molestia=dolor,
+                        intensidad_dolor=str(self.rng.choices(range(1, 11), weights=[8, 10, 12, 12, 10, 8, 5, 3, 2, 1])[0]) if dolor else None,
+                    )
+        self.paso('Checklists post-partido', self.insertar(ChecklistPostPartido, checklists()))
+
+    def poisson(self, promedio):
+        """Variable de Poisson (algoritmo de Knuth; suficiente para promedios chicos)"""
+        if promedio > 30:
+            return max(0, round(self.rng.gauss(promedio, promedio ** 0.5)))
+        limite, k, producto = pow(2.718281828459045, -promedio), 0, self.rng.random()
+        while producto > limite:
+            k += 1
+            producto *= self.rng.random()
+        return k
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_clinica.importacion import COLUMNAS_OBLIGATORIAS, COLUMNAS_OPCIONALES, importar_jugadores, leer_filas
+from gestion_clinica.models import Division
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa jugadores desde un CSV o XLSX. Columnas obligatorias: '
+        f'{", ".join(COLUMNAS_OBLIGATORIAS)}; opcionales: {", ".join(COLUMNAS_OPCIONALES)}'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al .csv o .xlsx')
+        parser.add_argument('--division', help='División (nombre) para las filas sin columna division')
+        parser.add_argument('--simular', action='store_true', help='Sólo valida, no guarda nada')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por INSERT')
+
+    def handle(self, *args, **options):
+        division = None
+        if options['division']:
+            division = Division.objects.filter(nombre__iexact=options['division']).first()
+            if division is None:
+                raise CommandError(f"División no encontrada: {options['division']}")
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_jugadores(
+                    leer_filas(archivo, options['archivo']), division=division,
+                    batch_size=options['batch_size'], simular=options['simular'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in resultado['errores']:
+            detalle = '; '.join(f'{campo}: {" ".join(mensajes)}' for campo, mensajes in error['errores'].items())
+            self.stderr.write(f"Fila {error['fila']}: {detalle}")
+        if resultado['errores']:
+            raise CommandError(f"{len(resultado['errores'])} de {resultado['filas']} filas con errores; no se importó nada")
+        if options['simular']:
+            self.stdout.write(self.style.SUCCESS(f"{resultado['filas']} filas válidas (simulación, no se guardó nada)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Jugadores importados: {resultado['creados']}"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestion_clinica.models import recalcular_intervalos
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los intervalos de estado de las lesiones desde EstadoDiarioLesion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lesion', type=int, action='append', dest='lesiones',
+                            help='Reconstruir sólo esta lesión (se puede repetir)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Filas por INSERT al recrear los intervalos')
+
+    def handle(self, *args, **options):
+        total = recalcular_intervalos(options['lesiones'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Intervalos de estado reconstruidos: {total}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestion_clinica.models import actualizar_resumen_clinico
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen clínico de los jugadores desde lesiones, atenciones, checklists y estados diarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jugador', type=int, action='append', dest='jugadores',
+                            help='Recalcular sólo este jugador (se puede repetir)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Filas por INSERT al guardar los resúmenes')
+
+    def handle(self, *args, **options):
+        total = actualizar_resumen_clinico(options['jugadores'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Resumen clínico recalculado: {total} jugadores'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from gestion_clinica.models import reconstruir_resumen_lesiones
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de lesiones desde Lesion y EstadoDiarioLesion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Filas por INSERT al recrear el resumen')
+
+    def handle(self, *args, **options):
+        total = reconstruir_resumen_lesiones(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario de lesiones reconstruido: {total} filas'))
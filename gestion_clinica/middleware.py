@@ -0,0 +1,176 @@
+"""
+Instrumentación por petición: cantidad de consultas SQL, tiempo en base de
+datos, tiempo de serialización y tiempo total.
+
+Los valores se acumulan en un histograma por endpoint (vista + acción) que
+se lee desde /api/metricas/rendimiento/. El histograma vive en memoria de
+cada proceso y guarda las últimas METRICAS_MUESTRAS_POR_ENDPOINT peticiones.
+
+También se devuelven en la cabecera Server-Timing, pero sólo a quien indica
+SERVER_TIMING (por defecto, usuarios staff): revelan cuánto trabaja la base
+de datos en cada endpoint.
+
+El tiempo de serialización se mide envolviendo BaseSerializer.data para
+todo el proceso; METRICAS_SERIALIZACION = False lo evita.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .conf import config
+
+_medicion_actual = threading.local()
+
+
+class Medicion:
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_serializacion = 0.0
+        self.profundidad_serializacion = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper de Django: cuenta y mide cada consulta"""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.tiempo_db += time.perf_counter() - inicio
+
+
+def _medir_data(data_original):
+    """
+    Envuelve BaseSerializer.data para sumar el tiempo de serialización.
+    Sólo cuenta la llamada más externa: los .data anidados ya están dentro.
+    """
+    def data(self):
+        medicion = getattr(_medicion_actual, 'medicion', None)
+        if medicion is None:
+            return data_original(self)
+        medicion.profundidad_serializacion += 1
+        inicio = time.perf_counter()
+        try:
+            return data_original(self)
+        finally:
+            medicion.profundidad_serializacion -= 1
+            if medicion.profundidad_serializacion == 0:
+                medicion.tiempo_serializacion += time.perf_counter() - inicio
+    data._medido = True
+    return property(data)
+
+
+def instrumentar_serializers():
+    if not getattr(BaseSerializer.data.fget, '_medido', False):
+        BaseSerializer.data = _medir_data(BaseSerializer.data.fget)
+
+
+class HistogramaEndpoints:
+    """Últimas N mediciones por endpoint, con percentiles"""
+    METRICAS = ('total_ms', 'db_ms', 'serializacion_ms', 'consultas')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._muestras = defaultdict(lambda: deque(maxlen=config('METRICAS_MUESTRAS_POR_ENDPOINT')))
+
+    def registrar(self, endpoint, muestra):
+        with self._lock:
+            self._muestras[endpoint].append(muestra)
+
+    def reiniciar(self):
+        with self._lock:
+            self._muestras.clear()
+
+    def resumen(self):
+        with self._lock:
+            copia = {endpoint: list(muestras) for endpoint, muestras in self._muestras.items()}
+        resultado = {}
+        for endpoint, muestras in sorted(copia.items()):
+            resultado[endpoint] = {'peticiones': len(muestras)}
+            for indice, metrica in enumerate(self.METRICAS):
+                valores = sorted(muestra[indice] for muestra in muestras)
+                resultado[endpoint][metrica] = {
+                    'p50': percentil(valores, 50),
+                    'p95': percentil(valores, 95),
+                    'max': valores[-1],
+                }
+        return resultado
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano"""
+    indice = max(0, -(-len(valores_ordenados) * p // 100) - 1)
+    return valores_ordenados[int(indice)]
+
+
+histograma = HistogramaEndpoints()
+
+
+def nombre_endpoint(request, view_func):
+    """
+    'JugadorViewSet.list', 'InformeLesionesView.get', 'login_view.post'...
+    """
+    clase = getattr(view_func, 'cls', None)
+    metodo = request.method.lower()
+    if clase is None:
+        return f'{view_func.__name__}.{metodo}'
+    acciones = getattr(view_func, 'actions', None) or {}
+    return f'{clase.__name__}.{acciones.get(metodo, metodo)}'
+
+
+def mostrar_server_timing(request):
+    """
+    Según SERVER_TIMING. El usuario es el que autenticó DRF, que lo deja
+    también en el HttpRequest.
+    """
+    modo = config('SERVER_TIMING')
+    if modo == 'todos':
+        return True
+    if modo == 'staff':
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+    return False
+
+
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if config('METRICAS_SERIALIZACION'):
+            instrumentar_serializers()
+
+    def __call__(self, request):
+        medicion = Medicion()
+        _medicion_actual.medicion = medicion
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexion in connections.all():
+                    stack.enter_context(conexion.execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            _medicion_actual.medicion = None
+        total = time.perf_counter() - inicio
+
+        muestra = (
+            round(total * 1000, 2),
+            round(medicion.tiempo_db * 1000, 2),
+            round(medicion.tiempo_serializacion * 1000, 2),
+            medicion.consultas,
+        )
+        if mostrar_server_timing(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={muestra[1]};desc="{medicion.consultas} consultas"',
+                f'serializacion;dur={muestra[2]}',
+                f'total;dur={muestra[0]}',
+            ])
+        endpoint = getattr(request, '_endpoint_instrumentado', None)
+        if endpoint:
+            histograma.registrar(endpoint, muestra)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._endpoint_instrumentado = nombre_endpoint(request, view_func)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0018_asignar_admin_inicial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atencionkinesica',
+            index=models.Index(fields=['-fecha_atencion', '-id'], name='atencion_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atencionkinesica',
+            index=models.Index(fields=['jugador', '-fecha_atencion', '-id'], name='atencion_jug_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estadodiariolesion',
+            index=models.Index(fields=['-fecha', '-id'], name='estado_diario_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesion',
+            index=models.Index(fields=['-fecha_lesion', '-id'], name='lesion_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesion',
+            index=models.Index(fields=['jugador', '-fecha_lesion', '-id'], name='lesion_jug_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(fields=['-fecha', '-id'], name='partido_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:16
+
+import django.db.models.deletion
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_resumen(apps, schema_editor):
+    """
+    Carga inicial del resumen con los datos existentes (misma lógica que
+    reconstruir_resumen_lesiones, con los modelos históricos)
+    """
+    Lesion = apps.get_model('gestion_clinica', 'Lesion')
+    EstadoDiarioLesion = apps.get_model('gestion_clinica', 'EstadoDiarioLesion')
+    ResumenDiarioLesiones = apps.get_model('gestion_clinica', 'ResumenDiarioLesiones')
+    clasificacion = ('tipo_lesion', 'gravedad_lesion', 'region_cuerpo')
+
+    filas = defaultdict(Counter)
+    consultas = [
+        (Lesion.objects.all(), 'fecha_lesion', '', 'nuevas_lesiones', None),
+        (Lesion.objects.filter(fecha_fin__isnull=False), 'fecha_fin', '', 'lesiones_finalizadas', None),
+        (EstadoDiarioLesion.objects.all(), 'fecha', 'lesion__', 'cambios_diarios', 'estado'),
+    ]
+    for queryset, campo_fecha, prefijo, contador, campo_estado in consultas:
+        campos = [campo_fecha, f'{prefijo}jugador__division'] + [prefijo + campo for campo in clasificacion]
+        if campo_estado:
+            campos.append(campo_estado)
+        for *clave, total in queryset.order_by().values_list(*campos).annotate(total=Count('pk')):
+            if not campo_estado:
+                clave.append('')
+            filas[tuple(clave)][contador] += total
+
+    ResumenDiarioLesiones.objects.bulk_create([
+        ResumenDiarioLesiones(
+            fecha=fecha, division_id=division_id, tipo_lesion=tipo or '',
+            gravedad_lesion=gravedad or '', region_cuerpo=region or '', estado=estado or '',
+            **contadores
+        )
+        for (fecha, division_id, tipo, gravedad, region, estado), contadores in filas.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0019_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioLesiones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo_lesion', models.CharField(blank=True, max_length=100)),
+                ('gravedad_lesion', models.CharField(blank=True, max_length=50)),
+                ('region_cuerpo', models.CharField(blank=True, max_length=100)),
+                ('estado', models.CharField(blank=True, max_length=20)),
+                ('nuevas_lesiones', models.PositiveIntegerField(default=0)),
+                ('lesiones_finalizadas', models.PositiveIntegerField(default=0)),
+                ('cambios_diarios', models.PositiveIntegerField(default=0)),
+                ('division', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_lesiones', to='gestion_clinica.division')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Lesiones',
+                'verbose_name_plural': 'Resúmenes Diarios de Lesiones',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['fecha', 'division'], name='resumen_lesiones_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0020_resumen_diario_lesiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InformeLesionesSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='SHA-256 de tipo, fechas y filtros', max_length=64, unique=True)),
+                ('tipo', models.CharField(max_length=20)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('contenido', models.TextField()),
+                ('etag', models.CharField(max_length=64)),
+                ('valido_hasta', models.DateField(blank=True, help_text='Último día en que el contenido es válido si depende de la fecha actual', null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Informe de Lesiones',
+                'verbose_name_plural': 'Snapshots de Informes de Lesiones',
+                'indexes': [models.Index(fields=['fecha_inicio', 'fecha_fin'], name='snapshot_informe_rango_idx')],
+            },
+        ),
+    ]
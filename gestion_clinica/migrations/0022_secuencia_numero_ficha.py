@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+def inicializar_secuencia_fichas(apps, schema_editor):
+    """
+    La secuencia parte desde el mayor número de ficha numérico existente
+    (comparado como número, no como texto)
+    """
+    Jugador = apps.get_model('gestion_clinica', 'Jugador')
+    Secuencia = apps.get_model('gestion_clinica', 'Secuencia')
+    fichas = Jugador.objects.exclude(numero_ficha__isnull=True).values_list('numero_ficha', flat=True)
+    ultimo = max((int(ficha) for ficha in fichas.iterator() if ficha.isdigit()), default=0)
+    Secuencia.objects.update_or_create(nombre='numero_ficha', defaults={'ultimo_valor': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0021_snapshots_informe_lesiones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_valor', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia',
+                'verbose_name_plural': 'Secuencias',
+            },
+        ),
+        migrations.RunPython(inicializar_secuencia_fichas, migrations.RunPython.noop),
+    ]
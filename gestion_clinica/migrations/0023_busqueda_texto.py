@@ -0,0 +1,90 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:38
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Tabla -> columnas que forman su tsvector. Si cambian, hay que recrear el
+# trigger en una migración nueva.
+COLUMNAS_VECTOR = {
+    'gestion_clinica_lesion': ['diagnostico_medico', 'observaciones_lesion'],
+    'gestion_clinica_atencionkinesica': ['motivo_consulta', 'prestaciones_realizadas', 'observaciones'],
+    'gestion_clinica_estadodiariolesion': ['observaciones'],
+    'gestion_clinica_archivomedico': ['titulo_descripcion', 'observaciones'],
+    'gestion_clinica_checklistpostpartido': [
+        'diagnostico_presuntivo_postpartido', 'tratamiento_inmediato_realizado', 'observaciones_checklist'
+    ],
+}
+
+# Columnas con índice de trigramas (búsqueda por nombre y RUT)
+COLUMNAS_TRIGRAMA = {
+    'gestion_clinica_jugador': ['rut', 'nombres', 'apellidos'],
+}
+
+
+def crear_indices_busqueda(apps, schema_editor):
+    """
+    Sólo en PostgreSQL: extensión pg_trgm, trigger que mantiene `busqueda`
+    en cada INSERT/UPDATE (también en bulk_create y update()), carga
+    inicial de los vectores e índices GIN.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, columnas in COLUMNAS_VECTOR.items():
+        schema_editor.execute(
+            f'CREATE TRIGGER {tabla}_busqueda_trg BEFORE INSERT OR UPDATE OF {", ".join(columnas)} ON {tabla} '
+            f"FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(busqueda, 'pg_catalog.spanish', {', '.join(columnas)})"
+        )
+        texto = " || ' ' || ".join(f"coalesce({columna}, '')" for columna in columnas)
+        schema_editor.execute(f"UPDATE {tabla} SET busqueda = to_tsvector('pg_catalog.spanish', {texto})")
+        schema_editor.execute(f'CREATE INDEX {tabla}_busqueda_idx ON {tabla} USING gin (busqueda)')
+    for tabla, columnas in COLUMNAS_TRIGRAMA.items():
+        for columna in columnas:
+            schema_editor.execute(f'CREATE INDEX {tabla}_{columna}_trgm_idx ON {tabla} USING gin ({columna} gin_trgm_ops)')
+
+
+def eliminar_indices_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for tabla in COLUMNAS_VECTOR:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_busqueda_trg ON {tabla}')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_idx')
+    for tabla, columnas in COLUMNAS_TRIGRAMA.items():
+        for columna in columnas:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_{columna}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0022_secuencia_numero_ficha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivomedico',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='atencionkinesica',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='checklistpostpartido',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='estadodiariolesion',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesion',
+            name='busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_indices_busqueda, eliminar_indices_busqueda),
+    ]
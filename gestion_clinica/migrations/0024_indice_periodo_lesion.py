@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:02
+
+from django.db import migrations
+
+# Misma expresión que disponibilidad.PeriodoLesion: si cambia una, hay que
+# cambiar la otra o el índice deja de usarse.
+EXPRESION_PERIODO = (
+    "daterange(fecha_lesion, CASE WHEN fecha_fin < fecha_lesion THEN fecha_lesion ELSE fecha_fin END, '[)')"
+)
+
+
+def crear_indice_periodo(apps, schema_editor):
+    """Sólo en PostgreSQL: índice GiST sobre el intervalo de cada lesión"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX lesion_periodo_gist_idx ON gestion_clinica_lesion USING gist (({EXPRESION_PERIODO}))'
+    )
+
+
+def eliminar_indice_periodo(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS lesion_periodo_gist_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0023_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_periodo, eliminar_indice_periodo),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compactar_historial(apps, schema_editor):
+    """Carga inicial de los intervalos desde los estados diarios existentes"""
+    EstadoDiarioLesion = apps.get_model('gestion_clinica', 'EstadoDiarioLesion')
+    IntervaloEstadoLesion = apps.get_model('gestion_clinica', 'IntervaloEstadoLesion')
+    filas = EstadoDiarioLesion.objects.order_by('lesion_id', 'fecha').values_list('lesion_id', 'fecha', 'estado')
+    lote, actual = [], None
+    for lesion_id, fecha, estado in filas.iterator(chunk_size=2000):
+        if actual is not None and actual.lesion_id == lesion_id and actual.estado == estado:
+            actual.hasta = fecha
+            actual.dias_registrados += 1
+            continue
+        actual = IntervaloEstadoLesion(lesion_id=lesion_id, estado=estado, desde=fecha, hasta=fecha, dias_registrados=1)
+        lote.append(actual)
+        if len(lote) > 1000:
+            # El último puede seguir creciendo: se guarda con el próximo lote
+            IntervaloEstadoLesion.objects.bulk_create(lote[:-1])
+            lote = lote[-1:]
+    IntervaloEstadoLesion.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0024_indice_periodo_lesion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntervaloEstadoLesion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('camilla', 'Tratamiento en Camilla'), ('gimnasio', 'Tratamiento en Gimnasio'), ('reintegro', 'Reintegro Deportivo')], max_length=20)),
+                ('desde', models.DateField()),
+                ('hasta', models.DateField()),
+                ('dias_registrados', models.PositiveIntegerField(default=1, help_text='Registros diarios que abarca el tramo')),
+                ('lesion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervalos_estado', to='gestion_clinica.lesion')),
+            ],
+            options={
+                'verbose_name': 'Intervalo de Estado de Lesión',
+                'verbose_name_plural': 'Intervalos de Estado de Lesiones',
+                'ordering': ['lesion', 'desde'],
+                'unique_together': {('lesion', 'desde')},
+            },
+        ),
+        migrations.RunPython(compactar_historial, migrations.RunPython.noop),
+    ]
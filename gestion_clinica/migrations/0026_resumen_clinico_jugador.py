@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+GRAVEDADES = ['leve', 'moderada', 'grave', 'severa']
+ESTADOS_LIMITADOS = {'gimnasio', 'reintegro'}
+
+
+def poblar_resumen_clinico(apps, schema_editor):
+    """Carga inicial: un resumen por jugador, con los datos existentes"""
+    Jugador = apps.get_model('gestion_clinica', 'Jugador')
+    Lesion = apps.get_model('gestion_clinica', 'Lesion')
+    EstadoDiarioLesion = apps.get_model('gestion_clinica', 'EstadoDiarioLesion')
+    AtencionKinesica = apps.get_model('gestion_clinica', 'AtencionKinesica')
+    ChecklistPostPartido = apps.get_model('gestion_clinica', 'ChecklistPostPartido')
+    JugadorResumenClinico = apps.get_model('gestion_clinica', 'JugadorResumenClinico')
+
+    ultimo_estado = EstadoDiarioLesion.objects.filter(lesion=OuterRef('pk')).order_by('-fecha').values('estado')[:1]
+    activas = {}
+    for jugador_id, gravedad, estado in Lesion.objects.filter(esta_activa=True).annotate(
+        estado=Subquery(ultimo_estado)
+    ).values_list('jugador_id', 'gravedad_lesion', 'estado').iterator():
+        activas.setdefault(jugador_id, []).append((gravedad, estado))
+    atenciones = dict(
+        AtencionKinesica.objects.order_by('jugador_id', 'fecha_atencion').values_list('jugador_id', 'fecha_atencion')
+    )
+    checklists = {
+        jugador_id: (dolor, intensidad)
+        for jugador_id, dolor, intensidad in ChecklistPostPartido.objects.order_by(
+            'jugador_id', 'partido__fecha', 'fecha_registro_checklist'
+        ).values_list('jugador_id', 'dolor_molestia', 'intensidad_dolor').iterator()
+    }
+
+    resumenes = []
+    for jugador_id in Jugador.objects.values_list('pk', flat=True).iterator():
+        lesiones = activas.get(jugador_id, [])
+        if not lesiones:
+            disponibilidad = 'disponible'
+        elif all(estado in ESTADOS_LIMITADOS for _, estado in lesiones):
+            disponibilidad = 'limitado'
+        else:
+            disponibilidad = 'no_disponible'
+        gravedades = [gravedad for gravedad, _ in lesiones if gravedad in GRAVEDADES]
+        dolor, intensidad = checklists.get(jugador_id, (None, None))
+        resumenes.append(JugadorResumenClinico(
+            jugador_id=jugador_id, lesiones_activas=len(lesiones),
+            peor_gravedad_activa=max(gravedades, key=GRAVEDADES.index, default=''),
+            ultima_atencion=atenciones.get(jugador_id), ultimo_dolor_molestia=dolor,
+            ultima_intensidad_dolor=int(intensidad) if intensidad else None,
+            disponibilidad=disponibilidad,
+        ))
+    JugadorResumenClinico.objects.bulk_create(resumenes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_clinica', '0025_intervalos_estado_lesion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JugadorResumenClinico',
+            fields=[
+                ('jugador', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_clinico', serialize=False, to='gestion_clinica.jugador')),
+                ('lesiones_activas', models.PositiveIntegerField(default=0)),
+                ('peor_gravedad_activa', models.CharField(blank=True, choices=[('leve', 'Leve (1-7 días)'), ('moderada', 'Moderada (8-28 días)'), ('grave', 'Grave (> 28 días)'), ('severa', 'Severa (requiere cirugía)')], max_length=50)),
+                ('ultima_atencion', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_dolor_molestia', models.BooleanField(blank=True, help_text='Del checklist del último partido', null=True)),
+                ('ultima_intensidad_dolor', models.PositiveSmallIntegerField(blank=True, help_text='Del checklist del último partido', null=True)),
+                ('disponibilidad', models.CharField(choices=[('disponible', 'Disponible'), ('limitado', 'Limitado'), ('no_disponible', 'No disponible')], default='disponible', max_length=20)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen Clínico de Jugador',
+                'verbose_name_plural': 'Resúmenes Clínicos de Jugadores',
+            },
+        ),
+        migrations.RunPython(poblar_resumen_clinico, migrations.RunPython.noop),
+    ]
@@ -4,19 +4,39 @@ from django.conf import settings  # Para referenciar al User model
 from django.core.exceptions import ValidationError
 from multiselectfield import MultiSelectField
 import re
+import threading
+from collections import Counter, defaultdict
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import post_save
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_save, post_delete
 from django.dispatch import receiver
+from .roles import invalidar_roles
+from .autocompletar import invalidar_indice_jugadores
+
+def digito_verificador_rut(cuerpo):
+    """Dígito verificador (módulo 11) del cuerpo numérico de un RUT"""
+    suma = 0
+    multiplo = 2
+    for r in reversed(cuerpo):
+        suma += int(r) * multiplo
+        multiplo = multiplo + 1 if multiplo < 7 else 2
+    resto = suma % 11
+    return '0' if resto == 0 else 'K' if resto == 1 else str(11 - resto)
+
+def formatear_rut(rut_limpio):
+    """'199761943' -> '19.976.194-3'"""
+    return f'{int(rut_limpio[:-1]):,}'.replace(',', '.') + f'-{rut_limpio[-1].upper()}'
 
 # Validador personalizado para RUT chileno
 def validar_rut_chileno(value):
     try:
-        print(f"Validando RUT: {value}")  # Debug
         # Eliminar puntos y guión
         rut_limpio = re.sub(r'[^0-9kK]', '', value)
-        print(f"RUT limpio: {rut_limpio}")  # Debug
     
         if len(rut_limpio) < 2:
             raise ValidationError('El RUT debe tener al menos 2 caracteres')
@@ -33,27 +53,13 @@ def validar_rut_chileno(value):
         if len(cuerpo) < 7 or len(cuerpo) > 8:
             raise ValidationError('El RUT debe tener entre 7 y 8 dígitos antes del dígito verificador')
         
-        # Calcular dígito verificador
-        suma = 0
-        multiplo = 2
-    
-        for r in reversed(cuerpo):
-            suma += int(r) * multiplo
-            multiplo = multiplo + 1 if multiplo < 7 else 2
-    
-        resto = suma % 11
-        dv_calculado = '0' if resto == 0 else 'K' if resto == 1 else str(11 - resto)
-        
-        print(f"DV calculado: {dv_calculado}, DV recibido: {dv}")  # Debug
-    
-        if dv != dv_calculado:
+        if dv != digito_verificador_rut(cuerpo):
             raise ValidationError('El RUT ingresado no es válido')
             
         return rut_limpio  # Retornar el RUT limpio
     except ValidationError:
         raise
     except Exception as e:
-        print(f"Error inesperado validando RUT: {str(e)}")  # Debug
         raise ValidationError(f'Error al validar RUT: {str(e)}')
 
 # Create your models here.
@@ -66,9 +72,119 @@ def ruta_foto_perfil_jugador(instance, filename):
     # La foto se subirá a MEDIA_ROOT/jugadores/fotos_perfil/jugador_<id>/<filename>
     return f'jugadores/fotos_perfil/jugador_{instance.id}/{filename}'
 
+def conteo_relacionado(modelo, campo, **filtros):
+    """
+    Subconsulta correlacionada que cuenta las filas de `modelo` cuyo `campo`
+    apunta a la fila externa. Se resuelve en la misma consulta que el padre
+    y, a diferencia de Count() con joins, se puede combinar sin duplicar filas.
+    """
+    subconsulta = (
+        modelo._default_manager.filter(**{campo: OuterRef('pk')}, **filtros)
+        .order_by()
+        .values(campo)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(subconsulta, output_field=IntegerField()), 0)
+
+class ConteosQuerySet(models.QuerySet):
+    """
+    QuerySet con anotaciones de conteo reutilizables.
+    Cada subclase declara en `conteos` un diccionario nombre -> función que
+    devuelve la expresión (se evalúa en tiempo de consulta para poder
+    referenciar modelos definidos más abajo).
+    """
+    conteos = {}
+
+    def con_conteos(self, *nombres):
+        nombres = nombres or tuple(self.conteos)
+        return self.annotate(**{nombre: self.conteos[nombre]() for nombre in nombres})
+
+class DivisionQuerySet(ConteosQuerySet):
+    conteos = {
+        'cantidad_jugadores': lambda: conteo_relacionado(Jugador, 'division', activo=True),
+        'cantidad_lesiones_activas': lambda: conteo_relacionado(Lesion, 'jugador__division', esta_activa=True),
+    }
+
+class JugadorQuerySet(ConteosQuerySet):
+    conteos = {
+        'cantidad_lesiones_activas': lambda: conteo_relacionado(Lesion, 'jugador', esta_activa=True),
+        'cantidad_atenciones': lambda: conteo_relacionado(AtencionKinesica, 'jugador'),
+        'cantidad_checklists_con_dolor': lambda: conteo_relacionado(ChecklistPostPartido, 'jugador', dolor_molestia=True),
+    }
+
+class PartidoQuerySet(ConteosQuerySet):
+    conteos = {
+        'cantidad_convocados': lambda: conteo_relacionado(Partido.convocados.through, 'partido'),
+        'cantidad_checklists': lambda: conteo_relacionado(ChecklistPostPartido, 'partido'),
+        'cantidad_checklists_con_dolor': lambda: conteo_relacionado(ChecklistPostPartido, 'partido', dolor_molestia=True),
+    }
+
+class SinVectorBusquedaManager(models.Manager):
+    """
+    No carga la columna `busqueda` salvo que se pida: el tsvector sólo se
+    usa para filtrar en PostgreSQL (ver busqueda.py).
+    """
+    def get_queryset(self):
+        return super().get_queryset().defer('busqueda')
+
+def campo_vector_busqueda():
+    # En PostgreSQL lo mantiene un trigger (migración 0023) en cada INSERT y
+    # UPDATE, incluidos bulk_create y update(), que no disparan señales
+    return SearchVectorField(null=True, editable=False)
+
+class Secuencia(models.Model):
+    """
+    Contador con nombre para numeraciones internas (p. ej. numero_ficha).
+    La fila se bloquea con select_for_update al reservar, así que dos
+    reservas simultáneas nunca entregan el mismo número. También sirve de
+    candado con nombre (bloquear) para serializar otros procesos.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_valor}"
+
+    @classmethod
+    def reservar(cls, nombre, cantidad=1):
+        """Reserva `cantidad` valores consecutivos y los devuelve como range"""
+        with transaction.atomic():
+            secuencia, creada = cls.objects.select_for_update().get_or_create(nombre=nombre)
+            inicio = secuencia.ultimo_valor + 1
+            secuencia.ultimo_valor += cantidad
+            secuencia.save(update_fields=['ultimo_valor'])
+        return range(inicio, inicio + cantidad)
+
+    @classmethod
+    def valor(cls, nombre):
+        """Último valor entregado (0 si la secuencia aún no existe)"""
+        return cls.objects.filter(nombre=nombre).values_list('ultimo_valor', flat=True).first() or 0
+
+    @classmethod
+    def bloquear(cls, nombre):
+        """Bloquea la fila `nombre` hasta que termine la transacción en curso"""
+        cls.objects.select_for_update().get_or_create(nombre=nombre)
+
+    @classmethod
+    def ajustar_minimo(cls, nombre, valor):
+        """Evita que la secuencia entregue más adelante un valor asignado a mano"""
+        cls.objects.filter(nombre=nombre, ultimo_valor__lt=valor).update(ultimo_valor=valor)
+
+    class Meta:
+        verbose_name = "Secuencia"
+        verbose_name_plural = "Secuencias"
+
+SECUENCIA_NUMERO_FICHA = 'numero_ficha'
+
+def formatear_ficha(numero):
+    return f"{numero:04d}"  # Con ceros a la izquierda (ej: 0001)
+
 class Division(models.Model):
     nombre = models.CharField(max_length=100, unique=True, help_text="Ej: Primer Equipo, Femenino, Cadetes Sub-17")
 
+    objects = DivisionQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
 
@@ -108,6 +224,8 @@ class Jugador(models.Model):
     division = models.ForeignKey(Division, on_delete=models.SET_NULL, null=True, blank=True, related_name="jugadores")
     activo = models.BooleanField(default=True, help_text="Indica si el jugador está actualmente activo en el club")
 
+    objects = JugadorQuerySet.as_manager()
+
     # Propiedad para calcular la edad
     @property
     def edad(self):
@@ -117,21 +235,29 @@ class Jugador(models.Model):
         return None
     
     def save(self, *args, **kwargs):
-        # Si no tiene número de ficha, generar uno automáticamente
+        # Si no tiene número de ficha, se toma el siguiente de la secuencia
         if not self.numero_ficha:
-            # Obtener el último número de ficha y aumentarlo en 1
-            ultimo = Jugador.objects.all().order_by('-numero_ficha').first()
-            
-            # Si hay jugadores con número de ficha
-            if ultimo and ultimo.numero_ficha and ultimo.numero_ficha.isdigit():
-                next_num = int(ultimo.numero_ficha) + 1
-            else:
-                next_num = 1
-                
-            self.numero_ficha = f"{next_num:04d}"  # Formato con ceros a la izquierda (ej: 0001)
+            self.numero_ficha = formatear_ficha(Secuencia.reservar(SECUENCIA_NUMERO_FICHA)[0])
+        elif self.numero_ficha.isdigit():
+            Secuencia.ajustar_minimo(SECUENCIA_NUMERO_FICHA, int(self.numero_ficha))
             
         super().save(*args, **kwargs)
 
+    @classmethod
+    def asignar_fichas(cls, jugadores):
+        """
+        Asigna número de ficha a los jugadores (sin guardar) que no lo
+        tienen, con una sola reserva. Para cargas masivas con bulk_create.
+        """
+        sin_ficha = [jugador for jugador in jugadores if not jugador.numero_ficha]
+        manuales = [int(jugador.numero_ficha) for jugador in jugadores if jugador.numero_ficha and jugador.numero_ficha.isdigit()]
+        if manuales:
+            Secuencia.ajustar_minimo(SECUENCIA_NUMERO_FICHA, max(manuales))
+        if sin_ficha:
+            for jugador, numero in zip(sin_ficha, Secuencia.reservar(SECUENCIA_NUMERO_FICHA, len(sin_ficha))):
+                jugador.numero_ficha = formatear_ficha(numero)
+        return jugadores
+
     def __str__(self):
         return f"{self.nombres} {self.apellidos} ({self.rut})"
 
@@ -156,6 +282,9 @@ class AtencionKinesica(models.Model):
     ]
     estado_actual = models.CharField(max_length=50, choices=ESTADO_CHOICES, help_text="Estado actual del paciente")
     observaciones = models.TextField(blank=True, null=True)
+    busqueda = campo_vector_busqueda()
+
+    objects = SinVectorBusquedaManager()
 
     def __str__(self):
         return f"Atención a {self.jugador.apellidos} - {self.fecha_atencion.strftime('%Y-%m-%d')}"
@@ -164,6 +293,11 @@ class AtencionKinesica(models.Model):
         verbose_name = "Atención Kinésica"
         verbose_name_plural = "Atenciones Kinésicas"
         ordering = ['-fecha_atencion']
+        indexes = [
+            # Paginación por cursor: listado general e historial por jugador
+            models.Index(fields=['-fecha_atencion', '-id'], name='atencion_fecha_id_idx'),
+            models.Index(fields=['jugador', '-fecha_atencion', '-id'], name='atencion_jug_fecha_id_idx'),
+        ]
 
 class Lesion(models.Model):
     jugador = models.ForeignKey(Jugador, on_delete=models.CASCADE, related_name="lesiones")
@@ -263,6 +397,9 @@ class Lesion(models.Model):
     dias_recuperacion_reales = models.IntegerField(null=True, blank=True)
     observaciones_lesion = models.TextField(blank=True, null=True)
     partidos_ausente_estimados = models.IntegerField(null=True, blank=True, help_text="Ingreso manual por ahora")
+    busqueda = campo_vector_busqueda()
+
+    objects = SinVectorBusquedaManager()
 
     def __str__(self):
         return f"Lesión de {self.jugador.apellidos} - {self.diagnostico_medico[:30]} ({self.fecha_lesion.strftime('%Y-%m-%d')})"
@@ -271,6 +408,11 @@ class Lesion(models.Model):
         verbose_name = "Lesión"
         verbose_name_plural = "Lesiones"
         ordering = ['-fecha_lesion']
+        indexes = [
+            # Paginación por cursor: listado general e historial por jugador
+            models.Index(fields=['-fecha_lesion', '-id'], name='lesion_fecha_id_idx'),
+            models.Index(fields=['jugador', '-fecha_lesion', '-id'], name='lesion_jug_fecha_id_idx'),
+        ]
 
 class EstadoDiarioLesion(models.Model):
     ESTADO_CHOICES = [
@@ -278,12 +420,17 @@ class EstadoDiarioLesion(models.Model):
         ('gimnasio', 'Tratamiento en Gimnasio'),
         ('reintegro', 'Reintegro Deportivo'),
     ]
+    # Último estado con el que un jugador lesionado cuenta como limitado (no como no disponible)
+    ESTADOS_LIMITADOS = ('gimnasio', 'reintegro')
 
     lesion = models.ForeignKey(Lesion, on_delete=models.CASCADE, related_name='historial_diario')
     fecha = models.DateField()
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES)
     registrado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     observaciones = models.TextField(blank=True, null=True)
+    busqueda = campo_vector_busqueda()
+
+    objects = SinVectorBusquedaManager()
 
     def __str__(self):
         return f"{self.lesion} - {self.fecha} - {self.get_estado_display()}"
@@ -293,6 +440,164 @@ class EstadoDiarioLesion(models.Model):
         verbose_name_plural = "Estados Diarios de Lesiones"
         unique_together = ('lesion', 'fecha')
         ordering = ['-fecha']
+        indexes = [
+            # Paginación por cursor; el historial por lesión usa el índice de unique_together
+            models.Index(fields=['-fecha', '-id'], name='estado_diario_fecha_id_idx'),
+        ]
+
+def ultimo_estado_diario(campo='estado', hasta=None):
+    """
+    Subquery con `campo` del último estado diario de la lesión externa
+    (OuterRef('pk')), opcionalmente registrado hasta la fecha `hasta`.
+    Usa el índice de (lesion, fecha).
+    """
+    estados = EstadoDiarioLesion.objects.filter(lesion=OuterRef('pk'))
+    if hasta is not None:
+        estados = estados.filter(fecha__lte=hasta)
+    return Subquery(estados.order_by('-fecha').values(campo)[:1])
+
+class IntervaloEstadoLesion(models.Model):
+    """
+    Historial diario compactado: cada fila es un tramo de registros
+    consecutivos de EstadoDiarioLesion con el mismo estado. Los días sin
+    registro dentro del tramo conservan el estado anterior. Se mantiene
+    desde las señales de EstadoDiarioLesion y desde registrar_estados_diarios,
+    y se reconstruye con el comando `reconstruir_intervalos_estado`.
+    """
+    lesion = models.ForeignKey(Lesion, on_delete=models.CASCADE, related_name='intervalos_estado')
+    estado = models.CharField(max_length=20, choices=EstadoDiarioLesion.ESTADO_CHOICES)
+    desde = models.DateField()
+    hasta = models.DateField()
+    dias_registrados = models.PositiveIntegerField(default=1, help_text="Registros diarios que abarca el tramo")
+
+    def __str__(self):
+        return f"{self.lesion_id} - {self.get_estado_display()} ({self.desde} a {self.hasta})"
+
+    class Meta:
+        verbose_name = "Intervalo de Estado de Lesión"
+        verbose_name_plural = "Intervalos de Estado de Lesiones"
+        unique_together = ('lesion', 'desde')
+        ordering = ['lesion', 'desde']
+
+class ResumenDiarioLesionesQuerySet(models.QuerySet):
+    def totales(self, start_date, end_date):
+        """
+        Totales del informe de lesiones en una sola consulta agregada.
+        Las lesiones activas al cierre del período se obtienen como el
+        acumulado de lesiones nuevas menos el de finalizadas hasta end_date.
+        """
+        en_rango = Q(fecha__range=[start_date, end_date])
+        hasta_fin = Q(fecha__lte=end_date)
+        totales = self.aggregate(
+            total_nuevas_lesiones=Coalesce(Sum('nuevas_lesiones', filter=en_rango), 0),
+            total_lesiones_finalizadas=Coalesce(Sum('lesiones_finalizadas', filter=en_rango), 0),
+            acumulado_nuevas=Coalesce(Sum('nuevas_lesiones', filter=hasta_fin), 0),
+            acumulado_finalizadas=Coalesce(Sum('lesiones_finalizadas', filter=hasta_fin), 0),
+            total_cambios_diarios=Coalesce(Sum('cambios_diarios', filter=en_rango), 0),
+        )
+        return {
+            'total_nuevas_lesiones': totales['total_nuevas_lesiones'],
+            'total_lesiones_finalizadas': totales['total_lesiones_finalizadas'],
+            'total_lesiones_activas': totales['acumulado_nuevas'] - totales['acumulado_finalizadas'],
+            'total_cambios_diarios': totales['total_cambios_diarios'],
+        }
+
+    def por_dimension(self, start_date, end_date, dimension):
+        """
+        Contadores del período agrupados por una dimensión del resumen
+        (tipo_lesion, gravedad_lesion, region_cuerpo, estado, division o fecha)
+        """
+        filas = (
+            self.filter(fecha__range=[start_date, end_date])
+            .exclude(**{dimension: ''} if dimension in self.model.DIMENSIONES_TEXTO else {})
+            .order_by(dimension)
+            .values(dimension)
+            .annotate(
+                nuevas_lesiones=Sum('nuevas_lesiones'),
+                lesiones_finalizadas=Sum('lesiones_finalizadas'),
+                cambios_diarios=Sum('cambios_diarios'),
+            )
+        )
+        return [{'valor': fila.pop(dimension), **fila} for fila in filas]
+
+class ResumenDiarioLesiones(models.Model):
+    """
+    Resumen precalculado del informe de lesiones: una fila por día, división
+    y combinación de tipo, gravedad, región y estado. Las filas de lesiones
+    nuevas/finalizadas llevan estado vacío; las de cambios diarios llevan el
+    estado registrado ese día. Se mantiene desde las señales de Lesion,
+    EstadoDiarioLesion y Jugador, y se reconstruye con el comando
+    `reconstruir_resumen_lesiones`.
+    """
+    DIMENSIONES_TEXTO = ('tipo_lesion', 'gravedad_lesion', 'region_cuerpo', 'estado')
+
+    fecha = models.DateField()
+    division = models.ForeignKey(Division, on_delete=models.SET_NULL, null=True, blank=True, related_name='resumenes_lesiones')
+    tipo_lesion = models.CharField(max_length=100, blank=True)
+    gravedad_lesion = models.CharField(max_length=50, blank=True)
+    region_cuerpo = models.CharField(max_length=100, blank=True)
+    estado = models.CharField(max_length=20, blank=True)
+    nuevas_lesiones = models.PositiveIntegerField(default=0)
+    lesiones_finalizadas = models.PositiveIntegerField(default=0)
+    cambios_diarios = models.PositiveIntegerField(default=0)
+
+    objects = ResumenDiarioLesionesQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Resumen {self.fecha} - {self.division or 'Sin división'}"
+
+    class Meta:
+        verbose_name = "Resumen Diario de Lesiones"
+        verbose_name_plural = "Resúmenes Diarios de Lesiones"
+        ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'division'], name='resumen_lesiones_fecha_idx'),
+        ]
+
+class InformeLesionesSnapshotQuerySet(models.QuerySet):
+    def vigentes(self):
+        return self.filter(Q(valido_hasta__isnull=True) | Q(valido_hasta__gte=timezone.localdate()))
+
+    def que_incluyen_lesion(self, fecha_lesion, fecha_fin):
+        """
+        Snapshots en los que la lesión aparece en alguna sección: nueva o
+        finalizada dentro del rango, o activa al cierre del rango
+        """
+        snapshots = self.filter(fecha_fin__gte=fecha_lesion)
+        if fecha_fin:
+            snapshots = snapshots.filter(fecha_inicio__lte=fecha_fin)
+        return snapshots
+
+    def que_incluyen_fecha(self, fecha):
+        return self.filter(fecha_inicio__lte=fecha, fecha_fin__gte=fecha)
+
+class InformeLesionesSnapshot(models.Model):
+    """
+    Respuesta JSON ya generada de un informe de lesiones sobre un período
+    cerrado (fecha_fin anterior a hoy). Se borra cuando se escribe una
+    lesión o un estado diario que cae dentro del período.
+    """
+    clave = models.CharField(max_length=64, unique=True, help_text="SHA-256 de tipo, fechas y filtros")
+    tipo = models.CharField(max_length=20)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    filtros = models.JSONField(default=dict, blank=True)
+    contenido = models.TextField()
+    etag = models.CharField(max_length=64)
+    valido_hasta = models.DateField(null=True, blank=True, help_text="Último día en que el contenido es válido si depende de la fecha actual")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    objects = InformeLesionesSnapshotQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Snapshot {self.tipo} {self.fecha_inicio} - {self.fecha_fin}"
+
+    class Meta:
+        verbose_name = "Snapshot de Informe de Lesiones"
+        verbose_name_plural = "Snapshots de Informes de Lesiones"
+        indexes = [
+            models.Index(fields=['fecha_inicio', 'fecha_fin'], name='snapshot_informe_rango_idx'),
+        ]
 
 class ArchivoMedico(models.Model):
     jugador = models.ForeignKey(Jugador, on_delete=models.CASCADE, related_name="archivos_medicos")
@@ -307,6 +612,9 @@ class ArchivoMedico(models.Model):
     fecha_documento = models.DateField(default=timezone.now)
     archivo = models.FileField(upload_to=ruta_archivo_medico)  # Configurar MEDIA_ROOT y MEDIA_URL en settings.py
     observaciones = models.TextField(blank=True, null=True)
+    busqueda = campo_vector_busqueda()
+
+    objects = SinVectorBusquedaManager()
 
     def __str__(self):
         return f"{self.titulo_descripcion} - {self.jugador.apellidos} ({self.fecha_documento})"
@@ -322,24 +630,63 @@ class Partido(models.Model):
         ('visitante', 'Visitante'),
     ]
     
+    MAXIMO_CONVOCADOS = 22
+
     fecha = models.DateField(help_text="Fecha del partido")
     rival = models.CharField(max_length=100, help_text="Nombre del equipo rival")
     condicion = models.CharField(max_length=20, choices=CONDICION_CHOICES, help_text="Local o Visitante")
-    convocados = models.ManyToManyField(Jugador, blank=True, help_text="Jugadores convocados para este partido (máximo 22)", related_name="partidos_convocados")
+    convocados = models.ManyToManyField(Jugador, blank=True, help_text=f"Jugadores convocados para este partido (máximo {MAXIMO_CONVOCADOS})", related_name="partidos_convocados")
+
+    objects = PartidoQuerySet.as_manager()
     
     def __str__(self):
         return f'{self.fecha.strftime("%Y-%m-%d")} vs {self.rival}'
+
+    @classmethod
+    def mensaje_maximo_convocados(cls):
+        return f"No se pueden convocar más de {cls.MAXIMO_CONVOCADOS} jugadores para un partido."
     
     def clean(self):
         super().clean()
-        # Validar que no se convoquen más de 22 jugadores
-        if self.pk and self.convocados.count() > 22:
-            raise ValidationError("No se pueden convocar más de 22 jugadores para un partido.")
+        # Validar que no se convoquen más de MAXIMO_CONVOCADOS jugadores
+        if self.pk and self.convocados.count() > self.MAXIMO_CONVOCADOS:
+            raise ValidationError(self.mensaje_maximo_convocados())
+
+    def actualizar_convocados(self, agregar=(), quitar=()):
+        """
+        Agrega y quita jugadores (ids) de la convocatoria en una transacción.
+        La fila del partido queda bloqueada hasta el final, así que dos
+        convocatorias simultáneas no pueden superar el máximo entre ambas.
+        Devuelve (ids agregados, ids quitados); lanza ValidationError si se
+        excede el máximo o algún jugador no existe, sin modificar nada.
+        """
+        Convocatoria = Partido.convocados.through
+        agregar, quitar = set(agregar), set(quitar) - set(agregar)
+        with transaction.atomic():
+            list(Partido.objects.select_for_update().filter(pk=self.pk).values_list('pk', flat=True))
+            actuales = set(Convocatoria.objects.filter(partido_id=self.pk).values_list('jugador_id', flat=True))
+            nuevos = agregar - actuales
+            quitados = quitar & actuales
+            if len(actuales) - len(quitados) + len(nuevos) > self.MAXIMO_CONVOCADOS:
+                raise ValidationError(self.mensaje_maximo_convocados())
+            inexistentes = nuevos - set(Jugador.objects.filter(pk__in=nuevos).values_list('pk', flat=True))
+            if inexistentes:
+                raise ValidationError(f"Jugadores no encontrados: {sorted(inexistentes)}")
+            if quitados:
+                Convocatoria.objects.filter(partido_id=self.pk, jugador_id__in=quitados).delete()
+            Convocatoria.objects.bulk_create(
+                Convocatoria(partido_id=self.pk, jugador_id=jugador_id) for jugador_id in nuevos
+            )
+        return nuevos, quitados
     
     class Meta:
         verbose_name = "Partido"
         verbose_name_plural = "Partidos"
         ordering = ['-fecha']
+        indexes = [
+            # Paginación por cursor de checklists (-partido__fecha, -id)
+            models.Index(fields=['-fecha', '-id'], name='partido_fecha_id_idx'),
+        ]
 
 class ChecklistPostPartido(models.Model):
     OPCIONES_ZONA = [
@@ -403,11 +750,14 @@ class ChecklistPostPartido(models.Model):
     tratamiento_inmediato_realizado = models.TextField(null=True, blank=True)
     observaciones_checklist = models.TextField(null=True, blank=True)
     fecha_registro_checklist = models.DateTimeField(auto_now_add=True)
+    busqueda = campo_vector_busqueda()
+
+    objects = SinVectorBusquedaManager()
 
     def clean(self):
         super().clean()
         # Validar que el jugador esté convocado para el partido
-        if self.partido and self.jugador and self.jugador not in self.partido.convocados.all():
+        if self.partido and self.jugador and not self.partido.convocados.filter(pk=self.jugador.pk).exists():
             raise ValidationError("El jugador debe estar convocado para el partido antes de poder completar el checklist.")
 
     def __str__(self):
@@ -419,6 +769,38 @@ class ChecklistPostPartido(models.Model):
         ordering = ['-partido__fecha', '-fecha_registro_checklist']
         unique_together = ('jugador', 'partido')  # Un jugador solo puede tener un checklist por partido
 
+class JugadorResumenClinico(models.Model):
+    """
+    Estado clínico actual de un jugador, para mostrarlo en listados con un
+    solo join: lesiones activas, la peor gravedad entre ellas, última
+    atención, dolor del último checklist y disponibilidad según el último
+    estado diario de sus lesiones activas. Se actualiza en la misma
+    transacción que las escrituras de Lesion, AtencionKinesica,
+    ChecklistPostPartido y EstadoDiarioLesion (ver actualizar_resumen_clinico)
+    y se reconstruye con el comando `reconstruir_resumen_clinico`.
+    """
+    DISPONIBILIDAD_CHOICES = [
+        ('disponible', 'Disponible'),
+        ('limitado', 'Limitado'),
+        ('no_disponible', 'No disponible'),
+    ]
+
+    jugador = models.OneToOneField(Jugador, on_delete=models.CASCADE, primary_key=True, related_name='resumen_clinico')
+    lesiones_activas = models.PositiveIntegerField(default=0)
+    peor_gravedad_activa = models.CharField(max_length=50, choices=Lesion.GRAVEDAD_LESION_CHOICES, blank=True)
+    ultima_atencion = models.DateTimeField(null=True, blank=True)
+    ultimo_dolor_molestia = models.BooleanField(null=True, blank=True, help_text="Del checklist del último partido")
+    ultima_intensidad_dolor = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Del checklist del último partido")
+    disponibilidad = models.CharField(max_length=20, choices=DISPONIBILIDAD_CHOICES, default='disponible')
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumen clínico de {self.jugador_id} - {self.get_disponibilidad_display()}"
+
+    class Meta:
+        verbose_name = "Resumen Clínico de Jugador"
+        verbose_name_plural = "Resúmenes Clínicos de Jugadores"
+
 class UserProfile(models.Model):
     """
     Perfil extendido del usuario para almacenar información adicional
@@ -446,17 +828,586 @@ class UserProfile(models.Model):
         ordering = ['user__last_name', 'user__first_name']
 
 @receiver(post_save, sender=User)
-def crear_perfil_usuario(sender, instance, created, **kwargs):
+def crear_perfil_usuario(sender, instance, created, raw=False, **kwargs):
     """
-    Signal para crear automáticamente un UserProfile cuando se crea un User
+    Signal para crear automáticamente un UserProfile cuando se crea un User.
+    Al cargar fixtures (raw) el perfil viene en los mismos datos.
     """
-    if created:
+    if created and not raw:
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def guardar_perfil_usuario(sender, instance, **kwargs):
+def guardar_perfil_usuario(sender, instance, raw=False, **kwargs):
     """
     Signal para guardar el UserProfile cuando se guarda el User
     """
-    if hasattr(instance, 'profile'):
+    if not raw and hasattr(instance, 'profile'):
         instance.profile.save()
+
+# ===== Resumen diario de lesiones =====
+
+CAMPOS_CLASIFICACION_LESION = ('tipo_lesion', 'gravedad_lesion', 'region_cuerpo')
+
+def _contar_resumen(filas, queryset, campo_fecha, prefijo, contador, campo_estado=None):
+    """
+    Agrega a `filas` los conteos de `queryset` agrupados por fecha, división,
+    clasificación de la lesión y (si corresponde) estado
+    """
+    campos = [campo_fecha, f'{prefijo}jugador__division']
+    campos += [prefijo + campo for campo in CAMPOS_CLASIFICACION_LESION]
+    if campo_estado:
+        campos.append(campo_estado)
+    for *clave, total in queryset.order_by().values_list(*campos).annotate(total=Count('pk')):
+        if not campo_estado:
+            clave.append('')
+        filas[tuple(clave)][contador] += total
+
+def _calcular_resumen(filtro_lesiones=Q(), filtro_finalizadas=Q(), filtro_estados=Q()):
+    """
+    Filas de ResumenDiarioLesiones (sin guardar) para los registros que
+    cumplen los filtros. Son tres consultas agregadas en total.
+    """
+    filas = defaultdict(Counter)
+    _contar_resumen(filas, Lesion.objects.filter(filtro_lesiones), 'fecha_lesion', '', 'nuevas_lesiones')
+    _contar_resumen(
+        filas, Lesion.objects.filter(filtro_finalizadas, fecha_fin__isnull=False),
+        'fecha_fin', '', 'lesiones_finalizadas'
+    )
+    _contar_resumen(
+        filas, EstadoDiarioLesion.objects.filter(filtro_estados),
+        'fecha', 'lesion__', 'cambios_diarios', campo_estado='estado'
+    )
+    return [
+        ResumenDiarioLesiones(
+            fecha=fecha, division_id=division_id, tipo_lesion=tipo or '',
+            gravedad_lesion=gravedad or '', region_cuerpo=region or '', estado=estado or '',
+            **contadores
+        )
+        for (fecha, division_id, tipo, gravedad, region, estado), contadores in filas.items()
+    ]
+
+def recalcular_resumen_lesiones(claves):
+    """
+    Recalcula las filas del resumen para los pares (fecha, division_id)
+    indicados. Las claves se agrupan por división, así que el costo es de
+    cinco consultas por división afectada sin importar cuántas fechas cambien.
+
+    Las rutas que escriben en bloque (bulk_create, update) no disparan
+    señales y deben llamar a esta función con las claves que modifican.
+
+    Cada división se recalcula con su candado tomado: sin él, dos
+    recálculos simultáneos de la misma división no ven las filas que el
+    otro inserta y ambas quedan (los conteos se duplican). Los candados se
+    toman en orden de división para no bloquearse mutuamente.
+    """
+    fechas_por_division = defaultdict(set)
+    for fecha, division_id in claves:
+        if fecha is not None:
+            fechas_por_division[division_id].add(fecha)
+
+    with transaction.atomic():
+        for division_id in sorted(fechas_por_division, key=lambda division_id: (division_id is not None, division_id)):
+            fechas = fechas_por_division[division_id]
+            Secuencia.bloquear(f'resumen_lesiones:{division_id}')
+            ResumenDiarioLesiones.objects.filter(fecha__in=fechas, division_id=division_id).delete()
+            ResumenDiarioLesiones.objects.bulk_create(_calcular_resumen(
+                Q(fecha_lesion__in=fechas, jugador__division_id=division_id),
+                Q(fecha_fin__in=fechas, jugador__division_id=division_id),
+                Q(fecha__in=fechas, lesion__jugador__division_id=division_id),
+            ))
+        # Los gráficos se calculan sobre el resumen, que se actualiza después
+        # de confirmar la escritura original: hay que volver a invalidarlos
+        fechas = set().union(*fechas_por_division.values())
+        if fechas:
+            condicion = Q(pk__in=[])
+            for fecha in fechas:
+                condicion |= Q(fecha_inicio__lte=fecha, fecha_fin__gte=fecha)
+            invalidar_snapshots_informe(InformeLesionesSnapshot.objects.filter(condicion, tipo='graficos'))
+
+def reconstruir_resumen_lesiones(batch_size=1000):
+    """
+    Reconstruye el resumen completo desde Lesion y EstadoDiarioLesion.
+    Devuelve la cantidad de filas creadas.
+    """
+    with transaction.atomic():
+        ResumenDiarioLesiones.objects.all().delete()
+        filas = ResumenDiarioLesiones.objects.bulk_create(_calcular_resumen(), batch_size=batch_size)
+    return len(filas)
+
+_recalculos_pendientes = threading.local()
+
+def _aplicar_recalculos_pendientes():
+    claves = getattr(_recalculos_pendientes, 'claves', set())
+    _recalculos_pendientes.claves = set()
+    recalcular_resumen_lesiones(claves)
+
+def programar_recalculo_resumen(claves):
+    """
+    Acumula claves (fecha, division_id) y recalcula al confirmar la
+    transacción. Dentro de un mismo atomic() (por ejemplo el borrado en
+    cascada de un jugador) se ejecuta un único recálculo para todas las
+    claves; fuera de una transacción se recalcula de inmediato.
+    """
+    if not hasattr(_recalculos_pendientes, 'claves'):
+        _recalculos_pendientes.claves = set()
+    _recalculos_pendientes.claves.update(claves)
+    conexion = transaction.get_connection()
+    if any(callback[1] is _aplicar_recalculos_pendientes for callback in conexion.run_on_commit):
+        return
+    transaction.on_commit(_aplicar_recalculos_pendientes)
+
+def _division_de_jugador(jugador_id):
+    return Jugador.objects.filter(pk=jugador_id).values_list('division_id', flat=True).first()
+
+@receiver(pre_save, sender=Lesion)
+def capturar_lesion_previa(sender, instance, raw=False, **kwargs):
+    """
+    Guarda los valores previos de la lesión para recalcular también los
+    días y la división que deja de ocupar
+    """
+    instance._resumen_previo = None
+    if instance.pk and not raw:
+        instance._resumen_previo = Lesion.objects.filter(pk=instance.pk).values(
+            'fecha_lesion', 'fecha_fin', 'jugador_id', 'jugador__division_id',
+            *CAMPOS_CLASIFICACION_LESION
+        ).first()
+
+@receiver(post_save, sender=Lesion)
+def actualizar_resumen_lesion(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    division_id = _division_de_jugador(instance.jugador_id)
+    claves = {(instance.fecha_lesion, division_id), (instance.fecha_fin, division_id)}
+    previo = getattr(instance, '_resumen_previo', None)
+    if previo:
+        division_previa = previo['jugador__division_id']
+        claves |= {(previo['fecha_lesion'], division_previa), (previo['fecha_fin'], division_previa)}
+        # Los cambios diarios se clasifican con los datos de la lesión
+        if any(previo[campo] != getattr(instance, campo) for campo in ('jugador_id', *CAMPOS_CLASIFICACION_LESION)):
+            for fecha in instance.historial_diario.values_list('fecha', flat=True):
+                claves |= {(fecha, division_id), (fecha, division_previa)}
+    programar_recalculo_resumen(claves)
+
+@receiver(post_delete, sender=Lesion)
+def eliminar_lesion_de_resumen(sender, instance, **kwargs):
+    division_id = _division_de_jugador(instance.jugador_id)
+    programar_recalculo_resumen({(instance.fecha_lesion, division_id), (instance.fecha_fin, division_id)})
+
+@receiver(pre_save, sender=EstadoDiarioLesion)
+def capturar_estado_diario_previo(sender, instance, raw=False, **kwargs):
+    instance._resumen_previo = None
+    if instance.pk and not raw:
+        previo = EstadoDiarioLesion.objects.filter(pk=instance.pk).values_list(
+            'fecha', 'lesion__jugador__division_id', 'lesion_id'
+        ).first()
+        if previo:
+            instance._resumen_previo, instance._lesion_previa = previo[:2], previo[2]
+
+@receiver(post_save, sender=EstadoDiarioLesion)
+def actualizar_resumen_estado_diario(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    division_id = Lesion.objects.filter(pk=instance.lesion_id).values_list('jugador__division_id', flat=True).first()
+    claves = {(instance.fecha, division_id)}
+    if getattr(instance, '_resumen_previo', None):
+        claves.add(instance._resumen_previo)
+    programar_recalculo_resumen(claves)
+
+@receiver(post_delete, sender=EstadoDiarioLesion)
+def eliminar_estado_diario_de_resumen(sender, instance, **kwargs):
+    division_id = Lesion.objects.filter(pk=instance.lesion_id).values_list('jugador__division_id', flat=True).first()
+    programar_recalculo_resumen({(instance.fecha, division_id)})
+
+@receiver(pre_save, sender=Jugador)
+def capturar_division_previa(sender, instance, raw=False, **kwargs):
+    instance._division_previa = None
+    if instance.pk and not raw:
+        instance._division_previa = _division_de_jugador(instance.pk)
+
+@receiver(post_save, sender=Jugador)
+def mover_resumen_de_division(sender, instance, created, raw=False, **kwargs):
+    """
+    Si el jugador cambia de división, sus lesiones y cambios diarios pasan
+    a contarse en la nueva división
+    """
+    if raw or created or instance._division_previa == instance.division_id:
+        return
+    fechas = set(EstadoDiarioLesion.objects.filter(lesion__jugador=instance).values_list('fecha', flat=True))
+    for fecha_lesion, fecha_fin in instance.lesiones.values_list('fecha_lesion', 'fecha_fin'):
+        fechas |= {fecha_lesion, fecha_fin}
+    programar_recalculo_resumen(
+        (fecha, division_id) for fecha in fechas for division_id in (instance._division_previa, instance.division_id)
+    )
+
+# ===== Snapshots de informes =====
+
+GENERACION_SNAPSHOTS = 'snapshots_informe'
+
+def invalidar_snapshots_informe(snapshots):
+    """
+    Una vez confirmada la transacción, avanza la generación de snapshots y
+    borra los indicados. La generación se avanza antes de borrar: un
+    snapshot que se genera en paralelo con los datos anteriores ve el cambio
+    al guardarse y se descarta (ver informes.snapshot_informe).
+    """
+    def invalidar():
+        Secuencia.reservar(GENERACION_SNAPSHOTS)
+        snapshots.delete()
+    transaction.on_commit(invalidar)
+
+@receiver(post_save, sender=Lesion)
+@receiver(post_delete, sender=Lesion)
+def invalidar_snapshots_lesion(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    snapshots = InformeLesionesSnapshot.objects.que_incluyen_lesion(instance.fecha_lesion, instance.fecha_fin)
+    previo = getattr(instance, '_resumen_previo', None)
+    if previo:
+        snapshots |= InformeLesionesSnapshot.objects.que_incluyen_lesion(previo['fecha_lesion'], previo['fecha_fin'])
+    invalidar_snapshots_informe(snapshots)
+
+@receiver(post_save, sender=EstadoDiarioLesion)
+@receiver(post_delete, sender=EstadoDiarioLesion)
+def invalidar_snapshots_estado_diario(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    snapshots = InformeLesionesSnapshot.objects.que_incluyen_fecha(instance.fecha)
+    previo = getattr(instance, '_resumen_previo', None)
+    if previo:
+        snapshots |= InformeLesionesSnapshot.objects.que_incluyen_fecha(previo[0])
+    invalidar_snapshots_informe(snapshots)
+
+@receiver(post_save, sender=Jugador)
+def invalidar_snapshots_jugador(sender, instance, created, raw=False, **kwargs):
+    """
+    El nombre y la división del jugador forman parte de los informes en los
+    que aparecen sus lesiones
+    """
+    if raw or created:
+        return
+    condicion = Q(pk__in=[])
+    for fecha_lesion, fecha_fin in instance.lesiones.values_list('fecha_lesion', 'fecha_fin'):
+        incluye = Q(fecha_fin__gte=fecha_lesion)
+        if fecha_fin:
+            incluye &= Q(fecha_inicio__lte=fecha_fin)
+        condicion |= incluye
+    invalidar_snapshots_informe(InformeLesionesSnapshot.objects.filter(condicion))
+
+# ===== Intervalos de estado =====
+
+def _compactar_estados(filas):
+    """
+    Intervalos a partir de (lesion_id, fecha, estado) ordenados por lesión
+    y fecha
+    """
+    actual = None
+    for lesion_id, fecha, estado in filas:
+        if actual is not None and actual.lesion_id == lesion_id and actual.estado == estado:
+            actual.hasta = fecha
+            actual.dias_registrados += 1
+            continue
+        if actual is not None:
+            yield actual
+        actual = IntervaloEstadoLesion(lesion_id=lesion_id, estado=estado, desde=fecha, hasta=fecha)
+    if actual is not None:
+        yield actual
+
+def recalcular_intervalos(lesion_ids, batch_size=1000):
+    """
+    Rehace los intervalos de las lesiones indicadas (todas si es None)
+    desde sus estados diarios. Devuelve la cantidad de intervalos creados.
+    """
+    filas = EstadoDiarioLesion.objects.order_by('lesion_id', 'fecha').values_list('lesion_id', 'fecha', 'estado')
+    intervalos = IntervaloEstadoLesion.objects.all()
+    if lesion_ids is not None:
+        filas = filas.filter(lesion_id__in=lesion_ids)
+        intervalos = intervalos.filter(lesion_id__in=lesion_ids)
+    with transaction.atomic():
+        intervalos.delete()
+        creados = IntervaloEstadoLesion.objects.bulk_create(
+            _compactar_estados(filas.iterator(chunk_size=batch_size)), batch_size=batch_size
+        )
+    return len(creados)
+
+def actualizar_intervalos(estados):
+    """
+    Incorpora estados diarios recién escritos, como (lesion_id, fecha,
+    estado). Lo habitual es el parte del día: si todas las fechas de una
+    lesión son posteriores a su último intervalo, éste se extiende o se
+    agrega uno nuevo, sin leer el historial. Si se escribió un día
+    anterior, los intervalos de esa lesión se rehacen.
+    """
+    por_lesion = defaultdict(list)
+    for lesion_id, fecha, estado in estados:
+        por_lesion[lesion_id].append((fecha, estado))
+    ultimos = {
+        intervalo.lesion_id: intervalo
+        for intervalo in IntervaloEstadoLesion.objects.filter(lesion_id__in=por_lesion).annotate(
+            orden=Window(RowNumber(), partition_by=F('lesion_id'), order_by=F('desde').desc())
+        ).filter(orden=1)
+    }
+
+    nuevos, extendidos, a_recalcular = [], {}, set()
+    for lesion_id, cambios in por_lesion.items():
+        cambios.sort()
+        actual = ultimos.get(lesion_id)
+        if actual is not None and cambios[0][0] <= actual.hasta:
+            # Reenviar el mismo estado para el último día no cambia nada
+            if cambios != [(actual.hasta, actual.estado)]:
+                a_recalcular.add(lesion_id)
+            continue
+        for fecha, estado in cambios:
+            if actual is not None and actual.estado == estado:
+                actual.hasta = fecha
+                actual.dias_registrados += 1
+                if actual.pk:
+                    extendidos[actual.pk] = actual
+            else:
+                actual = IntervaloEstadoLesion(lesion_id=lesion_id, estado=estado, desde=fecha, hasta=fecha)
+                nuevos.append(actual)
+
+    with transaction.atomic():
+        IntervaloEstadoLesion.objects.bulk_update(extendidos.values(), ['hasta', 'dias_registrados'])
+        IntervaloEstadoLesion.objects.bulk_create(nuevos)
+        if a_recalcular:
+            recalcular_intervalos(a_recalcular)
+
+_intervalos_pendientes = threading.local()
+
+def _aplicar_intervalos_pendientes():
+    lesion_ids = getattr(_intervalos_pendientes, 'lesion_ids', set())
+    _intervalos_pendientes.lesion_ids = set()
+    recalcular_intervalos(lesion_ids)
+
+def programar_recalculo_intervalos(lesion_ids):
+    """
+    Como programar_recalculo_resumen: acumula lesiones y rehace sus
+    intervalos una sola vez al confirmar la transacción (por ejemplo, al
+    borrar en cascada todo el historial de una lesión).
+    """
+    if not hasattr(_intervalos_pendientes, 'lesion_ids'):
+        _intervalos_pendientes.lesion_ids = set()
+    _intervalos_pendientes.lesion_ids.update(lesion_ids)
+    conexion = transaction.get_connection()
+    if any(callback[1] is _aplicar_intervalos_pendientes for callback in conexion.run_on_commit):
+        return
+    transaction.on_commit(_aplicar_intervalos_pendientes)
+
+@receiver(post_save, sender=EstadoDiarioLesion)
+def actualizar_intervalos_estado_diario(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        actualizar_intervalos([(instance.lesion_id, instance.fecha, instance.estado)])
+    else:
+        programar_recalculo_intervalos({instance.lesion_id, getattr(instance, '_lesion_previa', instance.lesion_id)})
+
+@receiver(post_delete, sender=EstadoDiarioLesion)
+def eliminar_estado_diario_de_intervalos(sender, instance, **kwargs):
+    programar_recalculo_intervalos({instance.lesion_id})
+
+# ===== Resumen clínico por jugador =====
+
+def _calcular_resumen_clinico(jugadores):
+    """JugadorResumenClinico (sin guardar) de cada jugador del queryset, en una consulta"""
+    activas = Lesion.objects.filter(jugador=OuterRef('pk'), esta_activa=True)
+    rango_gravedad = Case(
+        *(When(gravedad_lesion=clave, then=Value(rango))
+          for rango, (clave, _etiqueta) in enumerate(Lesion.GRAVEDAD_LESION_CHOICES)),
+        default=Value(-1),
+    )
+    # Lesiones activas cuyo último estado no es de gimnasio ni reintegro (o no tienen)
+    no_limitadas = (
+        activas.annotate(estado=ultimo_estado_diario())
+        .filter(Q(estado__isnull=True) | ~Q(estado__in=EstadoDiarioLesion.ESTADOS_LIMITADOS))
+        .order_by().values('jugador').annotate(total=Count('pk')).values('total')
+    )
+    ultimo_checklist = ChecklistPostPartido.objects.filter(jugador=OuterRef('pk')).order_by(
+        '-partido__fecha', '-fecha_registro_checklist'
+    )
+    filas = jugadores.annotate(
+        activas=conteo_relacionado(Lesion, 'jugador', esta_activa=True),
+        no_limitadas=Coalesce(Subquery(no_limitadas, output_field=IntegerField()), 0),
+        peor_gravedad=Subquery(activas.order_by(rango_gravedad.desc()).values('gravedad_lesion')[:1]),
+        ultima_atencion=Subquery(
+            AtencionKinesica.objects.filter(jugador=OuterRef('pk')).order_by('-fecha_atencion').values('fecha_atencion')[:1]
+        ),
+        dolor_molestia=Subquery(ultimo_checklist.values('dolor_molestia')[:1]),
+        intensidad_dolor=Subquery(ultimo_checklist.values('intensidad_dolor')[:1]),
+    ).order_by().values_list(
+        'pk', 'activas', 'no_limitadas', 'peor_gravedad', 'ultima_atencion', 'dolor_molestia', 'intensidad_dolor'
+    )
+    for pk, activas, no_limitadas, peor_gravedad, ultima_atencion, dolor_molestia, intensidad_dolor in filas:
+        if not activas:
+            disponibilidad = 'disponible'
+        elif no_limitadas:
+            disponibilidad = 'no_disponible'
+        else:
+            disponibilidad = 'limitado'
+        yield JugadorResumenClinico(
+            jugador_id=pk, lesiones_activas=activas, peor_gravedad_activa=peor_gravedad or '',
+            ultima_atencion=ultima_atencion, ultimo_dolor_molestia=dolor_molestia,
+            ultima_intensidad_dolor=int(intensidad_dolor) if intensidad_dolor else None,
+            disponibilidad=disponibilidad,
+        )
+
+def actualizar_resumen_clinico(jugadores=None, batch_size=1000):
+    """
+    Recalcula y guarda (INSERT ... ON CONFLICT) el resumen clínico de los
+    jugadores indicados, como ids o como queryset de ids; todos si es None.
+    Son dos consultas sin importar la cantidad de jugadores. Las rutas que
+    escriben en bloque deben llamarla con los jugadores que modifican.
+    """
+    queryset = Jugador.objects.all() if jugadores is None else Jugador.objects.filter(pk__in=jugadores)
+    resumenes = list(_calcular_resumen_clinico(queryset))
+    JugadorResumenClinico.objects.bulk_create(
+        resumenes,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['jugador'],
+        update_fields=[
+            'lesiones_activas', 'peor_gravedad_activa', 'ultima_atencion', 'ultimo_dolor_molestia',
+            'ultima_intensidad_dolor', 'disponibilidad', 'actualizado',
+        ],
+    )
+    return len(resumenes)
+
+_resumen_clinico_pendiente = threading.local()
+
+def _aplicar_resumen_clinico_pendiente():
+    jugadores = getattr(_resumen_clinico_pendiente, 'jugadores', set())
+    lesiones = getattr(_resumen_clinico_pendiente, 'lesiones', set())
+    _resumen_clinico_pendiente.jugadores, _resumen_clinico_pendiente.lesiones = set(), set()
+    actualizar_resumen_clinico(
+        Jugador.objects.filter(Q(pk__in=jugadores) | Q(lesiones__in=lesiones)).values('pk')
+    )
+
+def programar_resumen_clinico(jugadores=(), lesiones=()):
+    """
+    Para los borrados: acumula jugadores (o lesiones de las que se toma el
+    jugador) y los recalcula una vez al confirmar la transacción, así un
+    borrado en cascada no recalcula fila por fila ni escribe el resumen de
+    un jugador que se está borrando.
+    """
+    for nombre, valores in (('jugadores', jugadores), ('lesiones', lesiones)):
+        if not hasattr(_resumen_clinico_pendiente, nombre):
+            setattr(_resumen_clinico_pendiente, nombre, set())
+        getattr(_resumen_clinico_pendiente, nombre).update(valores)
+    conexion = transaction.get_connection()
+    if any(callback[1] is _aplicar_resumen_clinico_pendiente for callback in conexion.run_on_commit):
+        return
+    transaction.on_commit(_aplicar_resumen_clinico_pendiente)
+
+@receiver(pre_save, sender=AtencionKinesica)
+@receiver(pre_save, sender=ChecklistPostPartido)
+def capturar_jugador_previo(sender, instance, raw=False, **kwargs):
+    instance._jugador_previo = None
+    if instance.pk and not raw:
+        instance._jugador_previo = sender.objects.filter(pk=instance.pk).values_list('jugador_id', flat=True).first()
+
+@receiver(post_save, sender=AtencionKinesica)
+@receiver(post_save, sender=ChecklistPostPartido)
+def actualizar_resumen_clinico_jugador(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    actualizar_resumen_clinico({instance.jugador_id, getattr(instance, '_jugador_previo', None)} - {None})
+
+@receiver(post_save, sender=Lesion)
+def actualizar_resumen_clinico_lesion(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previo = getattr(instance, '_resumen_previo', None)
+    actualizar_resumen_clinico({instance.jugador_id, previo and previo['jugador_id']} - {None})
+
+@receiver(post_save, sender=EstadoDiarioLesion)
+def actualizar_resumen_clinico_estado_diario(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    lesiones = {instance.lesion_id, getattr(instance, '_lesion_previa', None)} - {None}
+    actualizar_resumen_clinico(Lesion.objects.filter(pk__in=lesiones).values('jugador_id'))
+
+@receiver(post_save, sender=Jugador)
+def crear_resumen_clinico(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        JugadorResumenClinico.objects.create(jugador=instance)
+
+@receiver(post_delete, sender=Lesion)
+@receiver(post_delete, sender=AtencionKinesica)
+@receiver(post_delete, sender=ChecklistPostPartido)
+def eliminar_de_resumen_clinico(sender, instance, **kwargs):
+    programar_resumen_clinico(jugadores={instance.jugador_id})
+
+@receiver(post_delete, sender=EstadoDiarioLesion)
+def eliminar_estado_diario_de_resumen_clinico(sender, instance, **kwargs):
+    programar_resumen_clinico(lesiones={instance.lesion_id})
+
+# ===== Escrituras por lote =====
+
+def registrar_estados_diarios(estados, registrado_por):
+    """
+    Crea o reemplaza estados diarios (lesion, fecha) con un único INSERT ...
+    ON CONFLICT y actualiza los intervalos, el resumen diario, el resumen
+    clínico de los jugadores y los snapshots afectados, que bulk_create no
+    notifica por señales. `estados` son instancias sin guardar de
+    EstadoDiarioLesion.
+    """
+    for estado in estados:
+        estado.registrado_por = registrado_por
+    with transaction.atomic():
+        EstadoDiarioLesion.objects.bulk_create(
+            estados,
+            update_conflicts=True,
+            unique_fields=['lesion', 'fecha'],
+            update_fields=['estado', 'observaciones', 'registrado_por'],
+        )
+        fechas = {estado.fecha for estado in estados}
+        divisiones = set(
+            Lesion.objects.filter(pk__in={estado.lesion_id for estado in estados})
+            .values_list('jugador__division_id', flat=True)
+        )
+        actualizar_intervalos((estado.lesion_id, estado.fecha, estado.estado) for estado in estados)
+        actualizar_resumen_clinico(
+            Lesion.objects.filter(pk__in={estado.lesion_id for estado in estados}).values('jugador_id')
+        )
+        programar_recalculo_resumen({(fecha, division_id) for fecha in fechas for division_id in divisiones})
+        condicion = Q(pk__in=[])
+        for fecha in fechas:
+            condicion |= Q(fecha_inicio__lte=fecha, fecha_fin__gte=fecha)
+        invalidar_snapshots_informe(InformeLesionesSnapshot.objects.filter(condicion))
+    return estados
+
+# ===== Caché de roles =====
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_roles_por_membresia(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    user.groups.add/remove/clear invalida a ese usuario; group.user_set.*
+    invalida a los usuarios afectados (o a todos si se vacía el grupo)
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        invalidar_roles([instance.pk])
+    elif pk_set:
+        invalidar_roles(pk_set)
+    else:
+        invalidar_roles()
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_roles_por_grupo(sender, **kwargs):
+    invalidar_roles()
+
+@receiver(post_delete, sender=User)
+def invalidar_roles_usuario_eliminado(sender, instance, **kwargs):
+    invalidar_roles([instance.pk])
+
+# ===== Índice de autocompletar =====
+
+@receiver(post_save, sender=Jugador)
+@receiver(post_delete, sender=Jugador)
+def invalidar_autocompletar_jugadores(sender, raw=False, **kwargs):
+    # Al confirmar: si se invalida antes, otra petición puede reconstruir el
+    # índice con las filas previas a la transacción
+    if not raw:
+        transaction.on_commit(invalidar_indice_jugadores)
@@ -0,0 +1,120 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginacionConCursor(PageNumberPagination):
+    """
+    Paginación por número de página con un modo cursor (keyset) opcional.
+
+    Por defecto se comporta como PageNumberPagination. Si la vista define
+    `orden_cursor` (por ejemplo ('-fecha', '-id')) y la petición incluye
+    ?paginacion=cursor, las páginas se obtienen filtrando a partir de la
+    última fila de la página anterior en vez de usar OFFSET, y no se ejecuta
+    el COUNT(*). Así una página profunda cuesta lo mismo que la primera.
+
+    En modo cursor se ignora ?ordering=, porque el cursor depende del orden.
+    """
+    modo_query_param = 'paginacion'
+    cursor_query_param = 'cursor'
+    cursor_invalido_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.orden_cursor = getattr(view, 'orden_cursor', None)
+        self.modo_cursor = bool(self.orden_cursor) and (
+            request.query_params.get(self.modo_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.modo_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginar_por_cursor(queryset, request)
+
+    def paginar_por_cursor(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        queryset = queryset.order_by(*self.orden_cursor)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(self.filtro_posterior(self.decodificar_cursor(cursor)))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.cursor_invalido_message)
+
+        resultados = list(queryset[:page_size + 1])
+        self.hay_siguiente = len(resultados) > page_size
+        resultados = resultados[:page_size]
+        self.siguiente_posicion = (
+            [self.valor_orden(resultados[-1], campo) for campo in self.orden_cursor]
+            if self.hay_siguiente else None
+        )
+        return resultados
+
+    def filtro_posterior(self, posicion):
+        """
+        Condición lexicográfica (a, b) < (x, y) construida como
+        a < x OR (a = x AND b < y), respetando el sentido de cada campo.
+        """
+        if len(posicion) != len(self.orden_cursor):
+            raise NotFound(self.cursor_invalido_message)
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(self.orden_cursor, posicion):
+            nombre = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{lookup}': valor})
+            iguales[nombre] = valor
+        return condicion
+
+    def valor_orden(self, instancia, campo):
+        valor = instancia
+        for parte in campo.lstrip('-').split('__'):
+            valor = getattr(valor, parte)
+        return valor
+
+    def codificar_cursor(self, posicion):
+        def serializar(valor):
+            if isinstance(valor, (datetime.date, datetime.datetime)):
+                return valor.isoformat()
+            if isinstance(valor, Decimal):
+                return str(valor)
+            return valor
+        contenido = json.dumps([serializar(valor) for valor in posicion])
+        return base64.urlsafe_b64encode(contenido.encode()).decode()
+
+    def decodificar_cursor(self, cursor):
+        try:
+            posicion = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.cursor_invalido_message)
+        if not isinstance(posicion, list):
+            raise NotFound(self.cursor_invalido_message)
+        return posicion
+
+    def get_next_link(self):
+        if not self.modo_cursor:
+            return super().get_next_link()
+        if not self.hay_siguiente:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = replace_query_param(url, self.modo_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.codificar_cursor(self.siguiente_posicion))
+
+    def get_paginated_response(self, data):
+        if not self.modo_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
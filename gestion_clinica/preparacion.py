@@ -0,0 +1,79 @@
+"""
+Estado de preparación de los candidatos a una convocatoria.
+
+Para un partido y una lista de jugadores (por defecto, los convocados)
+reúne en una respuesta lo que la pantalla de convocatoria necesita
+advertir: lesiones que se cruzan con la fecha del partido (con su último
+estado diario) y el dolor reportado en los checklists de sus partidos
+anteriores. Son tres consultas para todo el plantel, no por jugador.
+"""
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+
+from .conf import config
+from .disponibilidad import CAMPOS_JUGADOR, clasificar, lesiones_por_jugador
+from .models import ChecklistPostPartido, Jugador, Partido
+
+
+def checklists_recientes(jugadores, antes_de, cantidad):
+    """
+    {jugador_id: [checklists]} con los últimos `cantidad` checklists de
+    cada jugador en partidos anteriores a `antes_de`, del más reciente al
+    más antiguo. Una consulta (ROW_NUMBER por jugador).
+    """
+    checklists = ChecklistPostPartido.objects.filter(
+        jugador__in=jugadores, partido__fecha__lt=antes_de
+    ).annotate(
+        orden=Window(
+            RowNumber(), partition_by=F('jugador_id'),
+            order_by=[F('partido__fecha').desc(), F('id').desc()],
+        )
+    ).filter(orden__lte=cantidad).order_by('jugador_id', 'orden').values(
+        'jugador_id', 'partido_id', 'partido__fecha', 'partido__rival',
+        'dolor_molestia', 'intensidad_dolor', 'zona_anatomica_dolor',
+    )
+    por_jugador = {}
+    for checklist in checklists:
+        por_jugador.setdefault(checklist.pop('jugador_id'), []).append({
+            'partido': checklist['partido_id'],
+            'fecha': checklist['partido__fecha'],
+            'rival': checklist['partido__rival'],
+            'dolor_molestia': checklist['dolor_molestia'],
+            'intensidad_dolor': int(checklist['intensidad_dolor']) if checklist['intensidad_dolor'] else None,
+            'zona_anatomica_dolor': checklist['zona_anatomica_dolor'],
+        })
+    return por_jugador
+
+
+def preparacion_convocatoria(partido, candidatos=None):
+    """
+    Disponibilidad, lesiones y dolor reciente de cada candidato (ids de
+    jugadores; si es None, los convocados del partido), con las alertas
+    `lesion_activa` y `dolor_alto` (intensidad igual o mayor a
+    PREPARACION_DOLOR_ALTO en el checklist de su último partido).
+    """
+    if candidatos is None:
+        jugadores = Jugador.objects.filter(partidos_convocados=partido)
+    else:
+        jugadores = Jugador.objects.filter(pk__in=candidatos)
+    lesiones = lesiones_por_jugador(jugadores, partido.fecha, partido.fecha)
+    checklists = checklists_recientes(jugadores, partido.fecha, config('PREPARACION_PARTIDOS_HISTORIAL'))
+    umbral = config('PREPARACION_DOLOR_ALTO')
+
+    convocado = Exists(Partido.convocados.through.objects.filter(partido_id=partido.pk, jugador_id=OuterRef('pk')))
+    resultado = []
+    for jugador in jugadores.annotate(convocado=convocado).order_by('apellidos', 'nombres').values(
+        *CAMPOS_JUGADOR, 'convocado'
+    ):
+        lesiones_jugador = lesiones.get(jugador['id'], [])
+        checklists_jugador = checklists.get(jugador['id'], [])
+        ultimo_dolor = checklists_jugador[0]['intensidad_dolor'] if checklists_jugador else None
+        resultado.append({
+            **jugador,
+            'disponibilidad': clasificar(lesiones_jugador),
+            'lesion_activa': bool(lesiones_jugador),
+            'dolor_alto': ultimo_dolor is not None and ultimo_dolor >= umbral,
+            'lesiones': lesiones_jugador,
+            'checklists_recientes': checklists_jugador,
+        })
+    return resultado
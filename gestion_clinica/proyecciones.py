@@ -0,0 +1,210 @@
+"""
+Proyección de querysets a partir de los campos que renderiza un serializer.
+
+En lugar de escribir a mano los select_related/prefetch_related de cada
+vista, se inspecciona el serializer y se cargan solo las columnas y
+relaciones que realmente se usan al serializar.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from rest_framework import serializers
+
+
+class PlanProyeccion:
+    """
+    Resultado de inspeccionar un serializer.
+
+    - campos: columnas a cargar con only(), o None si no se pudo determinar
+      de forma segura (en ese caso se cargan todas las columnas).
+    - relaciones: rutas para select_related.
+    - prefetch: diccionario {ruta: (modelo, clase_serializer, campo_inverso)}.
+    """
+    def __init__(self, campos, relaciones, prefetch):
+        self.campos = campos
+        self.relaciones = relaciones
+        self.prefetch = prefetch
+
+
+def _resolver_fuente(modelo, fuente):
+    """
+    Recorre una fuente tipo 'division.nombre' sobre el modelo.
+    Devuelve (ruta_columna, relaciones) o None si la fuente no es una
+    columna alcanzable mediante relaciones directas.
+    """
+    partes = fuente.split('.')
+    ruta = []
+    relaciones = []
+    actual = modelo
+    for indice, parte in enumerate(partes):
+        try:
+            campo = actual._meta.get_field(parte)
+        except FieldDoesNotExist:
+            return None
+        ruta.append(parte)
+        if campo.is_relation:
+            if campo.many_to_many or campo.one_to_many:
+                return None
+            if indice == len(partes) - 1:
+                # Se admite el lado inverso de un OneToOne: select_related también lo carga
+                if not campo.concrete and not campo.one_to_one:
+                    return None
+                return '__'.join(ruta), relaciones
+            relaciones.append('__'.join(ruta))
+            actual = campo.related_model
+        elif indice == len(partes) - 1:
+            return '__'.join(ruta), relaciones
+        else:
+            return None
+    return None
+
+
+def _con_prefijo(prefijo, valores):
+    return {f'{prefijo}__{valor}' for valor in valores}
+
+
+def _plan_desde_campos(campos_serializer, modelo, dependencias):
+    campos = {modelo._meta.pk.name}
+    relaciones = set()
+    prefetch = {}
+    completas = set()
+    columnas_conocidas = True
+
+    for nombre, campo in campos_serializer.items():
+        if campo.write_only:
+            continue
+
+        if isinstance(campo, serializers.ListSerializer):
+            hijo = campo.child
+            if not isinstance(hijo, serializers.ModelSerializer):
+                columnas_conocidas = False
+                continue
+            try:
+                relacion = modelo._meta.get_field(campo.source)
+            except FieldDoesNotExist:
+                columnas_conocidas = False
+                continue
+            inverso = relacion.field.name if relacion.one_to_many else None
+            prefetch[campo.source] = (relacion.related_model, type(hijo), inverso)
+            continue
+
+        if isinstance(campo, serializers.ModelSerializer):
+            resultado = _resolver_fuente(modelo, campo.source)
+            if resultado is None:
+                columnas_conocidas = False
+                continue
+            ruta, rutas_previas = resultado
+            relaciones.update(rutas_previas)
+            relaciones.add(ruta)
+            campos.add(ruta)
+            anidado = plan_proyeccion(type(campo))
+            relaciones.update(_con_prefijo(ruta, anidado.relaciones))
+            if anidado.campos is None:
+                completas.add(ruta)
+            else:
+                campos.update(_con_prefijo(ruta, anidado.campos))
+            for ruta_hija, definicion in anidado.prefetch.items():
+                prefetch[f'{ruta}__{ruta_hija}'] = definicion
+            continue
+
+        if nombre in dependencias:
+            fuentes = dependencias[nombre]
+        elif campo.source == '*' or isinstance(campo, serializers.SerializerMethodField):
+            # Sin dependencias declaradas no se puede saber qué columnas lee
+            columnas_conocidas = False
+            continue
+        else:
+            fuentes = [campo.source]
+
+        for fuente in fuentes:
+            resultado = _resolver_fuente(modelo, fuente)
+            if resultado is None:
+                # Propiedad o método: si pasa por una relación directa,
+                # al menos se carga esa relación con select_related.
+                primera = fuente.split('.')[0]
+                resultado_relacion = _resolver_fuente(modelo, primera) if '.' in fuente else None
+                if resultado_relacion is not None:
+                    ruta, _ = resultado_relacion
+                    relaciones.add(ruta)
+                    campos.add(ruta)
+                    completas.add(ruta)
+                    continue
+                columnas_conocidas = False
+                continue
+            ruta, rutas_previas = resultado
+            relaciones.update(rutas_previas)
+            campos.update(rutas_previas)
+            campos.add(ruta)
+
+    # Las relaciones que se cargan completas no deben quedar restringidas
+    # por columnas sueltas pedidas por otros campos.
+    campos = {
+        campo for campo in campos
+        if not any(campo.startswith(f'{completa}__') for completa in completas)
+    }
+    return PlanProyeccion(campos if columnas_conocidas else None, relaciones, prefetch)
+
+
+@lru_cache(maxsize=None)
+def plan_proyeccion(serializer_class):
+    """
+    Calcula (y cachea por clase) el plan de proyección de un ModelSerializer.
+
+    Los campos calculados (SerializerMethodField o propiedades del modelo)
+    pueden declarar las columnas que leen en Meta.dependencias_campos.
+    """
+    serializer = serializer_class()
+    modelo = serializer.Meta.model
+    dependencias = getattr(serializer.Meta, 'dependencias_campos', {})
+    return _plan_desde_campos(serializer.fields, modelo, dependencias)
+
+
+def proyectar_queryset(queryset, serializer_class, campos_extra=(), limites=None):
+    """
+    Aplica only(), select_related() y prefetch_related() al queryset según
+    los campos que renderiza serializer_class.
+
+    `limites` ({ruta de prefetch: n}) carga sólo las primeras n filas de
+    esa relación inversa por cada objeto, en el orden del modelo
+    relacionado, con ROW_NUMBER() particionado por la FK al padre.
+    """
+    plan = plan_proyeccion(serializer_class)
+    if plan.relaciones:
+        queryset = queryset.select_related(*sorted(plan.relaciones))
+    if plan.campos is not None:
+        queryset = queryset.only(*sorted(plan.campos.union(campos_extra)))
+    for ruta, (modelo, clase_hija, inverso) in plan.prefetch.items():
+        # El prefetch inverso necesita la FK hacia el padre para agrupar
+        queryset_hijo = proyectar_queryset(
+            modelo._default_manager.all(), clase_hija, campos_extra=(inverso,) if inverso else ()
+        )
+        if limites and ruta in limites and inverso:
+            # Es la misma ventana con que Django (4.2+) resuelve Prefetch(queryset=qs[:n]),
+            # pero sin to_attr prefetch_one_level vuelve a filtrar el queryset por
+            # cada padre y falla con un slice; con to_attr la lista dejaría de
+            # estar en el manager que leen los serializers.
+            queryset_hijo = queryset_hijo.annotate(
+                orden_prefetch=Window(RowNumber(), partition_by=F(inverso), order_by=modelo._meta.ordering or ['pk'])
+            ).filter(orden_prefetch__lte=limites[ruta])
+        queryset = queryset.prefetch_related(Prefetch(ruta, queryset=queryset_hijo))
+    return queryset
+
+
+class ProyeccionPorAccionMixin:
+    """
+    Mixin para ViewSets que proyecta el queryset según la acción.
+
+    proyecciones_por_accion = {'list': MiSerializer, 'retrieve': MiSerializer}
+
+    Las acciones que no aparecen en el diccionario (create, update, ...)
+    usan el queryset completo sin proyección.
+    """
+    proyecciones_por_accion = {}
+
+    def proyectar(self, queryset):
+        serializer_class = self.proyecciones_por_accion.get(getattr(self, 'action', None))
+        if serializer_class is None:
+            return queryset
+        return proyectar_queryset(queryset, serializer_class)
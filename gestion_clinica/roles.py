@@ -0,0 +1,141 @@
+"""
+Resolución de roles (grupos) de usuario.
+
+Los roles de cada usuario se guardan en memoria por proceso durante
+ROLES_CACHE_SEGUNDOS y se invalidan con las señales de models.py cuando
+cambian los grupos. Si el usuario viene con los grupos precargados
+(prefetch_related('groups')) o el token JWT trae el claim de roles, no se
+consulta la base de datos.
+"""
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .conf import config
+
+ROL_ADMINISTRADOR = 'Administrador'
+ROL_CUERPO_MEDICO = 'Cuerpo médico'
+ROL_CUERPO_TECNICO = 'Cuerpo técnico'
+ROL_DIRIGENCIA = 'Dirigencia'
+
+CLAIM_ROLES = 'roles'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def roles_de_usuario(user, token=None):
+    """
+    Tupla con los nombres de los grupos del usuario, ordenados por id
+    (el primero es el rol principal, como groups.first())
+    """
+    if user is None or not user.is_authenticated:
+        return ()
+    if token is not None and claims_activos():
+        roles = token.get(CLAIM_ROLES)
+        if roles is not None:
+            return tuple(roles)
+    precargados = getattr(user, '_prefetched_objects_cache', {}).get('groups')
+    if precargados is not None:
+        return tuple(grupo.name for grupo in sorted(precargados, key=lambda grupo: grupo.pk))
+    return roles_por_id(user.pk)
+
+
+def roles_por_id(user_id):
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _cache.get(user_id)
+    if entrada and entrada[0] > ahora:
+        return entrada[1]
+
+    roles = tuple(Group.objects.filter(user__id=user_id).order_by('id').values_list('name', flat=True))
+    with _lock:
+        _cache[user_id] = (ahora + config('ROLES_CACHE_SEGUNDOS'), roles)
+    return roles
+
+
+def rol_principal(user, token=None):
+    roles = roles_de_usuario(user, token)
+    return roles[0] if roles else None
+
+
+def tiene_rol(user, *roles, token=None):
+    """
+    True si el usuario es superusuario o pertenece a alguno de los roles
+    """
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    return not set(roles).isdisjoint(roles_de_usuario(user, token))
+
+
+def invalidar_roles(user_ids=None):
+    """
+    Olvida los roles de los usuarios indicados, o de todos si no se indica
+    ninguno
+    """
+    with _lock:
+        if user_ids is None:
+            _cache.clear()
+        else:
+            for user_id in user_ids:
+                _cache.pop(user_id, None)
+
+
+def claims_activos():
+    return config('ROLES_EN_TOKEN') or config('JWT_SIN_CONSULTA')
+
+
+def agregar_claims_usuario(token, user):
+    """
+    Agrega al token los roles del usuario (ROLES_EN_TOKEN) y, para la
+    autenticación sin consulta (JWT_SIN_CONSULTA), los datos que usa
+    UsuarioToken
+    """
+    if claims_activos():
+        token[CLAIM_ROLES] = list(roles_por_id(user.pk))
+    if config('JWT_SIN_CONSULTA'):
+        token['username'] = user.get_username()
+        token['full_name'] = user.get_full_name()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+    return token
+
+
+class RefreshTokenConRoles(RefreshToken):
+    """
+    Refresh token que incluye el claim de roles. Cada access token emitido
+    al refrescar vuelve a leer de la base de datos el usuario (roles,
+    nombres, is_staff, is_superuser), así que un cambio se refleja a más
+    tardar al vencer el access token. Un usuario inactivo o eliminado no
+    puede refrescar.
+    """
+    @classmethod
+    def for_user(cls, user):
+        token = agregar_claims_usuario(super().for_user(user), user)
+        token._usuario = user
+        return token
+
+    def usuario(self):
+        if not hasattr(self, '_usuario'):
+            User = get_user_model()
+            self._usuario = User.objects.filter(
+                **{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}
+            ).first()
+        return self._usuario
+
+    @property
+    def access_token(self):
+        usuario = self.usuario()
+        if not api_settings.USER_AUTHENTICATION_RULE(usuario):
+            raise AuthenticationFailed('La cuenta no existe o está inactiva', code='no_active_account')
+        # Los claims se actualizan en el propio refresh token: se copian al
+        # access token y también quedan en el refresh token rotado
+        agregar_claims_usuario(self, usuario)
+        return super().access_token
@@ -1,13 +1,92 @@
 from rest_framework import serializers
-from .models import Division, Jugador, AtencionKinesica, Lesion, ArchivoMedico, ChecklistPostPartido, Partido, validar_rut_chileno, EstadoDiarioLesion, UserProfile
+from rest_framework.permissions import SAFE_METHODS
+from .models import Division, Jugador, AtencionKinesica, Lesion, ArchivoMedico, ChecklistPostPartido, Partido, validar_rut_chileno, EstadoDiarioLesion, IntervaloEstadoLesion, JugadorResumenClinico, UserProfile
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import Group
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .roles import RefreshTokenConRoles, rol_principal
 import re
 
 User = get_user_model()
 
+def parsear_expand(valor):
+    """
+    Convierte 'a,b.c,b.d' en {'a': [], 'b': ['c', 'd']}.
+    """
+    resultado = {}
+    if not valor:
+        return resultado
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    for ruta in valor:
+        ruta = ruta.strip()
+        if not ruta:
+            continue
+        nombre, _, resto = ruta.partition('.')
+        resultado.setdefault(nombre, [])
+        if resto:
+            resultado[nombre].append(resto)
+    return resultado
+
+class CamposDinamicosMixin:
+    """
+    Mixin para ModelSerializer que permite:
+    - Elegir los campos a renderizar (?fields=id,jugador_nombre o fields=[...]).
+    - Expandir objetos anidados declarados en Meta.expandibles
+      (?expand=jugador_detalle,partido_detalle o expand=[...]).
+
+    Los campos expandibles no se renderizan si no se piden, de modo que el
+    payload por defecto es compacto. En el serializer raíz los parámetros se
+    leen de la query string; los anidados los reciben del padre.
+
+    ?fields= sólo se aplica a peticiones de lectura: en un POST/PUT/PATCH
+    quitar campos saltaría la validación de los obligatorios.
+    """
+    def __init__(self, *args, **kwargs):
+        self._campos_pedidos = kwargs.pop('fields', None)
+        self._expand_pedido = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+    def _es_raiz(self):
+        padre = self.parent
+        if isinstance(padre, serializers.ListSerializer):
+            padre = padre.parent
+        return padre is None
+
+    def _parametro(self, nombre, solo_lectura=False):
+        request = self.context.get('request')
+        if request is None or not self._es_raiz():
+            return None
+        if solo_lectura and request.method not in SAFE_METHODS:
+            return None
+        query_params = getattr(request, 'query_params', request.GET)
+        return query_params.get(nombre)
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        expand = parsear_expand(
+            self._expand_pedido if self._expand_pedido is not None else self._parametro('expand')
+        )
+        for nombre, (clase, opciones) in getattr(self.Meta, 'expandibles', {}).items():
+            if nombre in expand:
+                fields[nombre] = clase(read_only=True, expand=expand[nombre], **opciones)
+
+        campos = self._campos_pedidos
+        if campos is None:
+            campos = self._parametro('fields', solo_lectura=True)
+        if campos:
+            if isinstance(campos, str):
+                campos = campos.split(',')
+            permitidos = {campo.strip() for campo in campos} | set(expand)
+            for nombre in list(fields):
+                if nombre not in permitidos:
+                    fields.pop(nombre)
+        return fields
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer para el perfil extendido del usuario"""
     class Meta:
@@ -29,10 +108,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
 
     def get_role(self, obj):
         """Obtener el rol principal del usuario"""
-        groups = obj.groups.all()
-        if groups:
-            return groups.first().name
-        return None
+        return rol_principal(obj)
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip() or obj.username
@@ -288,6 +364,14 @@ class UserBasicSerializer(serializers.ModelSerializer):
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip() or obj.username
 
+class TokenObtainPairConRolesSerializer(TokenObtainPairSerializer):
+    """Par de tokens JWT con el claim de roles (si ROLES_EN_TOKEN está activo)"""
+    token_class = RefreshTokenConRoles
+
+class TokenRefreshConRolesSerializer(TokenRefreshSerializer):
+    """Refresco de tokens que vuelve a leer el usuario (claims y cuenta activa)"""
+    token_class = RefreshTokenConRoles
+
 class DivisionSerializer(serializers.ModelSerializer):
     cantidad_jugadores = serializers.SerializerMethodField()
     
@@ -296,12 +380,25 @@ class DivisionSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_cantidad_jugadores(self, obj):
+        # Usar la anotación de Division.objects.con_conteos() si está disponible
+        cantidad = getattr(obj, 'cantidad_jugadores', None)
+        if cantidad is not None:
+            return cantidad
         return obj.jugadores.filter(activo=True).count()
 
-class JugadorSerializer(serializers.ModelSerializer):
+class JugadorResumenClinicoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JugadorResumenClinico
+        fields = [
+            'lesiones_activas', 'peor_gravedad_activa', 'ultima_atencion',
+            'ultimo_dolor_molestia', 'ultima_intensidad_dolor', 'disponibilidad'
+        ]
+
+class JugadorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     division_nombre = serializers.CharField(source='division.nombre', read_only=True)
     edad = serializers.IntegerField(read_only=True)
     foto_perfil_url = serializers.SerializerMethodField()
+    resumen_clinico = JugadorResumenClinicoSerializer(read_only=True)
     
     class Meta:
         model = Jugador
@@ -309,11 +406,16 @@ class JugadorSerializer(serializers.ModelSerializer):
             'id', 'rut', 'nombres', 'apellidos', 'fecha_nacimiento',
             'nacionalidad', 'foto_perfil', 'foto_perfil_url', 'lateralidad',
             'peso_kg', 'estatura_cm', 'prevision_salud', 'numero_ficha',
-            'division', 'division_nombre', 'activo', 'edad'
+            'division', 'division_nombre', 'activo', 'edad', 'resumen_clinico'
         ]
         extra_kwargs = {
             'foto_perfil': {'write_only': True}  # La foto original solo para escritura
         }
+        # Columnas que leen los campos calculados (ver proyecciones.py)
+        dependencias_campos = {
+            'edad': ['fecha_nacimiento'],
+            'foto_perfil_url': ['foto_perfil'],
+        }
 
     def get_foto_perfil_url(self, obj):
         if obj.foto_perfil:
@@ -328,7 +430,7 @@ class AtencionKinesicaSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = AtencionKinesica
-        fields = '__all__'
+        exclude = ['busqueda']
 
 class LesionSerializer(serializers.ModelSerializer):
     jugador_nombre = serializers.CharField(source='jugador.__str__', read_only=True)
@@ -336,7 +438,7 @@ class LesionSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Lesion
-        fields = '__all__'
+        exclude = ['busqueda']
     
     def get_dias_restantes(self, obj):
         if obj.dias_recuperacion_estimados and not obj.dias_recuperacion_reales:
@@ -353,7 +455,7 @@ class ArchivoMedicoSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ArchivoMedico
-        fields = '__all__'
+        exclude = ['busqueda']
 
 class PartidoSerializer(serializers.ModelSerializer):
     convocados = serializers.PrimaryKeyRelatedField(many=True, queryset=Jugador.objects.all(), required=False)
@@ -372,28 +474,46 @@ class PartidoSerializer(serializers.ModelSerializer):
         return obj.fecha.strftime("%d/%m/%Y")
     
     def validate_convocados(self, value):
-        if len(value) > 22:
-            raise serializers.ValidationError("No se pueden convocar más de 22 jugadores para un partido.")
+        if len(value) > Partido.MAXIMO_CONVOCADOS:
+            raise serializers.ValidationError(Partido.mensaje_maximo_convocados())
         return value
 
-class ChecklistPostPartidoSerializer(serializers.ModelSerializer):
-    jugador_detalle = JugadorSerializer(source='jugador', read_only=True)
+class PartidoResumenSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Partido sin la convocatoria, para anidar en otros objetos"""
+    fecha_str = serializers.SerializerMethodField()
+    condicion_display = serializers.CharField(source='get_condicion_display', read_only=True)
+
+    class Meta:
+        model = Partido
+        fields = ['id', 'fecha', 'fecha_str', 'rival', 'condicion', 'condicion_display']
+
+    def get_fecha_str(self, obj):
+        return obj.fecha.strftime("%d/%m/%Y")
+
+class ChecklistPostPartidoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Por defecto solo incluye ids y nombres del jugador y del partido.
+    Los objetos completos se piden con ?expand=jugador_detalle,partido_detalle.
+    """
     jugador_nombre = serializers.CharField(source='jugador.__str__', read_only=True)
     realizado_por_nombre = serializers.CharField(source='realizado_por.get_full_name', read_only=True)
-    partido_detalle = PartidoSerializer(source='partido', read_only=True)
     fecha_partido = serializers.DateField(source='partido.fecha', read_only=True)
     rival_partido = serializers.CharField(source='partido.rival', read_only=True)
     
     class Meta:
         model = ChecklistPostPartido
         fields = [
-            'id', 'jugador', 'jugador_detalle', 'jugador_nombre', 'partido', 'partido_detalle',
+            'id', 'jugador', 'jugador_nombre', 'partido',
             'fecha_partido', 'rival_partido', 'realizado_por', 'realizado_por_nombre',
             'dolor_molestia', 'intensidad_dolor', 'mecanismo_dolor_evaluado',
             'momento_aparicion_molestia', 'zona_anatomica_dolor',
             'diagnostico_presuntivo_postpartido', 'tratamiento_inmediato_realizado',
             'observaciones_checklist', 'fecha_registro_checklist'
         ]
+        expandibles = {
+            'jugador_detalle': (JugadorSerializer, {'source': 'jugador'}),
+            'partido_detalle': (PartidoResumenSerializer, {'source': 'partido'}),
+        }
     
     def validate(self, data):
         """Validar que el jugador esté convocado para el partido"""
@@ -401,13 +521,37 @@ class ChecklistPostPartidoSerializer(serializers.ModelSerializer):
         partido = data.get('partido')
         
         if jugador and partido:
-            if jugador not in partido.convocados.all():
+            if not partido.convocados.filter(pk=jugador.pk).exists():
                 raise serializers.ValidationError(
                     "El jugador debe estar convocado para el partido antes de poder completar el checklist."
                 )
         
         return data
 
+class ChecklistPostPartidoLoteSerializer(serializers.ModelSerializer):
+    """
+    Una fila del envío por lote de checklists de un partido. El partido va
+    una sola vez en la petición y los convocados llegan en el contexto como
+    conjunto de ids, así que validar una fila no consulta la base de datos.
+    """
+    jugador = serializers.IntegerField()
+
+    class Meta:
+        model = ChecklistPostPartido
+        fields = [
+            'jugador', 'dolor_molestia', 'intensidad_dolor', 'mecanismo_dolor_evaluado',
+            'momento_aparicion_molestia', 'zona_anatomica_dolor',
+            'diagnostico_presuntivo_postpartido', 'tratamiento_inmediato_realizado',
+            'observaciones_checklist'
+        ]
+
+    def validate_jugador(self, value):
+        if value not in self.context['convocados']:
+            raise serializers.ValidationError(
+                "El jugador debe estar convocado para el partido antes de poder completar el checklist."
+            )
+        return value
+
 class EstadoDiarioLesionSerializer(serializers.ModelSerializer):
     registrado_por_nombre = serializers.CharField(source='registrado_por.get_full_name', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
@@ -420,12 +564,37 @@ class EstadoDiarioLesionSerializer(serializers.ModelSerializer):
             'registrado_por': {'required': False, 'read_only': True}
         }
 
+class EstadoDiarioLoteSerializer(serializers.ModelSerializer):
+    """
+    Una fila del parte diario. La fecha va una sola vez en la petición y las
+    lesiones existentes llegan en el contexto como conjunto de ids.
+    """
+    lesion = serializers.IntegerField()
+
+    class Meta:
+        model = EstadoDiarioLesion
+        fields = ['lesion', 'estado', 'observaciones']
+
+    def validate_lesion(self, value):
+        if value not in self.context['lesiones']:
+            raise serializers.ValidationError("Lesión no encontrada.")
+        return value
+
+class IntervaloEstadoLesionSerializer(serializers.ModelSerializer):
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+
+    class Meta:
+        model = IntervaloEstadoLesion
+        fields = ['id', 'estado', 'estado_display', 'desde', 'hasta', 'dias_registrados']
+
 class LesionActivaSerializer(serializers.ModelSerializer):
     jugador = JugadorSerializer(read_only=True)
     tipo_lesion_display = serializers.CharField(source='get_tipo_lesion_display', read_only=True)
     region_cuerpo_display = serializers.CharField(source='get_region_cuerpo_display', read_only=True)
     gravedad_lesion_display = serializers.CharField(source='get_gravedad_lesion_display', read_only=True)
     historial_diario = EstadoDiarioLesionSerializer(many=True, read_only=True)
+    # Anotación del queryset (ultimo_estado_diario), no una columna
+    estado_actual = serializers.CharField(read_only=True, allow_null=True)
     
     class Meta:
         model = Lesion
@@ -434,6 +603,16 @@ class LesionActivaSerializer(serializers.ModelSerializer):
             'esta_activa', 'fecha_fin', 'tipo_lesion', 'tipo_lesion_display',
             'region_cuerpo', 'region_cuerpo_display', 'gravedad_lesion',
             'gravedad_lesion_display', 'dias_recuperacion_estimados',
-            'dias_recuperacion_reales', 'historial_diario'
+            'dias_recuperacion_reales', 'estado_actual', 'historial_diario'
         ]
-        read_only_fields = ['esta_activa', 'fecha_fin'] 
\ No newline at end of file
+        read_only_fields = ['esta_activa', 'fecha_fin']
+        dependencias_campos = {'estado_actual': []}
+
+
+class LesionActivaIntervalosSerializer(LesionActivaSerializer):
+    """LesionActivaSerializer con el historial compactado en intervalos (?historial=intervalos)"""
+    historial_diario = None
+    intervalos_estado = IntervaloEstadoLesionSerializer(many=True, read_only=True)
+
+    class Meta(LesionActivaSerializer.Meta):
+        fields = [campo for campo in LesionActivaSerializer.Meta.fields if campo != 'historial_diario'] + ['intervalos_estado']
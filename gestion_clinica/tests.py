@@ -1,3 +1,1035 @@
-from django.test import TestCase
+"""
+Presupuestos de consultas SQL y de tamaño de respuesta por endpoint.
 
-# Create your tests here.
+Cada acción de lectura de la API se llama con un volumen de datos parecido
+al de una temporada y se verifica que no supere su presupuesto de consultas
+(así un N+1 en un serializer hace fallar el test) ni un tamaño máximo de
+respuesta. Corre con SQLite o con PostgreSQL local:
+
+    KINE_DB=sqlite python manage.py test gestion_clinica
+    python manage.py test gestion_clinica
+"""
+import csv
+import datetime
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import (
+    Division, Jugador, AtencionKinesica, Lesion, EstadoDiarioLesion, ArchivoMedico,
+    Partido, ChecklistPostPartido, ResumenDiarioLesiones, IntervaloEstadoLesion, JugadorResumenClinico,
+    InformeLesionesSnapshot,
+    reconstruir_resumen_lesiones, recalcular_intervalos, actualizar_resumen_clinico
+)
+from .informes import snapshot_informe
+from .middleware import HistogramaEndpoints, histograma, percentil
+from .pagination import PaginacionConCursor
+from .roles import CLAIM_ROLES, RefreshTokenConRoles, invalidar_roles
+from .urls import router
+
+CANTIDAD_JUGADORES = 60
+LESIONES_POR_JUGADOR = 2
+DIAS_HISTORIAL = 10
+CANTIDAD_PARTIDOS = 12
+CONVOCADOS_POR_PARTIDO = 20
+ATENCIONES_POR_JUGADOR = 3
+
+
+def rut_valido(numero):
+    """RUT con dígito verificador calculado (módulo 11)"""
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    dv = 11 - suma % 11
+    dv = {10: 'K', 11: '0'}.get(dv, str(dv))
+    return f'{numero}-{dv}'
+
+
+class PresupuestoConsultasTests(APITestCase):
+    # (nombre de ruta, presupuesto de consultas, tamaño máximo en bytes)
+    PRESUPUESTOS = {
+        'division-list': (2, 1_000),
+        'division-detail': (1, 500),
+        'jugador-list': (2, 6_000),
+        'jugador-detail': (1, 1_000),
+        'jugador-lesiones': (2, 2_000),
+        'jugador-autocompletar': (1, 2_000),
+        'atencionkinesica-list': (2, 5_000),
+        'atencionkinesica-detail': (1, 1_000),
+        'lesion-list': (2, 8_000),
+        'lesion-detail': (1, 1_000),
+        'lesion-activas': (2, 75_000),
+        'lesion-historial-diario': (2, 3_000),
+        'archivomedico-list': (2, 4_000),
+        'archivomedico-detail': (1, 500),
+        'partido-list': (3, 120_000),
+        'partido-detail': (2, 12_000),
+        'partido-convocados': (2, 12_000),
+        'partido-preparacion': (4, 40_000),
+        'checklistpostpartido-list': (2, 8_000),
+        'checklistpostpartido-detail': (1, 1_000),
+        'checklistpostpartido-por-partido': (3, 25_000),
+        'estadodiariolesion-list': (2, 3_000),
+        'estadodiariolesion-detail': (1, 500),
+        'usuarios-list': (3, 2_000),
+        'usuarios-detail': (2, 1_000),
+        'usuarios-roles': (1, 200),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        # El superusuario lo crea la migración 0018_asignar_admin_inicial
+        cls.admin = User.objects.get(username='19976194-3')
+        cls.medico = User.objects.create_user(username='22222222-2', password='clave-segura-123', first_name='Ana')
+        cls.medico.groups.add(Group.objects.get(name='Cuerpo médico'))
+
+        divisiones = Division.objects.bulk_create(
+            Division(nombre=nombre) for nombre in ('Primer Equipo', 'Femenino', 'Sub-17')
+        )
+        cls.jugadores = Jugador.objects.bulk_create(Jugador.asignar_fichas([
+            Jugador(
+                rut=rut_valido(15_000_000 + i), nombres=f'Jugador {i}', apellidos=f'Apellido {i}',
+                fecha_nacimiento=datetime.date(1995 + i % 10, 1 + i % 12, 1 + i % 28),
+                lateralidad='diestro', prevision_salud='fonasa',
+                division=divisiones[i % len(divisiones)],
+            )
+            for i in range(CANTIDAD_JUGADORES)
+        ]))
+
+        hoy = datetime.date.today()
+        lesiones = []
+        for i, jugador in enumerate(cls.jugadores):
+            for j in range(LESIONES_POR_JUGADOR):
+                inicio = hoy - datetime.timedelta(days=30 * (j + 1) + i)
+                activa = j == 0 and i % 3 == 0
+                lesiones.append(Lesion(
+                    jugador=jugador, fecha_lesion=inicio, diagnostico_medico='Desgarro grado I',
+                    esta_activa=activa, fecha_fin=None if activa else inicio + datetime.timedelta(days=14),
+                    tipo_lesion='muscular', region_cuerpo='muslo_post_der', mecanismo_lesional='sin_contacto',
+                    condicion_lesion='aguda', etapa_deportiva_lesion='competencia', gravedad_lesion='moderada',
+                    dias_recuperacion_estimados=21,
+                ))
+        cls.lesiones = Lesion.objects.bulk_create(lesiones)
+        EstadoDiarioLesion.objects.bulk_create(
+            EstadoDiarioLesion(
+                lesion=lesion, fecha=lesion.fecha_lesion + datetime.timedelta(days=d),
+                estado=('camilla', 'gimnasio', 'reintegro')[d * 3 // DIAS_HISTORIAL],
+                registrado_por=cls.medico,
+            )
+            for lesion in cls.lesiones for d in range(DIAS_HISTORIAL)
+        )
+        AtencionKinesica.objects.bulk_create(
+            AtencionKinesica(
+                jugador=jugador, profesional_a_cargo=cls.medico, motivo_consulta='Control',
+                prestaciones_realizadas='Masoterapia', estado_actual='tratamiento',
+            )
+            for jugador in cls.jugadores for _ in range(ATENCIONES_POR_JUGADOR)
+        )
+        ArchivoMedico.objects.bulk_create(
+            ArchivoMedico(
+                jugador=jugador, tipo_archivo='imagen', titulo_descripcion='Resonancia',
+                archivo=f'archivos_medicos/jugador_{jugador.pk}/resonancia.pdf',
+            )
+            for jugador in cls.jugadores
+        )
+
+        cls.partidos = Partido.objects.bulk_create(
+            Partido(fecha=hoy - datetime.timedelta(days=7 * k), rival=f'Rival {k}', condicion='local')
+            for k in range(CANTIDAD_PARTIDOS)
+        )
+        Convocatoria = Partido.convocados.through
+        Convocatoria.objects.bulk_create(
+            Convocatoria(partido=partido, jugador=jugador)
+            for partido in cls.partidos for jugador in cls.jugadores[:CONVOCADOS_POR_PARTIDO]
+        )
+        ChecklistPostPartido.objects.bulk_create(
+            ChecklistPostPartido(
+                jugador=jugador, partido=partido, realizado_por=cls.medico,
+                dolor_molestia=jugador.pk % 4 == 0,
+            )
+            for partido in cls.partidos for jugador in cls.jugadores[:CONVOCADOS_POR_PARTIDO]
+        )
+        reconstruir_resumen_lesiones()
+        recalcular_intervalos(None)
+        actualizar_resumen_clinico()
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def medir(self, url, **extra):
+        """
+        Respuesta, cantidad de consultas y cuerpo. Las respuestas streaming
+        se consumen dentro de la medición, porque consultan al emitirse.
+        """
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, **extra)
+            cuerpo = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+        return respuesta, len(consultas), consultas, cuerpo
+
+    def assertDentroDePresupuesto(self, url, max_consultas, max_bytes):
+        respuesta, total, consultas, cuerpo = self.medir(url)
+        self.assertEqual(respuesta.status_code, 200, f'{url}: {respuesta.status_code}')
+        self.assertLessEqual(
+            total, max_consultas,
+            f'{url} ejecutó {total} consultas (presupuesto {max_consultas}):\n'
+            + '\n'.join(consulta['sql'] for consulta in consultas.captured_queries)
+        )
+        self.assertLessEqual(len(cuerpo), max_bytes, f'{url} respondió {len(cuerpo)} bytes (máximo {max_bytes})')
+        return respuesta
+
+    def url_de_ruta(self, nombre):
+        """URL de prueba para cada ruta del router"""
+        pk = {
+            'division': self.jugadores[0].division_id,
+            'jugador': self.jugadores[0].pk,
+            'atencionkinesica': AtencionKinesica.objects.values_list('pk', flat=True).first(),
+            'archivomedico': ArchivoMedico.objects.values_list('pk', flat=True).first(),
+            'lesion': self.lesiones[0].pk,
+            'partido': self.partidos[0].pk,
+            'checklistpostpartido': ChecklistPostPartido.objects.values_list('pk', flat=True).first(),
+            'estadodiariolesion': EstadoDiarioLesion.objects.values_list('pk', flat=True).first(),
+            'usuarios': self.medico.pk,
+        }
+        prefijos = {
+            'division': 'divisiones', 'jugador': 'jugadores', 'atencionkinesica': 'atenciones',
+            'lesion': 'lesiones', 'archivomedico': 'archivos', 'partido': 'partidos',
+            'checklistpostpartido': 'checklists', 'estadodiariolesion': 'estados-diarios',
+            'usuarios': 'usuarios',
+        }
+        base, _, accion = nombre.partition('-')
+        url = f'/api/{prefijos[base]}/'
+        if accion == 'list':
+            return url
+        if accion == 'detail':
+            return f'{url}{pk[base]}/'
+        accion = accion.replace('-', '_')
+        if accion in ('activas', 'roles'):
+            return f'{url}{accion}/'
+        if accion == 'autocompletar':
+            return f'{url}{accion}/?q=apellido 1'
+        if accion == 'por_partido':
+            return f'{url}{accion}/?partido_id={self.partidos[0].pk}'
+        return f'{url}{pk[base]}/{accion}/'
+
+    def rutas_get_del_router(self):
+        return [
+            patron.name for patron in router.urls
+            if isinstance(patron, URLPattern) and patron.name != 'api-root'
+            and 'get' in (getattr(patron.callback, 'actions', None) or {})
+            and '\\.(?P<format>' not in str(patron.pattern)
+        ]
+
+    def test_todas_las_acciones_get_tienen_presupuesto(self):
+        faltantes = set(self.rutas_get_del_router()) - set(self.PRESUPUESTOS)
+        self.assertFalse(faltantes, f'Acciones sin presupuesto de consultas: {sorted(faltantes)}')
+
+    def test_presupuestos_acciones_del_router(self):
+        for nombre in self.rutas_get_del_router():
+            with self.subTest(ruta=nombre):
+                self.assertDentroDePresupuesto(self.url_de_ruta(nombre), *self.PRESUPUESTOS[nombre])
+
+    def test_consultas_no_crecen_con_el_tamano_de_pagina(self):
+        for prefijo in ('jugadores', 'lesiones', 'atenciones', 'checklists', 'estados-diarios', 'partidos'):
+            with self.subTest(prefijo=prefijo):
+                with mock.patch.object(PaginacionConCursor, 'page_size', 5):
+                    _, pagina_chica, _, _ = self.medir(f'/api/{prefijo}/')
+                with mock.patch.object(PaginacionConCursor, 'page_size', 50):
+                    _, pagina_grande, _, _ = self.medir(f'/api/{prefijo}/')
+                self.assertEqual(pagina_chica, pagina_grande)
+
+    def test_paginacion_por_cursor(self):
+        respuesta = self.assertDentroDePresupuesto('/api/lesiones/?paginacion=cursor', 1, 16_000)
+        self.assertDentroDePresupuesto(respuesta.json()['next'], 1, 16_000)
+
+    def test_checklists_expandidos(self):
+        self.assertDentroDePresupuesto('/api/checklists/?expand=jugador_detalle,partido_detalle', 2, 15_000)
+
+    def test_fields_solo_en_lecturas(self):
+        respuesta = self.client.get(f'/api/jugadores/{self.jugadores[0].pk}/?fields=id,rut')
+        self.assertEqual(set(respuesta.json()), {'id', 'rut'})
+        # En una escritura ?fields= no quita campos obligatorios de la validación
+        respuesta = self.client.post('/api/jugadores/?fields=id', {'nombres': 'Sin datos'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('rut', respuesta.json())
+        checklist = ChecklistPostPartido.objects.values_list('pk', flat=True).first()
+        respuesta = self.client.patch(f'/api/checklists/{checklist}/?fields=id', {'dolor_molestia': True}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('dolor_molestia', respuesta.json())
+
+    def test_informe_lesiones(self):
+        hoy = datetime.date.today()
+        rango = f'start_date={hoy - datetime.timedelta(days=120)}&end_date={hoy}'
+        self.assertDentroDePresupuesto(f'/api/informes/lesiones/?{rango}', 5, 500_000)
+        self.assertDentroDePresupuesto(f'/api/informes/lesiones/?{rango}&formato=ndjson', 5, 650_000)
+        self.assertDentroDePresupuesto(f'/api/informes/lesiones/resumen/?{rango}', 7, 15_000)
+
+    def test_informe_lesiones_streaming(self):
+        hoy = datetime.date.today()
+        inicio = hoy - datetime.timedelta(days=45)
+        rango = f'start_date={inicio}&end_date={hoy}'
+        esperado = self.client.get(f'/api/informes/lesiones/?{rango}').json()
+        secciones = ('nuevas_lesiones', 'lesiones_finalizadas', 'lesiones_activas', 'cambios_diarios')
+
+        _, _, _, cuerpo = self.medir(f'/api/informes/lesiones/?{rango}&formato=ndjson')
+        cabecera, *lineas = [json.loads(linea) for linea in cuerpo.decode().splitlines()]
+        self.assertEqual(cabecera, {'periodo': esperado['periodo'], 'resumen': esperado['resumen']})
+        for linea in lineas:
+            self.assertEqual(set(linea), {'seccion', 'registro'})
+            self.assertIn(linea['seccion'], secciones)
+        for seccion in secciones:
+            self.assertEqual(
+                [linea['registro'] for linea in lineas if linea['seccion'] == seccion], esperado[seccion], seccion
+            )
+
+        _, _, _, cuerpo = self.medir(f'/api/informes/lesiones/?{rango}&formato=csv')
+        filas = list(csv.reader(io.StringIO(cuerpo.decode())))
+        self.assertEqual(filas[0], ['seccion', 'inicio', 'fin', *esperado['resumen']])
+        self.assertEqual(filas[1][:3], ['resumen', str(inicio), str(hoy)])
+        encabezados = []
+        for fila in filas[2:]:
+            if fila[0] == 'seccion':
+                encabezados.append(fila)
+            else:
+                self.assertEqual(len(fila), len(encabezados[-1]))
+        # Una fila de encabezados por sección con datos, con sus propias columnas
+        con_datos = [seccion for seccion in secciones if esperado[seccion]]
+        self.assertEqual(len(encabezados), len(con_datos))
+        for encabezado, seccion in zip(encabezados, con_datos):
+            self.assertEqual(encabezado, ['seccion', *esperado[seccion][0]])
+        self.assertEqual(
+            [fila[0] for fila in filas[2:] if fila[0] != 'seccion'],
+            [seccion for seccion in con_datos for _ in esperado[seccion]],
+        )
+
+    def test_informe_periodo_cerrado_desde_snapshot(self):
+        ayer = datetime.date.today() - datetime.timedelta(days=1)
+        url = f'/api/informes/lesiones/?start_date={ayer - datetime.timedelta(days=60)}&end_date={ayer}'
+        primera = self.client.get(url)
+        self.assertDentroDePresupuesto(url, 1, 200_000)
+        respuesta, total, _, cuerpo = self.medir(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual((total, cuerpo), (1, b''))
+
+    def test_snapshot_se_invalida_al_escribir_en_el_periodo(self):
+        hoy = datetime.date.today()
+        ayer = hoy - datetime.timedelta(days=1)
+        inicio = ayer - datetime.timedelta(days=60)
+        url = f'/api/informes/lesiones/?start_date={inicio}&end_date={ayer}'
+        datos = {
+            'jugador': self.jugadores[1], 'diagnostico_medico': 'Contusión', 'tipo_lesion': 'contusion',
+            'region_cuerpo': 'rodilla_der', 'mecanismo_lesional': 'contacto', 'condicion_lesion': 'aguda',
+            'etapa_deportiva_lesion': 'entrenamiento', 'gravedad_lesion': 'leve',
+        }
+
+        def snapshot_regenerado():
+            self.client.get(url)
+            return InformeLesionesSnapshot.objects.get()
+
+        def escribir(operacion):
+            with self.captureOnCommitCallbacks(execute=True):
+                return operacion()
+
+        snapshot_regenerado()
+        # Escrituras fuera del período no lo tocan
+        escribir(lambda: Lesion.objects.create(fecha_lesion=hoy, **datos))
+        escribir(lambda: EstadoDiarioLesion.objects.create(lesion=self.lesiones[0], fecha=hoy, estado='camilla'))
+        self.assertTrue(InformeLesionesSnapshot.objects.exists())
+
+        # Crear o editar una lesión del período lo descarta
+        lesion = escribir(lambda: Lesion.objects.create(fecha_lesion=inicio + datetime.timedelta(days=5), **datos))
+        self.assertFalse(InformeLesionesSnapshot.objects.exists())
+        snapshot_regenerado()
+        lesion.fecha_lesion = hoy
+        escribir(lesion.save)
+        self.assertFalse(InformeLesionesSnapshot.objects.exists())
+
+        # Crear o editar un estado diario con fecha en el período también
+        snapshot_regenerado()
+        estado = EstadoDiarioLesion.objects.filter(fecha__range=[inicio, ayer]).first()
+        estado.estado = 'gimnasio'
+        escribir(estado.save)
+        self.assertFalse(InformeLesionesSnapshot.objects.exists())
+        snapshot_regenerado()
+        escribir(lambda: EstadoDiarioLesion.objects.create(lesion=lesion, fecha=inicio, estado='camilla'))
+        self.assertFalse(InformeLesionesSnapshot.objects.exists())
+
+    def test_snapshot_generado_durante_una_escritura_se_descarta(self):
+        ayer = datetime.date.today() - datetime.timedelta(days=1)
+        inicio = ayer - datetime.timedelta(days=60)
+
+        def generar_mientras_se_escribe():
+            # Otra petición confirma una lesión del período mientras se genera
+            with self.captureOnCommitCallbacks(execute=True):
+                Lesion.objects.create(
+                    jugador=self.jugadores[1], fecha_lesion=inicio, diagnostico_medico='Contusión',
+                    tipo_lesion='contusion', region_cuerpo='rodilla_der', mecanismo_lesional='contacto',
+                    condicion_lesion='aguda', etapa_deportiva_lesion='entrenamiento', gravedad_lesion='leve',
+                )
+            return {'nuevas_lesiones': []}
+
+        snapshot = snapshot_informe('informe', inicio, ayer, generar_mientras_se_escribe)
+        self.assertEqual(json.loads(snapshot.contenido), {'nuevas_lesiones': []})
+        self.assertFalse(InformeLesionesSnapshot.objects.exists())
+        # Sin escrituras en paralelo el snapshot sí se guarda
+        snapshot_informe('informe', inicio, ayer, lambda: {'nuevas_lesiones': []})
+        self.assertTrue(InformeLesionesSnapshot.objects.exists())
+
+    def test_snapshot_con_dias_restantes_vale_solo_hoy(self):
+        hoy = datetime.date.today()
+        ayer = hoy - datetime.timedelta(days=1)
+        url = f'/api/informes/lesiones/?start_date={ayer - datetime.timedelta(days=60)}&end_date={ayer}'
+        self.client.get(url)
+        self.assertIsNone(InformeLesionesSnapshot.objects.get().valido_hasta)
+
+        # Una lesión con días restantes numéricos hace que el contenido dependa de hoy
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesion.objects.create(
+                jugador=self.jugadores[1], fecha_lesion=ayer - datetime.timedelta(days=2), diagnostico_medico='Esguince',
+                tipo_lesion='ligamentosa', region_cuerpo='tobillo_der', mecanismo_lesional='contacto',
+                condicion_lesion='aguda', etapa_deportiva_lesion='partido', gravedad_lesion='grave',
+                dias_recuperacion_estimados=40,
+            )
+        primera = self.client.get(url)
+        snapshot = InformeLesionesSnapshot.objects.get()
+        self.assertEqual(snapshot.valido_hasta, hoy)
+        self.assertDentroDePresupuesto(url, 1, 200_000)
+
+        # Vencido, no se sirve: se regenera con los días restantes de hoy
+        InformeLesionesSnapshot.objects.update(valido_hasta=ayer, contenido='{}', etag='vencido')
+        respuesta, total, _, _ = self.medir(url)
+        self.assertGreater(total, 1)
+        self.assertEqual(respuesta.json(), primera.json())
+        self.assertEqual(InformeLesionesSnapshot.objects.get().valido_hasta, hoy)
+
+    def test_permisos_no_consultan_roles_en_cada_peticion(self):
+        self.client.force_authenticate(self.medico)
+        self.client.get('/api/lesiones/activas/')
+        _, con_cache, _, _ = self.medir('/api/divisiones/')
+        self.assertEqual(con_cache, 2)
+
+    def test_checklists_por_lote(self):
+        partido = Partido.objects.create(fecha=datetime.date.today(), rival='Rival lote', condicion='visita')
+        partido.convocados.set(self.jugadores[:22])
+        ChecklistPostPartido.objects.create(jugador=self.jugadores[0], partido=partido, dolor_molestia=True)
+        filas = [
+            {'jugador': jugador.pk, 'dolor_molestia': False, 'observaciones_checklist': 'Sin molestias'}
+            for jugador in self.jugadores[:22]
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post('/api/checklists/lote/', {'partido': partido.pk, 'checklists': filas}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual((respuesta.data['creados'], respuesta.data['actualizados']), (21, 1))
+        # Incluye el SAVEPOINT y RELEASE de atomic() y las dos del resumen clínico
+        self.assertLessEqual(len(consultas), 9)
+        self.assertFalse(partido.checklists.filter(dolor_molestia=True).exists())
+        self.assertEqual(partido.checklists.filter(realizado_por=self.admin).count(), 22)
+
+        no_convocado = self.jugadores[CANTIDAD_JUGADORES - 1]
+        respuesta = self.client.post('/api/checklists/lote/', {'partido': partido.pk, 'checklists': [
+            filas[0], {'jugador': no_convocado.pk}, filas[0]
+        ]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([error['indice'] for error in respuesta.data['errores']], [1, 2])
+
+    def test_parte_diario(self):
+        activas = list(Lesion.objects.filter(esta_activa=True).values_list('pk', flat=True))
+        hoy = datetime.date.today()
+        parte = {'fecha': str(hoy), 'estados': [{'lesion': pk, 'estado': 'gimnasio'} for pk in activas]}
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/estados-diarios/parte_diario/', parte, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual((respuesta.data['creados'], respuesta.data['actualizados']), (len(activas), 0))
+
+        # Reenviar el parte lo reemplaza en vez de fallar por (lesion, fecha)
+        parte['estados'][0]['estado'] = 'reintegro'
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/estados-diarios/parte_diario/', parte, format='json')
+        self.assertEqual((respuesta.data['creados'], respuesta.data['actualizados']), (0, len(activas)))
+        self.assertEqual(EstadoDiarioLesion.objects.get(lesion_id=activas[0], fecha=hoy).estado, 'reintegro')
+        self.assertEqual(EstadoDiarioLesion.objects.filter(fecha=hoy, registrado_por=self.admin).count(), len(activas))
+
+        # El resumen incremental coincide con una reconstrucción completa
+        resumen = ResumenDiarioLesiones.objects.filter(fecha=hoy).totales(hoy, hoy)
+        reconstruir_resumen_lesiones()
+        self.assertEqual(resumen, ResumenDiarioLesiones.objects.filter(fecha=hoy).totales(hoy, hoy))
+        self.assertEqual(resumen['total_cambios_diarios'], len(activas))
+
+        respuesta = self.client.post('/api/estados-diarios/parte_diario/', {'estados': [
+            {'lesion': activas[0], 'estado': 'camilla'}, {'lesion': 0, 'estado': 'camilla'},
+            {'lesion': activas[1], 'estado': 'inexistente'},
+        ]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([error['indice'] for error in respuesta.data['errores']], [1, 2])
+
+        # Fecha bien formada pero inexistente
+        respuesta = self.client.post('/api/estados-diarios/parte_diario/', {
+            'fecha': '2024-13-45', 'estados': [{'lesion': activas[0], 'estado': 'camilla'}]
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        # Un id de lesión enviado como texto es válido
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/estados-diarios/parte_diario/', {
+                'estados': [{'lesion': str(activas[0]), 'estado': 'camilla'}]
+            }, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(EstadoDiarioLesion.objects.get(lesion_id=activas[0], fecha=hoy).estado, 'camilla')
+
+    def test_convocatoria_por_lote(self):
+        partido = Partido.objects.create(fecha=datetime.date.today(), rival='Rival convocatoria', condicion='local')
+        url = f'/api/partidos/{partido.pk}/convocatoria/'
+        ids = [jugador.pk for jugador in self.jugadores]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, {'agregar': ids[:22]}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(len(respuesta.data['convocados']), 22)
+        # Incluye el SAVEPOINT y RELEASE de atomic() dentro de la transacción del test
+        self.assertLessEqual(len(consultas), 8)
+
+        # Superar el máximo no modifica la convocatoria
+        respuesta = self.client.post(url, {'agregar': ids[22:24], 'quitar': ids[:1]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(partido.convocados.count(), 22)
+        with mock.patch.object(Partido, 'MAXIMO_CONVOCADOS', 21):
+            respuesta = self.client.post(f'/api/partidos/{partido.pk}/convocar_jugador/', {'jugador_id': ids[30]}, format='json')
+        self.assertEqual(respuesta.data['error'], 'No se pueden convocar más de 21 jugadores para un partido.')
+
+        respuesta = self.client.post(url, {'agregar': ids[22:23], 'quitar': [str(ids[0])]}, format='json')
+        self.assertEqual((respuesta.data['agregados'], respuesta.data['quitados']), ([ids[22]], [ids[0]]))
+        for invalido in ([True], ['uno'], [1.5], str(ids[1]), {'id': ids[1]}):
+            with self.subTest(agregar=invalido):
+                self.assertEqual(self.client.post(url, {'agregar': invalido}, format='json').status_code, 400)
+        respuesta = self.client.post(f'/api/partidos/{partido.pk}/convocar_jugador/', {'jugador_id': ids[30]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_numero_ficha_desde_secuencia(self):
+        datos = {'nombres': 'Nuevo', 'apellidos': 'Jugador', 'fecha_nacimiento': datetime.date(2000, 1, 1),
+                 'lateralidad': 'zurdo', 'prevision_salud': 'isapre'}
+        self.assertEqual(Jugador.objects.create(rut=rut_valido(16_000_001), **datos).numero_ficha, f'{CANTIDAD_JUGADORES + 1:04d}')
+        # Una ficha asignada a mano (sobre 9999) no se vuelve a entregar
+        Jugador.objects.create(rut=rut_valido(16_000_002), numero_ficha='10000', **datos)
+        with CaptureQueriesContext(connection) as consultas:
+            jugador = Jugador.objects.create(rut=rut_valido(16_000_003), **datos)
+        self.assertEqual(jugador.numero_ficha, '10001')
+        self.assertFalse(any('ORDER BY' in consulta['sql'] for consulta in consultas.captured_queries))
+
+    def test_importar_jugadores(self):
+        contenido = (
+            'rut;nombres;apellidos;fecha_nacimiento;lateralidad;prevision_salud;division\n'
+            f'{rut_valido(17_000_001)};Nuevo;Uno;01/02/2008;diestro;fonasa;Sub-17\n'
+            f'{rut_valido(17_000_002)};Nuevo;Dos;2008-03-04;zurdo;isapre;\n'
+        )
+        archivo = SimpleUploadedFile('jugadores.csv', contenido.encode())
+        respuesta = self.client.post('/api/jugadores/importar/', {'archivo': archivo})
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.data['creados'], 2)
+        self.assertEqual(Jugador.objects.get(nombres='Nuevo', apellidos='Uno').division.nombre, 'Sub-17')
+
+        # Reimportar el mismo archivo reporta los duplicados sin guardar nada,
+        # también si el RUT está guardado con otra escritura
+        Jugador.objects.filter(rut=rut_valido(17_000_002)).update(rut=rut_valido(17_000_002).replace('-', ''))
+        archivo = SimpleUploadedFile('jugadores.csv', contenido.encode())
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post('/api/jugadores/importar/', {'archivo': archivo})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([error['fila'] for error in respuesta.data['errores']], [2, 3])
+        # La búsqueda de duplicados se limita a los RUT del archivo
+        consulta_ruts = next(c['sql'] for c in consultas.captured_queries if '"rut" IN' in c['sql'])
+        self.assertNotIn(self.jugadores[0].rut, consulta_ruts)
+
+        # Archivos de una sola columna o que no son CSV: 400 con el motivo
+        for nombre, texto in (('ruts.csv', f'rut\n{rut_valido(17_000_003)}\n'), ('notas.txt', 'Esto no es una planilla')):
+            with self.subTest(archivo=nombre):
+                respuesta = self.client.post('/api/jugadores/importar/', {'archivo': SimpleUploadedFile(nombre, texto.encode())})
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('Faltan columnas obligatorias', respuesta.data['error'])
+        respuesta = self.client.post('/api/jugadores/importar/', {
+            'archivo': SimpleUploadedFile('binario.csv', b'\xff\xfe\x00\x01')
+        })
+        self.assertEqual(respuesta.status_code, 400)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as archivo:
+            archivo.write('Esto no es una planilla')
+            archivo.flush()
+            with self.assertRaisesMessage(CommandError, 'Faltan columnas obligatorias'):
+                call_command('importar_jugadores', archivo.name, stdout=io.StringIO())
+
+        self.client.force_authenticate(self.medico)
+        archivo = SimpleUploadedFile('jugadores.csv', contenido.encode())
+        self.assertEqual(self.client.post('/api/jugadores/importar/', {'archivo': archivo}).status_code, 403)
+
+    def test_busqueda(self):
+        # Con SQLite BusquedaFilter usa search_fields; en PostgreSQL, los índices
+        respuesta = self.assertDentroDePresupuesto('/api/lesiones/?search=Apellido 12', 2, 8_000)
+        self.assertEqual({lesion['jugador'] for lesion in respuesta.json()['results']}, {self.jugadores[12].pk})
+        self.assertNotIn('busqueda', respuesta.json()['results'][0])
+        respuesta = self.assertDentroDePresupuesto('/api/estados-diarios/?search=desgarro', 2, 3_000)
+        self.assertTrue(respuesta.json()['results'])
+
+    def test_autocompletar_jugadores(self):
+        jugador = self.jugadores[7]
+        jugador.apellidos = 'Núñez Pérez'
+        # El índice se invalida al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            jugador.save()
+        url = '/api/jugadores/autocompletar/'
+        _, consultas, _, _ = self.medir(f'{url}?q=nunez')
+        respuesta, sin_consultas, _, _ = self.medir(f'{url}?q=pere nu')
+        self.assertEqual([fila['id'] for fila in respuesta.json()], [jugador.pk])
+        self.assertEqual((consultas, sin_consultas), (1, 0))
+
+        # RUT con o sin puntos y guión, y ficha sin ceros a la izquierda
+        cuerpo, dv = jugador.rut.replace('.', '').split('-')
+        for rut in (f'{cuerpo}{dv}', f'{cuerpo}-{dv}', f"{int(cuerpo):,}-{dv}".replace(',', '.'), f'{cuerpo[:-1]}'):
+            with self.subTest(rut=rut):
+                respuesta, _, _, _ = self.medir(f'{url}?q={rut}')
+                self.assertIn(jugador.pk, [fila['id'] for fila in respuesta.json()])
+        respuesta, _, _, _ = self.medir(f"{url}?q={jugador.numero_ficha.lstrip('0')}")
+        self.assertIn(jugador.pk, [fila['id'] for fila in respuesta.json()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jugador.delete()
+        self.assertEqual(self.medir(f'{url}?q=nunez')[0].json(), [])
+
+    def test_disponibilidad_jugadores(self):
+        respuesta = self.assertDentroDePresupuesto('/api/disponibilidad/', 2, 10_000)
+        datos = respuesta.json()
+        # Las lesiones abiertas de la fixture ya terminaron su historial en reintegro
+        abiertas = {jugador.pk for i, jugador in enumerate(self.jugadores) if i % 3 == 0}
+        self.assertEqual({jugador['id'] for jugador in datos['limitados']}, abiertas)
+        self.assertEqual(len(datos['disponibles']), CANTIDAD_JUGADORES - len(abiertas))
+        self.assertEqual(datos['no_disponibles'], [])
+
+        # Al segundo día de una lesión (en camilla) y el día del alta
+        lesion = self.lesiones[2]
+        dia = lesion.fecha_lesion + datetime.timedelta(days=1)
+        division = lesion.jugador.division_id
+        datos = self.client.get(f'/api/disponibilidad/?fecha={dia}&division={division}').json()
+        self.assertEqual([jugador['id'] for jugador in datos['no_disponibles']], [lesion.jugador_id])
+        self.assertEqual(datos['no_disponibles'][0]['lesiones'][0]['estado'], 'camilla')
+        datos = self.client.get(f'/api/disponibilidad/?start_date={lesion.fecha_fin}&end_date={lesion.fecha_fin}').json()
+        self.assertIn(lesion.jugador_id, {jugador['id'] for jugador in datos['disponibles']})
+        self.assertEqual(self.client.get('/api/disponibilidad/?fecha=sabado').status_code, 400)
+
+        # Por defecto es el día local (America/Santiago), no el de UTC: a las
+        # 23:00 del 9 de marzo en Santiago ya es 10 de marzo en UTC
+        Lesion.objects.create(
+            jugador=lesion.jugador, fecha_lesion=datetime.date(2026, 3, 9), fecha_fin=datetime.date(2026, 3, 10),
+            esta_activa=False, diagnostico_medico='Contusión', tipo_lesion='contusion', region_cuerpo='rodilla_der',
+            mecanismo_lesional='contacto', condicion_lesion='aguda', etapa_deportiva_lesion='partido',
+            gravedad_lesion='leve',
+        )
+        ahora = datetime.datetime(2026, 3, 10, 2, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=ahora):
+            datos = self.client.get(f'/api/disponibilidad/?division={division}').json()
+        self.assertIn(lesion.jugador_id, {jugador['id'] for jugador in datos['no_disponibles']})
+
+    def test_preparacion_convocatoria(self):
+        partido = self.partidos[0]
+        respuesta = self.assertDentroDePresupuesto(f'/api/partidos/{partido.pk}/preparacion/', 4, 40_000)
+        self.assertEqual(respuesta.json()['maximo_convocados'], Partido.MAXIMO_CONVOCADOS)
+        jugadores = {fila['id']: fila for fila in respuesta.json()['jugadores']}
+        self.assertEqual(set(jugadores), {jugador.pk for jugador in self.jugadores[:CONVOCADOS_POR_PARTIDO]})
+        self.assertEqual(jugadores[self.jugadores[0].pk]['disponibilidad'], 'limitado')
+        self.assertEqual(len(jugadores[self.jugadores[1].pk]['checklists_recientes']), 3)
+        self.assertEqual(jugadores[self.jugadores[1].pk]['checklists_recientes'][0]['partido'], self.partidos[1].pk)
+
+        ChecklistPostPartido.objects.filter(jugador=self.jugadores[1], partido=self.partidos[1]).update(
+            dolor_molestia=True, intensidad_dolor='8'
+        )
+        candidatos = ','.join(str(jugador.pk) for jugador in self.jugadores[:CONVOCADOS_POR_PARTIDO + 2])
+        respuesta, consultas, _, _ = self.medir(f'/api/partidos/{partido.pk}/preparacion/?jugadores={candidatos}')
+        jugadores = {fila['id']: fila for fila in respuesta.json()['jugadores']}
+        self.assertEqual(len(jugadores), CONVOCADOS_POR_PARTIDO + 2)
+        self.assertLessEqual(consultas, 4)
+        self.assertTrue(jugadores[self.jugadores[1].pk]['dolor_alto'])
+        self.assertFalse(jugadores[self.jugadores[CONVOCADOS_POR_PARTIDO].pk]['convocado'])
+
+    def test_intervalos_estado(self):
+        # Diez días camilla/gimnasio/reintegro quedan en tres intervalos por lesión
+        self.assertEqual(IntervaloEstadoLesion.objects.count(), 3 * len(self.lesiones))
+        respuesta = self.assertDentroDePresupuesto('/api/lesiones/activas/?historial=intervalos', 2, 30_000)
+        self.assertEqual(
+            [intervalo['estado'] for intervalo in respuesta.json()[0]['intervalos_estado']],
+            ['camilla', 'gimnasio', 'reintegro'],
+        )
+
+        activas = list(Lesion.objects.filter(esta_activa=True).values_list('pk', flat=True))
+        hoy = datetime.date.today()
+        for dias, estado in ((1, 'reintegro'), (2, 'reintegro'), (3, 'gimnasio')):
+            # Cada parte diario extiende o agrega un intervalo sin releer el historial
+            with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as consultas:
+                self.client.post('/api/estados-diarios/parte_diario/', {
+                    'fecha': str(hoy + datetime.timedelta(days=dias)),
+                    'estados': [{'lesion': pk, 'estado': estado} for pk in activas],
+                }, format='json')
+            self.assertFalse(any(
+                'ORDER BY "gestion_clinica_estadodiariolesion"."lesion_id"' in consulta['sql']
+                for consulta in consultas.captured_queries
+            ))
+        url = f'/api/lesiones/{activas[0]}/historial_diario/?historial=intervalos'
+        intervalos = [(i['estado'], i['dias_registrados']) for i in self.client.get(url).json()]
+        self.assertEqual(intervalos, [('camilla', 4), ('gimnasio', 3), ('reintegro', 5), ('gimnasio', 1)])
+
+        # Corregir o borrar un día anterior rehace los intervalos de esa lesión
+        estado = EstadoDiarioLesion.objects.filter(lesion_id=activas[0]).order_by('fecha')[5]
+        with self.captureOnCommitCallbacks(execute=True):
+            estado.estado = 'camilla'
+            estado.save()
+            EstadoDiarioLesion.objects.filter(lesion_id=activas[0]).order_by('-fecha').first().delete()
+        intervalos = [(i['estado'], i['dias_registrados']) for i in self.client.get(url).json()]
+        self.assertEqual(intervalos, [('camilla', 4), ('gimnasio', 1), ('camilla', 1), ('gimnasio', 1), ('reintegro', 5)])
+
+    def test_lesiones_activas_paginadas(self):
+        activas = Lesion.objects.filter(esta_activa=True).count()
+        completa = self.assertDentroDePresupuesto('/api/lesiones/activas/', 2, 75_000).json()
+        self.assertEqual(len(completa), activas)
+        self.assertEqual({lesion['estado_actual'] for lesion in completa}, {'reintegro'})
+
+        # COUNT, página y prefetch recortado a los 3 estados más recientes por lesión
+        respuesta = self.assertDentroDePresupuesto('/api/lesiones/activas/?page=1&historial_dias=3', 3, 24_000)
+        pagina = respuesta.json()
+        self.assertEqual((pagina['count'], len(pagina['results'])), (activas, settings.REST_FRAMEWORK['PAGE_SIZE']))
+        for lesion in pagina['results']:
+            self.assertEqual([estado['estado'] for estado in lesion['historial_diario']], ['reintegro'] * 3)
+        sin_historial = self.assertDentroDePresupuesto('/api/lesiones/activas/?paginacion=cursor&historial_dias=0', 2, 11_000)
+        self.assertEqual(sin_historial.json()['results'][0]['historial_diario'], [])
+
+    def test_resumen_clinico_jugador(self):
+        jugador = self.jugadores[1]
+        url = f'/api/jugadores/{jugador.pk}/'
+        self.assertEqual(self.client.get(url).json()['resumen_clinico']['disponibilidad'], 'disponible')
+        self.assertEqual(self.assertDentroDePresupuesto('/api/jugadores/', 2, 40_000).json()['count'],
+                         CANTIDAD_JUGADORES)
+
+        respuesta = self.client.post('/api/lesiones/', {
+            'jugador': jugador.pk, 'fecha_lesion': str(datetime.date.today()), 'diagnostico_medico': 'Esguince',
+            'tipo_lesion': 'ligamentosa', 'region_cuerpo': 'tobillo_der', 'mecanismo_lesional': 'contacto',
+            'condicion_lesion': 'aguda', 'etapa_deportiva_lesion': 'partido', 'gravedad_lesion': 'grave',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        lesion = respuesta.json()['id']
+        resumen = self.client.get(url).json()['resumen_clinico']
+        self.assertEqual((resumen['lesiones_activas'], resumen['peor_gravedad_activa'], resumen['disponibilidad']),
+                         (1, 'grave', 'no_disponible'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/estados-diarios/parte_diario/', {'estados': [{'lesion': lesion, 'estado': 'gimnasio'}]}, format='json')
+        self.assertEqual(JugadorResumenClinico.objects.get(jugador=jugador).disponibilidad, 'limitado')
+
+        ChecklistPostPartido.objects.filter(jugador=jugador, partido=self.partidos[0]).update(intensidad_dolor='3')
+        checklist = ChecklistPostPartido.objects.get(jugador=jugador, partido=self.partidos[0])
+        checklist.intensidad_dolor = '8'
+        checklist.save()
+        AtencionKinesica.objects.create(jugador=jugador, motivo_consulta='Control', prestaciones_realizadas='Crioterapia',
+                                        estado_actual='tratamiento')
+        resumen = JugadorResumenClinico.objects.get(jugador=jugador)
+        self.assertEqual(resumen.ultima_intensidad_dolor, 8)
+        self.assertEqual(resumen.ultima_atencion, AtencionKinesica.objects.filter(jugador=jugador).latest('fecha_atencion').fecha_atencion)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesion.objects.get(pk=lesion).delete()
+        resumen.refresh_from_db()
+        self.assertEqual((resumen.lesiones_activas, resumen.disponibilidad), (0, 'disponible'))
+        # El resumen mantenido coincide con recalcularlo desde cero
+        antes = list(JugadorResumenClinico.objects.order_by('pk').values_list('pk', 'lesiones_activas', 'disponibilidad'))
+        actualizar_resumen_clinico()
+        self.assertEqual(antes, list(JugadorResumenClinico.objects.order_by('pk').values_list('pk', 'lesiones_activas', 'disponibilidad')))
+
+
+class TokensJWTTests(APITestCase):
+    """Claims de roles y de usuario en los JWT y autenticación sin consulta (JWT_SIN_CONSULTA)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medico = User.objects.create_user(username='22222222-2', password='clave-segura-123', first_name='Ana')
+        cls.medico.groups.add(Group.objects.get(name='Cuerpo médico'))
+        jugador = Jugador.objects.create(
+            rut=rut_valido(18_000_001), nombres='Token', apellidos='Prueba', fecha_nacimiento=datetime.date(2000, 1, 1),
+            lateralidad='diestro', prevision_salud='fonasa',
+        )
+        cls.lesion = Lesion.objects.create(
+            jugador=jugador, fecha_lesion=datetime.date.today(), diagnostico_medico='Desgarro grado I',
+            tipo_lesion='muscular', region_cuerpo='muslo_post_der', mecanismo_lesional='sin_contacto',
+            condicion_lesion='aguda', etapa_deportiva_lesion='competencia', gravedad_lesion='moderada',
+        )
+
+    def setUp(self):
+        # La caché de roles es del proceso y no se revierte con la transacción del test
+        invalidar_roles()
+
+    def modo(self, **opciones):
+        return self.settings(GESTION_CLINICA={**settings.GESTION_CLINICA, **opciones})
+
+    def emitir(self, username='22222222-2', password='clave-segura-123'):
+        respuesta = self.client.post('/api/auth/token/', {'username': username, 'password': password}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+    def refrescar(self, refresh):
+        respuesta = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()['access']
+
+    def parte_diario(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/estados-diarios/parte_diario/', {
+                'estados': [{'lesion': self.lesion.pk, 'estado': 'camilla'}]
+            }, format='json')
+
+    def test_roles_en_el_token(self):
+        with self.modo(ROLES_EN_TOKEN=True):
+            tokens = self.emitir()
+        self.assertEqual(AccessToken(tokens['access'])[CLAIM_ROLES], ['Cuerpo médico'])
+        self.assertEqual(RefreshToken(tokens['refresh'])[CLAIM_ROLES], ['Cuerpo médico'])
+
+        # Sin ROLES_EN_TOKEN (valor por defecto) el token no trae roles
+        tokens = self.emitir()
+        self.assertNotIn(CLAIM_ROLES, AccessToken(tokens['access']))
+        self.assertNotIn(CLAIM_ROLES, AccessToken(self.refrescar(tokens['refresh'])))
+
+    def test_cambio_de_rol_se_refleja_al_refrescar(self):
+        with self.modo(ROLES_EN_TOKEN=True):
+            tokens = self.emitir()
+            self.medico.groups.set([Group.objects.get(name='Cuerpo técnico')])
+
+            # El access token vigente conserva el rol con que se emitió...
+            self.assertEqual(self.parte_diario(tokens['access']).status_code, 200)
+            # ...y el refresco vuelve a leer los roles desde la base de datos
+            access = self.refrescar(tokens['refresh'])
+            self.assertEqual(AccessToken(access)[CLAIM_ROLES], ['Cuerpo técnico'])
+            self.assertEqual(self.parte_diario(access).status_code, 403)
+
+    def consultas_de_usuario(self, access, metodo, url, datos=None):
+        """Respuesta y cantidad de consultas a la tabla de usuarios"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            respuesta = getattr(self.client, metodo)(url, datos, format='json')
+        return respuesta, sum('"auth_user"' in consulta['sql'] for consulta in consultas.captured_queries)
+
+    def test_lectura_autenticada_solo_con_claims(self):
+        with self.modo(JWT_SIN_CONSULTA=True):
+            access = self.emitir()['access']
+            self.assertEqual(AccessToken(access)['username'], '22222222-2')
+            respuesta, consultas_usuario = self.consultas_de_usuario(access, 'get', '/api/divisiones/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(consultas_usuario, 0)
+
+    def test_escritura_con_usuario_bd_carga_el_usuario(self):
+        with self.modo(JWT_SIN_CONSULTA=True):
+            access = self.emitir()['access']
+            respuesta, consultas_usuario = self.consultas_de_usuario(
+                access, 'post', '/api/estados-diarios/parte_diario/',
+                {'estados': [{'lesion': self.lesion.pk, 'estado': 'camilla'}]}
+            )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertGreaterEqual(consultas_usuario, 1)
+        self.assertEqual(EstadoDiarioLesion.objects.get(lesion=self.lesion).registrado_por, self.medico)
+
+    def test_token_sin_claim_de_roles_carga_el_usuario(self):
+        # Emitido antes de activar el modo: no trae roles ni datos de usuario
+        access = self.emitir()['access']
+        with self.modo(JWT_SIN_CONSULTA=True):
+            respuesta, consultas_usuario = self.consultas_de_usuario(access, 'get', '/api/divisiones/')
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertGreaterEqual(consultas_usuario, 1)
+            # Y los permisos de escritura se resuelven con los grupos del usuario
+            self.assertEqual(self.parte_diario(access).status_code, 200)
+
+    def test_is_staff_desde_el_claim(self):
+        admin = User.objects.get(username='19976194-3')
+        with self.modo(JWT_SIN_CONSULTA=True):
+            access_admin = str(RefreshTokenConRoles.for_user(admin).access_token)
+            access = self.emitir()['access']
+            self.assertEqual(self.consultas_de_usuario(access_admin, 'get', '/api/usuarios/')[0].status_code, 200)
+            self.assertEqual(self.consultas_de_usuario(access, 'get', '/api/usuarios/')[0].status_code, 403)
+
+            # IsAdminUser lee is_staff del token: el cambio se aplica con un token nuevo
+            User.objects.filter(pk=self.medico.pk).update(is_staff=True)
+            self.assertEqual(self.consultas_de_usuario(access, 'get', '/api/usuarios/')[0].status_code, 403)
+            access = self.emitir()['access']
+            self.assertTrue(AccessToken(access)['is_staff'])
+            self.assertEqual(self.consultas_de_usuario(access, 'get', '/api/usuarios/')[0].status_code, 200)
+
+    def test_is_staff_revocado_al_refrescar(self):
+        User.objects.filter(pk=self.medico.pk).update(is_staff=True)
+        with self.modo(JWT_SIN_CONSULTA=True):
+            tokens = self.emitir()
+            User.objects.filter(pk=self.medico.pk).update(is_staff=False, first_name='Ana María')
+
+            self.client.credentials()
+            respuesta = self.client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+            self.assertEqual(respuesta.status_code, 200, respuesta.content)
+            access = AccessToken(respuesta.json()['access'])
+            self.assertFalse(access['is_staff'])
+            self.assertEqual(access['full_name'], 'Ana María')
+            # El refresh token rotado tampoco arrastra el claim antiguo
+            self.assertFalse(RefreshToken(respuesta.json()['refresh'])['is_staff'])
+            self.assertEqual(self.consultas_de_usuario(str(access), 'get', '/api/usuarios/')[0].status_code, 403)
+
+    def test_usuario_inactivo_no_puede_refrescar(self):
+        with self.modo(JWT_SIN_CONSULTA=True):
+            refresh = self.emitir()['refresh']
+            User.objects.filter(pk=self.medico.pk).update(is_active=False)
+            respuesta = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class InstrumentacionTests(APITestCase):
+    """Cabecera Server-Timing y endpoint de métricas de InstrumentacionMiddleware"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.get(username='19976194-3')
+        cls.medico = User.objects.create_user(username='22222222-2', password='clave-segura-123')
+        cls.medico.groups.add(Group.objects.get(name='Cuerpo médico'))
+        Division.objects.create(nombre='Primer Equipo')
+
+    def setUp(self):
+        invalidar_roles()
+        histograma.reiniciar()
+
+    def modo(self, **opciones):
+        return self.settings(GESTION_CLINICA={**settings.GESTION_CLINICA, **opciones})
+
+    def test_server_timing_solo_para_staff(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/divisiones/'))
+        self.client.force_authenticate(self.medico)
+        respuesta = self.client.get('/api/divisiones/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Server-Timing', respuesta)
+
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/divisiones/')
+        self.assertRegex(
+            respuesta['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{len(consultas)} consultas", serializacion;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+        with self.modo(SERVER_TIMING='ninguno'):
+            self.assertNotIn('Server-Timing', self.client.get('/api/divisiones/'))
+        self.client.force_authenticate(None)
+        with self.modo(SERVER_TIMING='todos'):
+            self.assertIn('Server-Timing', self.client.get('/api/divisiones/'))
+
+    def test_metricas_solo_para_administradores(self):
+        self.assertEqual(self.client.get('/api/metricas/rendimiento/').status_code, 401)
+        self.client.force_authenticate(self.medico)
+        self.assertEqual(self.client.get('/api/metricas/rendimiento/').status_code, 403)
+        self.assertEqual(self.client.delete('/api/metricas/rendimiento/').status_code, 403)
+
+    def test_percentiles_y_reinicio(self):
+        self.client.force_authenticate(self.admin)
+        for _ in range(3):
+            self.client.get('/api/divisiones/')
+        self.client.get(f'/api/divisiones/{Division.objects.get().pk}/')
+
+        endpoints = self.client.get('/api/metricas/rendimiento/').json()['endpoints']
+        self.assertEqual(endpoints['DivisionViewSet.list']['peticiones'], 3)
+        self.assertEqual(endpoints['DivisionViewSet.retrieve']['peticiones'], 1)
+        for metrica in HistogramaEndpoints.METRICAS:
+            valores = endpoints['DivisionViewSet.list'][metrica]
+            self.assertEqual(set(valores), {'p50', 'p95', 'max'})
+            self.assertLessEqual(valores['p50'], valores['p95'])
+            self.assertLessEqual(valores['p95'], valores['max'])
+
+        self.assertEqual(self.client.delete('/api/metricas/rendimiento/').status_code, 204)
+        endpoints = self.client.get('/api/metricas/rendimiento/').json()['endpoints']
+        # Sólo queda el propio DELETE, registrado después de reiniciar
+        self.assertEqual(set(endpoints), {'MetricasRendimientoView.delete'})
+
+    def test_percentil_por_rango_mas_cercano(self):
+        valores = list(range(1, 21))
+        self.assertEqual((percentil(valores, 50), percentil(valores, 95), percentil(valores, 100)), (10, 19, 20))
+        self.assertEqual(percentil([7], 50), 7)
+
+
+class ComandosTests(TestCase):
+    """Ejecución de los comandos de datos sintéticos y benchmark con volúmenes chicos"""
+    PARAMETROS_DATOS = {
+        'jugadores': 30, 'divisiones': 2, 'temporadas': 1, 'partidos_por_temporada': 4,
+        'atenciones_por_temporada': 3, 'batch_size': 50,
+    }
+
+    def generar_datos(self, **opciones):
+        salida = io.StringIO()
+        call_command('generar_datos_sinteticos', stdout=salida, **{**self.PARAMETROS_DATOS, **opciones})
+        return salida.getvalue()
+
+    def test_generar_datos_sinteticos(self):
+        salida = self.generar_datos()
+        self.assertIn('Datos generados', salida)
+        self.assertEqual(Jugador.objects.count(), 30)
+        self.assertEqual(Division.objects.count(), 2)
+        self.assertEqual(Partido.objects.count(), 4)
+        self.assertTrue(Lesion.objects.exists())
+        self.assertFalse(Lesion.objects.filter(historial_diario__isnull=True).exists())
+        self.assertEqual(ChecklistPostPartido.objects.count(), Partido.convocados.through.objects.count())
+        # Las tablas derivadas quedan consistentes con los datos generados
+        self.assertEqual(JugadorResumenClinico.objects.count(), 30)
+        self.assertEqual(
+            set(IntervaloEstadoLesion.objects.values_list('lesion', flat=True)),
+            set(Lesion.objects.values_list('pk', flat=True)),
+        )
+        hoy = datetime.date.today()
+        totales = ResumenDiarioLesiones.objects.totales(hoy - datetime.timedelta(days=365), hoy)
+        reconstruir_resumen_lesiones()
+        self.assertEqual(totales, ResumenDiarioLesiones.objects.totales(hoy - datetime.timedelta(days=365), hoy))
+
+        # Una segunda corrida con la misma semilla no repite RUT ni fichas
+        self.generar_datos(divisiones=1, partidos_por_temporada=0)
+        self.assertEqual(Jugador.objects.count(), 60)
+        self.assertEqual(Jugador.objects.values('numero_ficha').distinct().count(), 60)
+
+
+# El cliente en proceso pide con Host: localhost, que DEBUG = True permite sin declararlo
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkApiTests(TransactionTestCase):
+    """
+    benchmark_api en proceso: sus hilos usan conexiones propias, así que los
+    datos tienen que estar confirmados (no sirve la transacción de TestCase)
+    """
+    serialized_rollback = True
+
+    def setUp(self):
+        call_command('generar_datos_sinteticos', stdout=io.StringIO(), **ComandosTests.PARAMETROS_DATOS)
+        self.rut = rut_valido(19_000_001)
+        User.objects.create_superuser(username=self.rut, password='clave-benchmark-123')
+        self.salida = self.enterContext(tempfile.TemporaryDirectory())
+
+    def benchmark(self, *argumentos):
+        salida = io.StringIO()
+        call_command(
+            'benchmark_api', '--rut', self.rut, '--password', 'clave-benchmark-123', '--peticiones', '12',
+            '--calentamiento', '2', '--concurrencia', '1', '--salida', self.salida, *argumentos, stdout=salida,
+        )
+        return salida.getvalue()
+
+    def test_benchmark_en_proceso(self):
+        self.assertIn('Resultado guardado en', self.benchmark('--perfil', 'post_partido'))
+        archivo, = Path(self.salida).glob('*_post_partido.json')
+        resultado = json.loads(archivo.read_text())
+        self.assertEqual((resultado['peticiones'], resultado['errores'], resultado['modo']), (12, 0, 'en_proceso'))
+        self.assertEqual(sum(datos['peticiones'] for datos in resultado['por_endpoint'].values()), 12)
+        # Las consultas se leen de Server-Timing, que recibe porque es staff
+        self.assertGreater(resultado['consultas']['max'], 0)
+
+        self.assertIn('Comparación', self.benchmark('--perfil', 'diario', '--comparar', str(archivo)))
+
+    def test_login_fallido(self):
+        with self.assertRaisesMessage(CommandError, 'Login fallido'):
+            call_command('benchmark_api', '--rut', self.rut, '--password', 'otra', '--salida', self.salida,
+                         stdout=io.StringIO())
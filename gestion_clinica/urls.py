@@ -4,6 +4,7 @@ from .views import (
     DivisionViewSet, JugadorViewSet, AtencionKinesicaViewSet,
     LesionViewSet, ArchivoMedicoViewSet, ChecklistPostPartidoViewSet, PartidoViewSet,
     EstadoDiarioLesionViewSet, EstadosLesionListView, InformeLesionesView,
+    InformeLesionesResumenView, DisponibilidadJugadoresView, MetricasRendimientoView,
     login_view, register_view, UserManagementViewSet
 )
 from rest_framework_simplejwt.views import (
@@ -31,6 +32,11 @@ urlpatterns = [
     path('estados-lesion-opciones/', EstadosLesionListView.as_view(), name='estados-lesion-opciones'),
     # Vista para generar informes de lesiones
     path('informes/lesiones/', InformeLesionesView.as_view(), name='informe-lesiones'),
+    path('informes/lesiones/resumen/', InformeLesionesResumenView.as_view(), name='informe-lesiones-resumen'),
+    # Jugadores disponibles, limitados y no disponibles por fecha o rango
+    path('disponibilidad/', DisponibilidadJugadoresView.as_view(), name='disponibilidad-jugadores'),
+    # Percentiles de rendimiento por endpoint (solo administradores)
+    path('metricas/rendimiento/', MetricasRendimientoView.as_view(), name='metricas-rendimiento'),
     # Rutas de autenticación
     path('auth/login/', login_view, name='auth-login'),
     path('auth/register/', register_view, name='auth-register'),
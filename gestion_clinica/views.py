@@ -1,30 +1,51 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, permissions, filters, serializers, status
+from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate, login
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from django.contrib.auth.models import Group
 from .models import (
     Division, Jugador, AtencionKinesica, 
     Lesion, ArchivoMedico, ChecklistPostPartido, Partido,
-    EstadoDiarioLesion, UserProfile
+    EstadoDiarioLesion, UserProfile, registrar_estados_diarios, ultimo_estado_diario,
+    actualizar_resumen_clinico
 )
 from .serializers import (
     DivisionSerializer, JugadorSerializer, 
     AtencionKinesicaSerializer, LesionSerializer,
     ArchivoMedicoSerializer, ChecklistPostPartidoSerializer, PartidoSerializer,
     UserRegistrationSerializer, UserLoginSerializer, UserBasicSerializer,
-    UserSerializer, EstadoDiarioLesionSerializer, LesionActivaSerializer,
-    UserDetailSerializer, UserRegistrationByAdminSerializer
+    UserSerializer, EstadoDiarioLesionSerializer, LesionActivaSerializer, LesionActivaIntervalosSerializer,
+    IntervaloEstadoLesionSerializer,
+    UserDetailSerializer, UserRegistrationByAdminSerializer, ChecklistPostPartidoLoteSerializer,
+    EstadoDiarioLoteSerializer, parsear_expand
 )
+import os
 import re
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from .roles import RefreshTokenConRoles, ROL_ADMINISTRADOR, ROL_CUERPO_MEDICO, rol_principal, tiene_rol
+from .middleware import histograma
+from .importacion import importar_jugadores, leer_filas
+from .busqueda import BusquedaFilter
+from .autocompletar import indice_jugadores
+from .disponibilidad import disponibilidad_jugadores
+from .preparacion import preparacion_convocatoria
+from .proyecciones import ProyeccionPorAccionMixin, proyectar_queryset
+from .informes import (
+    informe_lesiones, informe_lesiones_ndjson, informe_lesiones_csv, graficos_informe_lesiones,
+    es_periodo_cerrado, snapshot_informe
+)
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+from django.utils.dateparse import parse_date
 
 User = get_user_model()
 
@@ -37,10 +58,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return request.user.is_authenticated
-        return request.user.is_authenticated and (
-            request.user.is_superuser or 
-            request.user.groups.filter(name='Administrador').exists()
-        )
+        return tiene_rol(request.user, ROL_ADMINISTRADOR, token=request.auth)
 
 class IsMedicoOrAdmin(permissions.BasePermission):
     """
@@ -53,8 +71,7 @@ class IsMedicoOrAdmin(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
-        return (request.user.is_superuser or 
-                request.user.groups.filter(name__in=['Administrador', 'Cuerpo médico']).exists())
+        return tiene_rol(request.user, ROL_ADMINISTRADOR, ROL_CUERPO_MEDICO, token=request.auth)
 
 # Vista para gestión de usuarios (solo administradores)
 class UserManagementViewSet(viewsets.ModelViewSet):
@@ -129,69 +146,87 @@ class UserManagementViewSet(viewsets.ModelViewSet):
 
 # Create your views here.
 
+def rango_fechas_informe(request):
+    """
+    Lee y valida start_date y end_date. Devuelve (inicio, fin, None) o
+    (None, None, respuesta de error)
+    """
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    
+    if not start_date or not end_date:
+        return None, None, Response({
+            'error': 'Los parámetros start_date y end_date son requeridos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start_date = parse_date(start_date)
+        end_date = parse_date(end_date)
+    except ValueError:
+        start_date = end_date = None
+    if start_date is None or end_date is None:
+        return None, None, Response({
+            'error': 'Las fechas deben tener el formato AAAA-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return start_date, end_date, None
+
+def respuesta_snapshot(request, snapshot):
+    """
+    Respuesta con el JSON guardado en el snapshot y un ETag fuerte. Si el
+    cliente ya tiene esa versión (If-None-Match) responde 304 sin cuerpo.
+    """
+    etag = quote_etag(snapshot.etag)
+    etags_cliente = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in etags_cliente or '*' in etags_cliente:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.contenido, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 class InformeLesionesView(APIView):
     """
-    Vista para generar informes de lesiones en un rango de fechas específico
+    Vista para generar informes de lesiones en un rango de fechas específico.
+
+    Con ?formato=ndjson o ?formato=csv el informe se emite por bloques en una
+    respuesta streaming en lugar de construirse completo en memoria.
+
+    Los informes JSON de períodos que terminan antes de hoy se sirven desde
+    un snapshot con ETag, por lo que el frontend puede revalidarlos con
+    If-None-Match.
     """
     permission_classes = [permissions.IsAuthenticated]
+    formatos_streaming = {
+        'ndjson': (informe_lesiones_ndjson, 'application/x-ndjson'),
+        'csv': (informe_lesiones_csv, 'text/csv; charset=utf-8'),
+    }
     
     def get(self, request, *args, **kwargs):
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        
-        if not start_date or not end_date:
+        start_date, end_date, error = rango_fechas_informe(request)
+        if error:
+            return error
+
+        formato = request.query_params.get('formato', 'json')
+        if formato in self.formatos_streaming:
+            generador, content_type = self.formatos_streaming[formato]
+            response = StreamingHttpResponse(generador(start_date, end_date, request), content_type=content_type)
+            if formato == 'csv':
+                response['Content-Disposition'] = f'attachment; filename="informe_lesiones_{start_date}_{end_date}.csv"'
+            return response
+        if formato != 'json':
             return Response({
-                'error': 'Los parámetros start_date y end_date son requeridos'
+                'error': 'Formato no soportado. Use json, ndjson o csv'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            from django.db.models import Q
-            
-            # Consultar nuevas lesiones en el rango de fechas
-            nuevas_lesiones = Lesion.objects.filter(
-                fecha_lesion__range=[start_date, end_date]
-            ).select_related('jugador').order_by('fecha_lesion')
-            
-            # Consultar lesiones finalizadas en el rango de fechas
-            lesiones_finalizadas = Lesion.objects.filter(
-                fecha_fin__range=[start_date, end_date]
-            ).select_related('jugador').order_by('fecha_fin')
-            
-            # Consultar lesiones activas (que no tienen fecha_fin o fecha_fin es posterior al período)
-            lesiones_activas = Lesion.objects.filter(
-                Q(fecha_fin__isnull=True) | Q(fecha_fin__gt=end_date),
-                fecha_lesion__lte=end_date
-            ).select_related('jugador').order_by('fecha_lesion')
-            
-            # Consultar cambios de estado diarios en el rango de fechas
-            cambios_diarios = EstadoDiarioLesion.objects.filter(
-                fecha__range=[start_date, end_date]
-            ).select_related('lesion__jugador', 'registrado_por').order_by('fecha')
-            
-            # Serializar los datos
-            nuevas_lesiones_data = LesionSerializer(nuevas_lesiones, many=True, context={'request': request}).data
-            lesiones_finalizadas_data = LesionSerializer(lesiones_finalizadas, many=True, context={'request': request}).data
-            lesiones_activas_data = LesionSerializer(lesiones_activas, many=True, context={'request': request}).data
-            cambios_diarios_data = EstadoDiarioLesionSerializer(cambios_diarios, many=True, context={'request': request}).data
-            
-            # Preparar respuesta estructurada
-            response_data = {
-                'periodo': {
-                    'inicio': start_date,
-                    'fin': end_date
-                },
-                'nuevas_lesiones': nuevas_lesiones_data,
-                'lesiones_finalizadas': lesiones_finalizadas_data,
-                'lesiones_activas': lesiones_activas_data,
-                'cambios_diarios': cambios_diarios_data,
-                'resumen': {
-                    'total_nuevas_lesiones': len(nuevas_lesiones_data),
-                    'total_lesiones_finalizadas': len(lesiones_finalizadas_data),
-                    'total_lesiones_activas': len(lesiones_activas_data),
-                    'total_cambios_diarios': len(cambios_diarios_data)
-                }
-            }
-            
+            if es_periodo_cerrado(end_date):
+                snapshot = snapshot_informe(
+                    'informe', start_date, end_date,
+                    lambda: informe_lesiones(start_date, end_date, request)
+                )
+                return respuesta_snapshot(request, snapshot)
+            response_data = informe_lesiones(start_date, end_date, request)
             return Response(response_data, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -199,41 +234,138 @@ class InformeLesionesView(APIView):
                 'error': f'Error al generar el informe: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class InformeLesionesResumenView(APIView):
+    """
+    Totales y series agrupadas (por día, tipo, gravedad, región, estado y
+    división) para los gráficos del dashboard. Se calcula sobre el resumen
+    diario precalculado, por lo que responde igual de rápido para rangos de
+    varios años. Acepta ?division=<id> para acotar a una división.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        start_date, end_date, error = rango_fechas_informe(request)
+        if error:
+            return error
+
+        division = request.query_params.get('division')
+        if division is not None and not division.isdigit():
+            return Response({
+                'error': 'El parámetro division debe ser un ID numérico'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if es_periodo_cerrado(end_date):
+            snapshot = snapshot_informe(
+                'graficos', start_date, end_date,
+                lambda: graficos_informe_lesiones(start_date, end_date, division),
+                filtros={'division': division}
+            )
+            return respuesta_snapshot(request, snapshot)
+        return Response(graficos_informe_lesiones(start_date, end_date, division))
+
+class DisponibilidadJugadoresView(APIView):
+    """
+    Jugadores disponibles, limitados (último estado diario en gimnasio o
+    reintegro) y no disponibles. Acepta ?fecha=AAAA-MM-DD o
+    ?start_date=&end_date= (por defecto, hoy) y ?division=<id>.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        fecha = request.query_params.get('fecha')
+        if fecha is not None:
+            try:
+                start_date = end_date = parse_date(fecha)
+            except ValueError:
+                start_date = end_date = None
+            if start_date is None:
+                return Response({
+                    'error': 'La fecha debe tener el formato AAAA-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        elif 'start_date' in request.query_params or 'end_date' in request.query_params:
+            start_date, end_date, error = rango_fechas_informe(request)
+            if error:
+                return error
+        else:
+            start_date = end_date = timezone.localdate()
+        if start_date > end_date:
+            return Response({
+                'error': 'start_date no puede ser posterior a end_date'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        division = request.query_params.get('division')
+        if division is not None and not division.isdigit():
+            return Response({
+                'error': 'El parámetro division debe ser un ID numérico'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'fecha_inicio': start_date,
+            'fecha_fin': end_date,
+            'division': division and int(division),
+            **disponibilidad_jugadores(start_date, end_date, division),
+        })
+
+class MetricasRendimientoView(APIView):
+    """
+    Percentiles p50/p95 por endpoint (vista y acción) de tiempo total,
+    tiempo en base de datos, tiempo de serialización y cantidad de
+    consultas. Los datos son del proceso que atiende la petición.
+    DELETE reinicia el histograma.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'proceso': os.getpid(),
+            'endpoints': histograma.resumen(),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        histograma.reiniciar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 # Vistas para la API REST
 class DivisionViewSet(viewsets.ModelViewSet):
     """
     API endpoint para ver y editar divisiones
     """
-    queryset = Division.objects.all().order_by('nombre')
+    queryset = Division.objects.con_conteos('cantidad_jugadores').order_by('nombre')
     serializer_class = DivisionSerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre']
     ordering_fields = ['nombre']
 
-class JugadorViewSet(viewsets.ModelViewSet):
+class JugadorViewSet(ProyeccionPorAccionMixin, viewsets.ModelViewSet):
     """
     API endpoint para ver y editar jugadores.
     Soporta la subida de fotos de perfil a través de formularios multipart/form-data.
     """
-    queryset = Jugador.objects.all().select_related('division').prefetch_related(
-        'atenciones_kinesicas', 'lesiones', 'archivos_medicos', 'checklists_post_partido'
-    ).order_by('apellidos', 'nombres')
+    queryset = Jugador.objects.all().select_related('division').order_by('apellidos', 'nombres')
     serializer_class = JugadorSerializer
+    # Columnas y relaciones a cargar según la acción (solo lo que se renderiza)
+    proyecciones_por_accion = {
+        'list': JugadorSerializer,
+        'retrieve': JugadorSerializer,
+    }
     permission_classes = [IsMedicoOrAdmin]
     parser_classes = (MultiPartParser, FormParser, JSONParser)
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = ['division', 'activo', 'nacionalidad', 'lateralidad', 'prevision_salud']
+    # search_fields se usa fuera de PostgreSQL; ahí BusquedaFilter usa los índices (ver busqueda.py)
     search_fields = ['rut', 'nombres', 'apellidos', 'numero_ficha']
+    busqueda_trigramas = ['rut', 'nombres', 'apellidos']
+    busqueda_exactos = ['numero_ficha']
     ordering_fields = ['apellidos', 'nombres', 'fecha_nacimiento', 'division__nombre']
     
     def get_queryset(self):
         """
         Permite filtrar por división y estado activo
         """
-        queryset = Jugador.objects.all().select_related('division').prefetch_related(
-            'atenciones_kinesicas', 'lesiones', 'archivos_medicos', 'checklists_post_partido'
-        ).order_by('apellidos', 'nombres')
+        queryset = self.proyectar(
+            Jugador.objects.all().select_related('division').order_by('apellidos', 'nombres')
+        )
         division = self.request.query_params.get('division', None)
         activo = self.request.query_params.get('activo', None)
         
@@ -276,13 +408,56 @@ class JugadorViewSet(viewsets.ModelViewSet):
             'jugador': serializer.data
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser],
+            permission_classes=[IsAdminOrReadOnly])
+    def importar(self, request):
+        """
+        Importa jugadores desde un CSV o XLSX (campo 'archivo'). Solo
+        administradores. Opcionales: 'division' (id) para las filas sin
+        división y 'simular' para validar sin guardar.
+        """
+        if 'archivo' not in request.FILES:
+            return Response({
+                'error': 'No se ha enviado ningún archivo'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        division = None
+        division_id = str(request.data.get('division', ''))
+        if division_id:
+            if division_id.isdigit():
+                division = Division.objects.filter(pk=division_id).first()
+            if division is None:
+                return Response({
+                    'error': 'División no encontrada'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        archivo = request.FILES['archivo']
+        try:
+            resultado = importar_jugadores(
+                leer_filas(archivo, archivo.name), division=division,
+                simular=str(request.data.get('simular', '')).lower() in ('1', 'true'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado, status=status.HTTP_400_BAD_REQUEST if resultado['errores'] else status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def autocompletar(self, request):
+        """
+        Sugerencias de jugadores por prefijo de nombre, apellido, RUT o
+        ficha (?q=, ?limite= hasta 50), desde el índice en memoria
+        """
+        limite = request.query_params.get('limite', '10')
+        limite = min(int(limite), 50) if limite.isdigit() else 10
+        return Response(indice_jugadores().buscar(request.query_params.get('q', ''), limite))
+    
     @action(detail=True, methods=['get'])
     def lesiones(self, request, pk=None):
         """
         Endpoint para obtener todas las lesiones de un jugador específico
         """
         jugador = self.get_object()
-        lesiones = Lesion.objects.filter(jugador=jugador).order_by('-fecha_lesion')
+        lesiones = Lesion.objects.filter(jugador=jugador).select_related('jugador').order_by('-fecha_lesion')
         
         # Usar el serializer de lesiones para devolver los datos completos
         from .serializers import LesionSerializer
@@ -297,10 +472,14 @@ class AtencionKinesicaViewSet(viewsets.ModelViewSet):
     queryset = AtencionKinesica.objects.all().select_related('jugador', 'profesional_a_cargo').order_by('-fecha_atencion')
     serializer_class = AtencionKinesicaSerializer
     permission_classes = [IsMedicoOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = ['jugador', 'profesional_a_cargo', 'estado_actual']
     search_fields = ['motivo_consulta', 'prestaciones_realizadas', 'jugador__nombres', 'jugador__apellidos']
+    busqueda_vectores = ['busqueda']
+    busqueda_trigramas = ['jugador__nombres', 'jugador__apellidos']
     ordering_fields = ['fecha_atencion', 'jugador__apellidos']
+    # Orden para la paginación por cursor (?paginacion=cursor)
+    orden_cursor = ('-fecha_atencion', '-id')
     
     def get_queryset(self):
         """
@@ -324,13 +503,17 @@ class LesionViewSet(viewsets.ModelViewSet):
     queryset = Lesion.objects.all().select_related('jugador').order_by('-fecha_lesion')
     serializer_class = LesionSerializer
     permission_classes = [IsMedicoOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = [
         'jugador', 'tipo_lesion', 'region_cuerpo', 'mecanismo_lesional', 
         'condicion_lesion', 'etapa_deportiva_lesion', 'gravedad_lesion'
     ]
     search_fields = ['diagnostico_medico', 'jugador__nombres', 'jugador__apellidos']
+    busqueda_vectores = ['busqueda']
+    busqueda_trigramas = ['jugador__nombres', 'jugador__apellidos']
     ordering_fields = ['fecha_lesion', 'jugador__apellidos', 'gravedad_lesion']
+    # Orden para la paginación por cursor (?paginacion=cursor)
+    orden_cursor = ('-fecha_lesion', '-id')
     
     def get_queryset(self):
         """
@@ -350,19 +533,52 @@ class LesionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def activas(self, request):
         """
-        Obtiene todas las lesiones activas
+        Obtiene todas las lesiones activas, con su último estado diario en
+        estado_actual.
+
+        - ?historial_dias=N: sólo los N estados diarios más recientes de
+          cada lesión (0 para omitir el historial).
+        - ?historial=intervalos: historial compactado en tramos del mismo estado.
+        - ?page o ?paginacion=cursor: respuesta paginada. Sin ellos se
+          devuelve la lista completa, como antes.
         """
-        lesiones_activas = Lesion.objects.filter(esta_activa=True).select_related('jugador').prefetch_related('historial_diario')
-        serializer = LesionActivaSerializer(lesiones_activas, many=True, context={'request': request})
+        if request.query_params.get('historial') == 'intervalos':
+            serializer_class = LesionActivaIntervalosSerializer
+        else:
+            serializer_class = LesionActivaSerializer
+        limites = {}
+        historial_dias = request.query_params.get('historial_dias')
+        if historial_dias is not None:
+            if not historial_dias.isdigit():
+                return Response({
+                    'error': 'El parámetro historial_dias debe ser un número entero'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            limites['historial_diario'] = int(historial_dias)
+
+        lesiones_activas = proyectar_queryset(
+            Lesion.objects.filter(esta_activa=True).annotate(estado_actual=ultimo_estado_diario())
+            .order_by('-fecha_lesion', '-id'),
+            serializer_class, limites=limites
+        )
+        parametros_paginacion = (self.paginator.page_query_param, self.paginator.modo_query_param,
+                                 self.paginator.cursor_query_param)
+        if any(parametro in request.query_params for parametro in parametros_paginacion):
+            pagina = self.paginate_queryset(lesiones_activas)
+            serializer = serializer_class(pagina, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data)
+        serializer = serializer_class(lesiones_activas, many=True, context={'request': request})
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def historial_diario(self, request, pk=None):
         """
-        Obtiene el historial diario de una lesión específica
+        Obtiene el historial diario de una lesión específica, o sus
+        intervalos de estado con ?historial=intervalos
         """
         lesion = self.get_object()
-        historial = lesion.historial_diario.all()
+        if request.query_params.get('historial') == 'intervalos':
+            return Response(IntervaloEstadoLesionSerializer(lesion.intervalos_estado.all(), many=True).data)
+        historial = lesion.historial_diario.select_related('registrado_por')
         serializer = EstadoDiarioLesionSerializer(historial, many=True)
         return Response(serializer.data)
 
@@ -388,9 +604,11 @@ class ArchivoMedicoViewSet(viewsets.ModelViewSet):
     queryset = ArchivoMedico.objects.all().select_related('jugador').order_by('-fecha_documento')
     serializer_class = ArchivoMedicoSerializer
     permission_classes = [IsMedicoOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = ['jugador', 'tipo_archivo']
     search_fields = ['titulo_descripcion', 'observaciones', 'jugador__nombres', 'jugador__apellidos']
+    busqueda_vectores = ['busqueda']
+    busqueda_trigramas = ['jugador__nombres', 'jugador__apellidos']
     ordering_fields = ['fecha_documento', 'jugador__apellidos', 'tipo_archivo']
     
     def get_queryset(self):
@@ -416,12 +634,16 @@ class ArchivoMedicoViewSet(viewsets.ModelViewSet):
         context.update({'request': self.request})
         return context
 
-class PartidoViewSet(viewsets.ModelViewSet):
+class PartidoViewSet(ProyeccionPorAccionMixin, viewsets.ModelViewSet):
     """
     API endpoint para ver y editar partidos
     """
     queryset = Partido.objects.all().prefetch_related('convocados').order_by('-fecha')
     serializer_class = PartidoSerializer
+    proyecciones_por_accion = {
+        'list': PartidoSerializer,
+        'retrieve': PartidoSerializer,
+    }
     permission_classes = [IsMedicoOrAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['condicion', 'fecha']
@@ -432,7 +654,11 @@ class PartidoViewSet(viewsets.ModelViewSet):
         """
         Permite filtrar por fecha y condición
         """
-        queryset = Partido.objects.all().prefetch_related('convocados').order_by('-fecha')
+        queryset = Partido.objects.all().order_by('-fecha')
+        if self.action in self.proyecciones_por_accion:
+            queryset = self.proyectar(queryset)
+        elif self.action not in ('convocados', 'convocatoria', 'convocar_jugador', 'quitar_convocatoria', 'preparacion'):
+            queryset = queryset.prefetch_related('convocados')
         fecha_desde = self.request.query_params.get('fecha_desde', None)
         fecha_hasta = self.request.query_params.get('fecha_hasta', None)
         condicion = self.request.query_params.get('condicion', None)
@@ -460,10 +686,59 @@ class PartidoViewSet(viewsets.ModelViewSet):
         Obtiene los jugadores convocados para un partido específico
         """
         partido = self.get_object()
-        convocados = partido.convocados.all()
+        convocados = proyectar_queryset(partido.convocados.all(), JugadorSerializer)
         serializer = JugadorSerializer(convocados, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def preparacion(self, request, pk=None):
+        """
+        Lesiones en la fecha del partido, último estado diario y dolor en
+        checklists recientes de los convocados, o de los candidatos de
+        ?jugadores=1,2,3. Cantidad fija de consultas para todo el plantel.
+        """
+        partido = self.get_object()
+        candidatos = request.query_params.get('jugadores')
+        if candidatos is not None:
+            candidatos = [i for i in candidatos.split(',') if i]
+            if not all(i.isdigit() for i in candidatos):
+                return Response({
+                    'error': 'jugadores debe ser una lista de ids separados por coma'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'partido': partido.pk,
+            'fecha': partido.fecha,
+            'maximo_convocados': Partido.MAXIMO_CONVOCADOS,
+            'jugadores': preparacion_convocatoria(partido, candidatos),
+        })
+    
+    @action(detail=True, methods=['post'])
+    def convocatoria(self, request, pk=None):
+        """
+        Agrega y quita varios jugadores de la convocatoria en una sola
+        transacción: {"agregar": [ids], "quitar": [ids]}
+        """
+        # Igual que parte_diario: acepta ids numéricos o en texto, no booleanos
+        ids_jugadores = serializers.ListField(child=serializers.IntegerField())
+        try:
+            agregar = ids_jugadores.to_internal_value(request.data.get('agregar', []))
+            quitar = ids_jugadores.to_internal_value(request.data.get('quitar', []))
+        except DRFValidationError:
+            return Response({
+                'error': 'agregar y quitar deben ser listas de ids de jugadores'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        partido = self.get_object()
+        try:
+            agregados, quitados = partido.actualizar_convocados(agregar, quitar)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'agregados': sorted(agregados),
+            'quitados': sorted(quitados),
+            'convocados': sorted(partido.convocados.values_list('pk', flat=True))
+        }, status=status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def convocar_jugador(self, request, pk=None):
         """
@@ -474,14 +749,7 @@ class PartidoViewSet(viewsets.ModelViewSet):
         
         try:
             jugador = Jugador.objects.get(id=jugador_id)
-            
-            # Verificar que no se excedan los 22 jugadores
-            if partido.convocados.count() >= 22:
-                return Response({
-                    'error': 'No se pueden convocar más de 22 jugadores para un partido'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            partido.convocados.add(jugador)
+            partido.actualizar_convocados(agregar=[jugador.pk])
             return Response({
                 'message': f'Jugador {jugador} convocado exitosamente'
             }, status=status.HTTP_200_OK)
@@ -490,6 +758,10 @@ class PartidoViewSet(viewsets.ModelViewSet):
             return Response({
                 'error': 'Jugador no encontrado'
             }, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({
+                'error': e.messages[0]
+            }, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['post'])
     def quitar_convocatoria(self, request, pk=None):
@@ -501,7 +773,7 @@ class PartidoViewSet(viewsets.ModelViewSet):
         
         try:
             jugador = Jugador.objects.get(id=jugador_id)
-            partido.convocados.remove(jugador)
+            partido.actualizar_convocados(quitar=[jugador.pk])
             return Response({
                 'message': f'Convocatoria de {jugador} retirada exitosamente'
             }, status=status.HTTP_200_OK)
@@ -517,20 +789,28 @@ class ChecklistPostPartidoViewSet(viewsets.ModelViewSet):
     """
     queryset = ChecklistPostPartido.objects.all().select_related('jugador', 'realizado_por', 'partido').order_by('-partido__fecha')
     serializer_class = ChecklistPostPartidoSerializer
+    # perform_create guarda el usuario: en escrituras se necesita el User real
+    usuario_bd_en_escritura = True
     permission_classes = [IsMedicoOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = [
         'jugador', 'partido', 'realizado_por', 'dolor_molestia', 'intensidad_dolor',
         'zona_anatomica_dolor', 'mecanismo_dolor_evaluado', 'momento_aparicion_molestia'
     ]
     search_fields = ['partido__rival', 'diagnostico_presuntivo_postpartido', 'jugador__nombres', 'jugador__apellidos']
+    busqueda_vectores = ['busqueda']
+    busqueda_trigramas = ['jugador__nombres', 'jugador__apellidos', 'partido__rival']
     ordering_fields = ['partido__fecha', 'jugador__apellidos', 'dolor_molestia']
+    # Orden para la paginación por cursor (?paginacion=cursor)
+    orden_cursor = ('-partido__fecha', '-id')
     
     def get_queryset(self):
         """
         Permite filtrar por jugador, partido y dolor
         """
-        queryset = ChecklistPostPartido.objects.all().select_related('jugador', 'realizado_por', 'partido').order_by('-partido__fecha')
+        queryset = self.con_expansiones(
+            ChecklistPostPartido.objects.all().select_related('jugador', 'realizado_por', 'partido').order_by('-partido__fecha')
+        )
         jugador = self.request.query_params.get('jugador', None)
         partido = self.request.query_params.get('partido', None)
         dolor = self.request.query_params.get('dolor_molestia', None)
@@ -544,6 +824,15 @@ class ChecklistPostPartidoViewSet(viewsets.ModelViewSet):
             
         return queryset
     
+    def con_expansiones(self, queryset):
+        """
+        Carga las relaciones que necesitan los objetos pedidos con ?expand=
+        """
+        expand = parsear_expand(self.request.query_params.get('expand'))
+        if 'jugador_detalle' in expand:
+            queryset = queryset.select_related('jugador__division', 'jugador__resumen_clinico')
+        return queryset
+
     def perform_create(self, serializer):
         """
         Asigna automáticamente el usuario que realiza el checklist
@@ -562,8 +851,10 @@ class ChecklistPostPartidoViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            partido = Partido.objects.get(id=partido_id)
-            checklists = ChecklistPostPartido.objects.filter(partido=partido).select_related('jugador')
+            partido = proyectar_queryset(Partido.objects.all(), PartidoSerializer).get(id=partido_id)
+            checklists = self.con_expansiones(
+                ChecklistPostPartido.objects.filter(partido=partido).select_related('jugador', 'realizado_por', 'partido')
+            )
             serializer = ChecklistPostPartidoSerializer(checklists, many=True, context={'request': request})
             
             return Response({
@@ -576,17 +867,91 @@ class ChecklistPostPartidoViewSet(viewsets.ModelViewSet):
                 'error': 'Partido no encontrado'
             }, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Crea o actualiza los checklists de todo un partido en una petición:
+        {"partido": id, "checklists": [{"jugador": id, ...}, ...]}
+
+        Si alguna fila no es válida no se guarda nada y se devuelve el error
+        de cada fila. Un checklist ya registrado para el mismo jugador y
+        partido se reemplaza con los datos enviados.
+        """
+        partido_id = request.data.get('partido')
+        filas = request.data.get('checklists')
+        if not partido_id or not isinstance(filas, list) or not filas:
+            return Response({
+                'error': 'Se requieren los parámetros partido y checklists (lista no vacía)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            partido = Partido.objects.only('id').get(id=partido_id)
+        except (Partido.DoesNotExist, ValueError, TypeError):
+            return Response({
+                'error': 'Partido no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        contexto = {'request': request, 'convocados': set(partido.convocados.values_list('pk', flat=True))}
+        validos, errores, vistos = [], [], set()
+        for indice, fila in enumerate(filas):
+            serializer = ChecklistPostPartidoLoteSerializer(data=fila, context=contexto)
+            if not serializer.is_valid():
+                errores.append({'indice': indice, 'errores': serializer.errors})
+            elif serializer.validated_data['jugador'] in vistos:
+                errores.append({'indice': indice, 'errores': {'jugador': ['Jugador repetido en el lote.']}})
+            else:
+                vistos.add(serializer.validated_data['jugador'])
+                validos.append(serializer.validated_data)
+        if errores:
+            return Response({'errores': errores}, status=status.HTTP_400_BAD_REQUEST)
+
+        existentes = set(
+            ChecklistPostPartido.objects.filter(partido=partido, jugador_id__in=vistos)
+            .values_list('jugador_id', flat=True)
+        )
+        campos = [campo for campo in ChecklistPostPartidoLoteSerializer.Meta.fields if campo != 'jugador']
+        with transaction.atomic():
+            ChecklistPostPartido.objects.bulk_create(
+                [
+                    ChecklistPostPartido(
+                        partido=partido, jugador_id=datos['jugador'], realizado_por=request.user,
+                        **{campo: datos[campo] for campo in campos if campo in datos}
+                    )
+                    for datos in validos
+                ],
+                update_conflicts=True,
+                unique_fields=['jugador', 'partido'],
+                update_fields=campos + ['realizado_por'],
+            )
+            # bulk_create no envía post_save
+            actualizar_resumen_clinico(vistos)
+
+        checklists = ChecklistPostPartido.objects.filter(
+            partido=partido, jugador_id__in=vistos
+        ).select_related('jugador', 'realizado_por', 'partido')
+        return Response({
+            'creados': len(vistos - existentes),
+            'actualizados': len(existentes),
+            'checklists': ChecklistPostPartidoSerializer(checklists, many=True, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
+
 class EstadoDiarioLesionViewSet(viewsets.ModelViewSet):
     """
     API endpoint para ver y editar estados diarios de lesiones
     """
     queryset = EstadoDiarioLesion.objects.all().select_related('lesion', 'registrado_por').order_by('-fecha')
     serializer_class = EstadoDiarioLesionSerializer
+    # perform_create guarda el usuario: en escrituras se necesita el User real
+    usuario_bd_en_escritura = True
     permission_classes = [IsMedicoOrAdmin]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, BusquedaFilter, filters.OrderingFilter]
     filterset_fields = ['lesion', 'fecha', 'estado']
     search_fields = ['lesion__diagnostico_medico', 'lesion__jugador__nombres', 'lesion__jugador__apellidos', 'observaciones']
+    busqueda_vectores = ['busqueda', 'lesion__busqueda']
+    busqueda_trigramas = ['lesion__jugador__nombres', 'lesion__jugador__apellidos']
     ordering_fields = ['fecha', 'lesion__jugador__apellidos']
+    # Orden para la paginación por cursor (?paginacion=cursor)
+    orden_cursor = ('-fecha', '-id')
     
     def get_queryset(self):
         """
@@ -606,6 +971,78 @@ class EstadoDiarioLesionViewSet(viewsets.ModelViewSet):
         """
         serializer.save(registrado_por=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def parte_diario(self, request):
+        """
+        Registra los estados del día de varias lesiones en una petición:
+        {"fecha": "AAAA-MM-DD", "estados": [{"lesion": id, "estado": "camilla", ...}, ...]}
+
+        La fecha es opcional (por defecto hoy). Reenviar el mismo parte
+        reemplaza los estados ya registrados para esa fecha en vez de fallar.
+        Si alguna fila no es válida no se guarda nada y se devuelve el error
+        de cada fila.
+        """
+        filas = request.data.get('estados')
+        if not isinstance(filas, list) or not filas:
+            return Response({
+                'error': 'Se requiere el parámetro estados (lista no vacía)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        fecha = request.data.get('fecha')
+        try:
+            fecha = parse_date(fecha) if fecha else timezone.localdate()
+        except (TypeError, ValueError):
+            # Bien formada pero inexistente ('2024-13-45') o de otro tipo
+            fecha = None
+        if fecha is None:
+            return Response({
+                'error': 'Formato de fecha inválido. Use YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ids tal como los interpreta el serializer ("12" es 12), para
+        # consultar las lesiones existentes una sola vez
+        campo_lesion = EstadoDiarioLoteSerializer().fields['lesion']
+        ids = set()
+        for fila in filas:
+            if isinstance(fila, dict):
+                try:
+                    ids.add(campo_lesion.to_internal_value(fila.get('lesion')))
+                except DRFValidationError:
+                    pass
+        contexto = {'request': request, 'lesiones': set(Lesion.objects.filter(pk__in=ids).values_list('pk', flat=True))}
+        validos, errores, vistos = [], [], set()
+        for indice, fila in enumerate(filas):
+            serializer = EstadoDiarioLoteSerializer(data=fila, context=contexto)
+            if not serializer.is_valid():
+                errores.append({'indice': indice, 'errores': serializer.errors})
+            elif serializer.validated_data['lesion'] in vistos:
+                errores.append({'indice': indice, 'errores': {'lesion': ['Lesión repetida en el parte.']}})
+            else:
+                vistos.add(serializer.validated_data['lesion'])
+                validos.append(serializer.validated_data)
+        if errores:
+            return Response({'errores': errores}, status=status.HTTP_400_BAD_REQUEST)
+
+        existentes = set(
+            EstadoDiarioLesion.objects.filter(fecha=fecha, lesion_id__in=vistos).values_list('lesion_id', flat=True)
+        )
+        registrar_estados_diarios([
+            EstadoDiarioLesion(
+                lesion_id=datos['lesion'], fecha=fecha, estado=datos['estado'],
+                observaciones=datos.get('observaciones'),
+            )
+            for datos in validos
+        ], request.user)
+
+        estados = EstadoDiarioLesion.objects.filter(
+            fecha=fecha, lesion_id__in=vistos
+        ).select_related('registrado_por')
+        return Response({
+            'fecha': str(fecha),
+            'creados': len(vistos - existentes),
+            'actualizados': len(existentes),
+            'estados': EstadoDiarioLesionSerializer(estados, many=True, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
+
 class EstadosLesionListView(APIView):
     """
     Vista simple para obtener las opciones de estado de lesión
@@ -629,7 +1066,7 @@ def register_view(request):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = RefreshTokenConRoles.for_user(user)
             
             return Response({
                 'access_token': str(refresh.access_token),
@@ -658,12 +1095,10 @@ def login_view(request):
         user = authenticate(request, username=rut, password=password)
         if user:
             if user.is_active:
-                refresh = RefreshToken.for_user(user)
+                refresh = RefreshTokenConRoles.for_user(user)
                 
                 # Obtener el rol del usuario
-                role = None
-                if user.groups.exists():
-                    role = user.groups.first().name
+                role = rol_principal(user)
                 
                 return Response({
                     'refresh': str(refresh),
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Búsqueda de texto y trigramas (gestion_clinica/busqueda.py)
     'gestion_clinica',
     'rest_framework',
     'django_filters',  # Para filtros avanzados en DRF
@@ -50,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo total incluya al resto de los middleware
+    'gestion_clinica.middleware.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Agregar CORS middleware
@@ -98,6 +102,16 @@ DATABASES = {
     }
 }
 
+# Base SQLite local para correr los tests sin PostgreSQL:
+#   KINE_DB=sqlite python manage.py test gestion_clinica
+if os.environ.get('KINE_DB') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -152,7 +166,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Configuración de Django REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Paginación por página; las vistas con orden_cursor aceptan ?paginacion=cursor
+    'DEFAULT_PAGINATION_CLASS': 'gestion_clinica.pagination.PaginacionConCursor',
     'PAGE_SIZE': 10,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -163,7 +178,8 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication con modo opcional sin consulta (GESTION_CLINICA['JWT_SIN_CONSULTA'])
+        'gestion_clinica.authentication.JWTAuthenticationSinConsulta',
     ),
 }
 
@@ -191,7 +207,25 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'gestion_clinica.authentication.UsuarioToken',
 
     'JTI_CLAIM': 'jti',
+
+    # Incluyen el claim de roles cuando GESTION_CLINICA['ROLES_EN_TOKEN'] está activo
+    'TOKEN_OBTAIN_SERIALIZER': 'gestion_clinica.serializers.TokenObtainPairConRolesSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'gestion_clinica.serializers.TokenRefreshConRolesSerializer',
+}
+
+# Configuración propia de gestion_clinica (valores por defecto en gestion_clinica/conf.py)
+GESTION_CLINICA = {
+    # Segundos que se cachean en memoria los roles de cada usuario
+    'ROLES_CACHE_SEGUNDOS': 300,
+    # Incluir los roles en el JWT y usarlos en los permisos sin consultar la BD
+    'ROLES_EN_TOKEN': False,
+    # Autenticar las peticiones desde los claims del JWT sin cargar el User
+    'JWT_SIN_CONSULTA': False,
+    # Peticiones por endpoint en el histograma de /api/metricas/rendimiento/
+    'METRICAS_MUESTRAS_POR_ENDPOINT': 500,
+    # Cabecera Server-Timing: 'staff', 'todos' (p. ej. en desarrollo) o 'ninguno'
+    'SERVER_TIMING': 'staff',
 }
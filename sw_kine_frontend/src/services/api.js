@@ -118,7 +118,29 @@ export const getJugadores = async (params = {}) => {
   } catch (error) {
     console.error('Error en getJugadores:', error);
     if (error.response?.status === 401) {
-      throw { 
+      throw {
+        message: 'Sesión expirada o no iniciada. Por favor inicie sesión nuevamente.',
+        isAuthError: true
+      };
+    }
+    throw error.response?.data || error;
+  }
+};
+
+/**
+ * Sugerencias de jugadores para autocompletar (nombre, apellido, RUT o ficha)
+ * @param {string} texto - Lo escrito por el usuario
+ * @param {number} [limite=10] - Cantidad máxima de sugerencias
+ * @returns {Promise} - Promesa con la lista de { id, nombre, rut, numero_ficha, division, activo }
+ */
+export const autocompletarJugadores = async (texto, limite = 10) => {
+  try {
+    const response = await api.get('/jugadores/autocompletar/', { params: { q: texto, limite } });
+    return response.data;
+  } catch (error) {
+    console.error('Error al autocompletar jugadores:', error);
+    if (error.response?.status === 401) {
+      throw {
         message: 'Sesión expirada o no iniciada. Por favor inicie sesión nuevamente.',
         isAuthError: true
       };
@@ -251,12 +273,14 @@ export const addAtencionKinesica = async (datosAtencion) => {
 
 /**
  * Obtiene jugadores que tienen lesiones activas
+ * @param {Object} [params] - Parámetros de consulta. Por defecto sin historial
+ * diario (el historial de cada lesión se pide con getHistorialDiarioLesion)
  * @returns {Promise} - Promesa con la respuesta
  */
-export const getJugadoresConLesionActiva = async () => {
+export const getJugadoresConLesionActiva = async (params = { historial_dias: 0 }) => {
   try {
     console.log('getJugadoresConLesionActiva llamado');
-    const response = await api.get('/lesiones/activas/');
+    const response = await api.get('/lesiones/activas/', { params });
     console.log('Respuesta de lesiones activas:', response.data);
     
     return response.data;
@@ -629,6 +653,29 @@ export const getConvocados = async (partidoId) => {
   }
 };
 
+/**
+ * Obtiene lesiones, último estado diario y dolor reciente de los candidatos a una convocatoria
+ * @param {number} partidoId - ID del partido
+ * @param {Array} [jugadoresIds] - Candidatos (por defecto, los convocados)
+ * @returns {Promise} - Promesa con la respuesta
+ */
+export const getPreparacionPartido = async (partidoId, jugadoresIds) => {
+  try {
+    const params = jugadoresIds ? { jugadores: jugadoresIds.join(',') } : {};
+    const response = await api.get(`/partidos/${partidoId}/preparacion/`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error al obtener preparación del partido:', error);
+    if (error.response?.status === 401) {
+      throw {
+        message: 'Sesión expirada o no iniciada. Por favor inicie sesión nuevamente.',
+        isAuthError: true
+      };
+    }
+    throw error.response?.data || error;
+  }
+};
+
 // ===== FUNCIONES PARA CHECKLISTS =====
 
 /**
@@ -639,7 +686,10 @@ export const getConvocados = async (partidoId) => {
 export const getHistorialChecklists = async (params = {}) => {
   try {
     console.log('getHistorialChecklists llamado con params:', params);
-    const response = await api.get('/checklists/', { params });
+    // El detalle del jugador y del partido solo se incluye si se pide con expand
+    const response = await api.get('/checklists/', {
+      params: { expand: 'jugador_detalle,partido_detalle', ...params }
+    });
     console.log('Respuesta del historial de checklists:', response.data);
     
     return Array.isArray(response.data) ? response.data : (response.data.results || []);
@@ -733,6 +783,60 @@ export const getDatosInformeLesiones = async (startDate, endDate) => {
   }
 };
 
+/**
+ * Obtiene totales y series agrupadas de lesiones para los gráficos del dashboard
+ * @param {string} startDate - Fecha de inicio
+ * @param {string} endDate - Fecha de fin
+ * @param {number} [divisionId] - Acota los datos a una división
+ * @returns {Promise} - Promesa con la respuesta
+ */
+export const getGraficosInformeLesiones = async (startDate, endDate, divisionId) => {
+  try {
+    const params = { start_date: startDate, end_date: endDate };
+    if (divisionId) {
+      params.division = divisionId;
+    }
+    const response = await api.get('/informes/lesiones/resumen/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error al obtener gráficos de lesiones:', error);
+    if (error.response?.status === 401) {
+      throw { 
+        message: 'Sesión expirada o no iniciada. Por favor inicie sesión nuevamente.',
+        isAuthError: true
+      };
+    }
+    throw error.response?.data || error;
+  }
+};
+
+/**
+ * Obtiene los jugadores disponibles, limitados y no disponibles
+ * @param {string} startDate - Fecha de inicio
+ * @param {string} [endDate] - Fecha de fin (por defecto, la de inicio)
+ * @param {number} [divisionId] - Acota el plantel a una división
+ * @returns {Promise} - Promesa con la respuesta
+ */
+export const getDisponibilidadJugadores = async (startDate, endDate, divisionId) => {
+  try {
+    const params = { start_date: startDate, end_date: endDate || startDate };
+    if (divisionId) {
+      params.division = divisionId;
+    }
+    const response = await api.get('/disponibilidad/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error al obtener disponibilidad de jugadores:', error);
+    if (error.response?.status === 401) {
+      throw {
+        message: 'Sesión expirada o no iniciada. Por favor inicie sesión nuevamente.',
+        isAuthError: true
+      };
+    }
+    throw error.response?.data || error;
+  }
+};
+
 // ===== FUNCIONES PARA ARCHIVOS MÉDICOS =====
 
 /**